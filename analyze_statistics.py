@@ -3,57 +3,30 @@
 Анализатор статистики Polisher
 
 Читает файл polisher_statistics.jsonl и выводит статистику по успешности
-переходов между уровнями.
-"""
-
-import json
-import os
-from collections import defaultdict
-from config import STATISTICS_FILE
-
-
-def load_statistics():
-    """Загружает статистику из JSONL файла"""
-    stats = []
-
-    if not os.path.exists(STATISTICS_FILE):
-        print(f"Файл статистики {STATISTICS_FILE} не найден!")
-        return stats
-
-    with open(STATISTICS_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                try:
-                    stats.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    print(f"Ошибка чтения строки: {e}")
-
-    return stats
-
-
-def analyze_success_rates(stats):
-    """Анализирует успешность переходов между уровнями"""
+переходов между уровнями. Файл читается за один проход в компактные счетчики
+(см. stats_aggregate.py), из которых строятся все отчеты. С хранилищем SQLite
+(STATISTICS_BACKEND = 'sqlite' или --db) счетчики заполняет один агрегатный
+запрос в базе (см. stats_db.py).
 
-    # Структура: level -> action -> {success: count, failed: count}
-    transitions = defaultdict(lambda: defaultdict(lambda: {'success': 0, 'failed': 0}))
+Двоичный файл (STATISTICS_BACKEND = 'binary' или --binary) читается через
+numpy.memmap, счетчики считает bincount (см. stats_binary.py).
 
-    # Отдельно считаем переходы с падением на 0 (поломки)
-    breaks_to_zero = defaultdict(int)  # action -> count
+Большой JSONL разбирается параллельно по частям (--jobs, см.
+stats_aggregate.aggregate_parallel). С --sessions дополнительно восстанавливаются сессии и считается пропускная
+способность: длительность цикла, попытки и часы на +10, потери на поломки и
+разбивка по часам суток (см. stats_sessions.py).
 
-    for entry in stats:
-        from_level = entry['from_level']
-        to_level = entry['to_level']
-        action = entry['action']
-        result = entry['result']
-
-        transitions[from_level][action][result] += 1
-
-        # Если упало на 0 (поломка), считаем отдельно
-        if result == 'success' and to_level == 0 and from_level > 0:
-            breaks_to_zero[action] += 1
+Счетчики JSONL сохраняются в контрольную точку, и следующий запуск читает только
+дописанные строки. С --watch отчет перерисовывается при появлении новых попыток.
+"""
 
-    return transitions, breaks_to_zero
+import argparse
+import os
+import time
+from config import (STATISTICS_FILE, STATISTICS_DB, STATISTICS_BINARY_FILE, STATISTICS_BACKEND,
+                    STATISTICS_CHECKPOINT_FILE, STATISTICS_WATCH_INTERVAL)
+from stats_aggregate import IncrementalAggregator, iter_source
+from stats_sessions import analyze_sessions
 
 
 def print_statistics(transitions, breaks_to_zero):
@@ -183,28 +156,9 @@ def print_statistics(transitions, breaks_to_zero):
     print("="*70 + "\n")
 
 
-def print_detailed_transitions(stats):
+def print_detailed_transitions(upgrades, breaks):
     """Выводит детальную статистику переходов"""
 
-    # Структура: (from_level, to_level) -> action -> count
-    upgrades = defaultdict(lambda: defaultdict(int))  # Успешные повышения
-    breaks = defaultdict(lambda: defaultdict(int))  # Поломки (падения на 0)
-
-    for entry in stats:
-        from_level = entry['from_level']
-        to_level = entry['to_level']
-        action = entry['action']
-        result = entry['result']
-
-        if result == 'success':
-            if to_level > from_level:
-                # Успешное повышение уровня
-                key = (from_level, to_level)
-                upgrades[key][action] += 1
-            elif to_level == 0 and from_level > 0:
-                # Поломка (падение на 0)
-                breaks[from_level][action] += 1
-
     print("\n" + "="*70)
     print("ДЕТАЛЬНАЯ СТАТИСТИКА ПЕРЕХОДОВ")
     print("="*70)
@@ -236,33 +190,228 @@ def print_detailed_transitions(stats):
     print()
 
 
-def print_session_summary(stats):
+def print_session_summary(sessions_completed):
     """Выводит сводку по завершенным сессиям (до +10)"""
 
-    sessions_completed = sum(1 for entry in stats
-                            if entry['result'] == 'success' and entry['to_level'] == 10)
-
     if sessions_completed > 0:
         print("\n" + "="*70)
         print(f"ЗАВЕРШЕНО СЕССИЙ (достигнут +10): {sessions_completed}")
         print("="*70 + "\n")
 
 
-def main():
-    print("Загрузка статистики...")
-    stats = load_statistics()
+def format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}ч {minutes:02d}м"
+    return f"{minutes}м {seconds:02d}с"
+
+
+def print_session_report(analyzer):
+    """Выводит сессии и пропускную способность"""
 
-    if not stats:
-        print("Нет данных для анализа.")
+    print("\n" + "="*70)
+    print("СЕССИИ И ПРОПУСКНАЯ СПОСОБНОСТЬ")
+    print("="*70)
+
+    sessions = analyzer.sessions
+    if not sessions:
+        print("\nСессий нет.")
+        print("="*70 + "\n")
         return
 
-    print(f"Загружено {len(stats)} записей.\n")
+    active_seconds = sum(session.seconds for session in sessions)
+    attempts = sum(session.attempts for session in sessions)
+    breaks = sum(session.breaks for session in sessions)
+    lost_seconds = sum(session.lost_seconds for session in sessions)
+    exact = sum(1 for session in sessions if session.session_id is not None)
+
+    print(f"\nСессий: {len(sessions)} (по session_id: {exact}, по разрывам во времени: {len(sessions) - exact})")
+    print(f"Активное время: {format_duration(active_seconds)}, попыток: {attempts}")
+    if active_seconds > 0:
+        print(f"Попыток в час: {attempts / (active_seconds / 3600):.1f}")
+    print(f"Поломок: {breaks}, потеряно на восстановление после поломок: {format_duration(lost_seconds)}"
+          + (f" ({lost_seconds / active_seconds * 100:.1f}% времени)" if active_seconds > 0 else ""))
+
+    if analyzer.cycle_count:
+        print(f"\n--- ДЛИТЕЛЬНОСТЬ ЦИКЛА ({analyzer.cycle_count} интервалов) ---")
+        print(f"  среднее: {analyzer.cycle_sum / analyzer.cycle_count:.1f} сек")
+        for p in (50, 90, 99):
+            print(f"  p{p}: <= {analyzer.cycle_percentile(p):.1f} сек")
+
+    completions = analyzer.completions
+    if completions:
+        total_attempts = sum(count for count, _ in completions)
+        total_seconds = sum(seconds for _, seconds in completions)
+        print(f"\n--- ДОСТИЖЕНИЕ +10 ({len(completions)} раз) ---")
+        print(f"  попыток на +10: в среднем {total_attempts / len(completions):.1f}, "
+              f"от {min(count for count, _ in completions)} до {max(count for count, _ in completions)}")
+        print(f"  времени на +10: в среднем {format_duration(total_seconds / len(completions))}")
+        if active_seconds > 0:
+            print(f"  +10 в час: {len(completions) / (active_seconds / 3600):.2f}")
+
+    print("\n--- ПО ЧАСАМ СУТОК ---")
+    print("  час  попыток  успехов  поломок  +10  цикл, сек")
+    for hour in range(24):
+        count = analyzer.hour_attempts[hour]
+        if not count:
+            continue
+        cycles = analyzer.hour_cycle_count[hour]
+        cycle = f"{analyzer.hour_cycle_sum[hour] / cycles:.1f}" if cycles else "-"
+        print(f"  {hour:02d}   {count:7d}  {analyzer.hour_successes[hour]:7d}  "
+              f"{analyzer.hour_breaks[hour]:7d}  {analyzer.hour_completions[hour]:3d}  {cycle:>9}")
+    print("="*70 + "\n")
+
 
-    # Анализируем и выводим статистику
-    transitions, breaks_to_zero = analyze_success_rates(stats)
+def print_reports(counters):
+    """Выводит все отчеты по счетчикам попыток"""
+    transitions, breaks_to_zero = counters.success_rates()
     print_statistics(transitions, breaks_to_zero)
-    print_detailed_transitions(stats)
-    print_session_summary(stats)
+    print_detailed_transitions(*counters.detailed_transitions())
+    print_session_summary(counters.sessions_completed())
+
+
+def analyze_database(path, watch=False, interval=STATISTICS_WATCH_INTERVAL):
+    """Отчеты по базе SQLite: подсчет делает SQL"""
+    import stats_db
+
+    if not os.path.exists(path):
+        print(f"База статистики {path} не найдена!")
+        return
+
+    conn = stats_db.connect(path)
+    try:
+        last_id = None
+        while True:
+            current_id = conn.execute("SELECT MAX(id) FROM attempts").fetchone()[0]
+            if current_id != last_id:
+                last_id = current_id
+                counters = stats_db.query_counters(conn)
+                if not counters.total:
+                    print("Нет данных для анализа.")
+                else:
+                    print(f"В базе {counters.total} записей.\n")
+                    print_reports(counters)
+            if not watch:
+                return
+            time.sleep(interval)
+    finally:
+        conn.close()
+
+
+def analyze_binary(path, watch=False, interval=STATISTICS_WATCH_INTERVAL):
+    """Отчеты по двоичному файлу: memmap + bincount, перечитывается целиком при росте файла"""
+    import stats_binary
+
+    if not os.path.exists(path):
+        print(f"Файл статистики {path} не найден!")
+        return
+
+    last_size = None
+    while True:
+        size = os.path.getsize(path)
+        if size != last_size:
+            last_size = size
+            counters = stats_binary.read_counters(path)
+            if not counters.total:
+                print("Нет данных для анализа.")
+            else:
+                print(f"Загружено {counters.total} записей.\n")
+                print_reports(counters)
+        if not watch:
+            return
+        time.sleep(interval)
+
+
+def analyze_file(path, checkpoint_path, watch=False, interval=STATISTICS_WATCH_INTERVAL, jobs=None):
+    """Отчеты по JSONL: разбираются только строки, дописанные после контрольной точки
+
+    jobs - число процессов для разбора больших файлов (None - по числу ядер).
+    """
+    aggregator = IncrementalAggregator(path, checkpoint_path, jobs)
+    if aggregator.load():
+        print(f"Контрольная точка: {aggregator.counters.total} записей, смещение {aggregator.offset}")
+
+    first = True
+    while True:
+        if os.path.exists(path):
+            new_records, rebuilt = aggregator.update()
+            if rebuilt and not first:
+                print("Файл статистики обрезан или заменен, пересчет с нуля")
+            if new_records or first:
+                aggregator.save()
+                counters = aggregator.counters
+                if not counters.total:
+                    print("Нет данных для анализа.")
+                else:
+                    print(f"Загружено {counters.total} записей (новых: {new_records}).\n")
+                    print_reports(counters)
+            first = False
+        elif first:
+            print(f"Файл статистики {path} не найден!")
+            print("Нет данных для анализа.")
+            if not watch:
+                return
+            first = False
+
+        if not watch:
+            return
+        time.sleep(interval)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Анализ статистики Polisher')
+    arg_parser.add_argument('--db', nargs='?', const=STATISTICS_DB, default=None,
+                            help='читать базу SQLite (по умолчанию STATISTICS_DB)')
+    arg_parser.add_argument('--binary', nargs='?', const=STATISTICS_BINARY_FILE, default=None,
+                            help='читать двоичный файл (по умолчанию STATISTICS_BINARY_FILE)')
+    arg_parser.add_argument('--sessions', action='store_true',
+                            help='восстановить сессии и показать пропускную способность')
+    arg_parser.add_argument('--rebuild', action='store_true',
+                            help='пересчитать с нуля, не используя контрольную точку')
+    arg_parser.add_argument('--watch', action='store_true',
+                            help='следить за файлом и перерисовывать отчет при новых попытках')
+    arg_parser.add_argument('--jobs', type=int, default=None,
+                            help='процессов для разбора большого JSONL (по умолчанию по числу ядер, 1 - без пула)')
+    arg_parser.add_argument('--interval', type=float, default=STATISTICS_WATCH_INTERVAL,
+                            help='период проверки в режиме --watch, сек')
+    args = arg_parser.parse_args()
+
+    db_path = args.db
+    binary_path = args.binary
+    if db_path is None and binary_path is None:
+        if STATISTICS_BACKEND == 'sqlite':
+            db_path = STATISTICS_DB
+        elif STATISTICS_BACKEND == 'binary':
+            binary_path = STATISTICS_BINARY_FILE
+
+    try:
+        if args.sessions:
+            if db_path is not None:
+                path, backend = db_path, 'sqlite'
+            elif binary_path is not None:
+                path, backend = binary_path, 'binary'
+            else:
+                path, backend = STATISTICS_FILE, 'jsonl'
+            if not os.path.exists(path):
+                print(f"Файл статистики {path} не найден!")
+                return
+            print_session_report(analyze_sessions(iter_source(path, backend)))
+            return
+
+        if db_path is not None:
+            analyze_database(db_path, args.watch, args.interval)
+            return
+        if binary_path is not None:
+            analyze_binary(binary_path, args.watch, args.interval)
+            return
+
+        if args.rebuild and os.path.exists(STATISTICS_CHECKPOINT_FILE):
+            os.remove(STATISTICS_CHECKPOINT_FILE)
+        print("Загрузка статистики...")
+        analyze_file(STATISTICS_FILE, STATISTICS_CHECKPOINT_FILE, args.watch, args.interval, args.jobs)
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Автоподбор OCR профиля для Polisher
+
+Прогоняет размеченный корпус кадров (см. corpus.py) через варианты настроек
+tesseract: режим сегментации (psm), движок (oem), язык, белый список символов и
+коэффициент увеличения. Для каждого варианта меряет время OCR + разбора и
+точность относительно разметки, затем записывает самый быстрый профиль с
+точностью не ниже порога в polisher_settings.json (ключ 'ocr_profile').
+
+Пример:
+    python autotune.py polisher_corpus --min-accuracy 0.98
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+
+from config import OCR_LANG, OCR_PREPROCESS, SETTINGS_FILE
+from corpus import load_corpus, load_frame, outcome_of
+from ocr_engine import OcrEngine
+from ocr_parser import OcrParser
+from preprocess import preprocess_image
+
+LATIN_WHITELIST = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+!.,'
+CYRILLIC_WHITELIST = 'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯабвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def parse_list(value, convert=str):
+    return [convert(item) for item in value.split(',') if item]
+
+
+def whitelist_for(lang):
+    """Белый список символов, подходящий для языка профиля"""
+    whitelist = LATIN_WHITELIST
+    if 'rus' in lang:
+        whitelist += CYRILLIC_WHITELIST
+    return whitelist
+
+
+def candidate_profiles(langs, psms, oems, whitelists, scales):
+    for lang, psm, oem, use_whitelist, scale in itertools.product(langs, psms, oems, whitelists, scales):
+        yield {
+            'lang': lang,
+            'psm': psm,
+            'oem': oem,
+            'whitelist': whitelist_for(lang) if use_whitelist else None,
+            'scale': scale,
+        }
+
+
+def evaluate(profile, frames, parser, repeat=1):
+    """Возвращает (точность, среднее время на кадр в секундах)"""
+    engine = OcrEngine()
+    engine.configure(profile)
+    options = dict(OCR_PREPROCESS, scale=profile['scale'])
+    try:
+        engine.start()
+        correct = 0
+        elapsed = 0.0
+        for _ in range(repeat):
+            correct = 0
+            for image, expected in frames:
+                started = time.perf_counter()
+                text = engine.recognize(preprocess_image(image, options))
+                outcome, level, _ = parser.parse(text)
+                elapsed += time.perf_counter() - started
+                if (outcome, level) == expected:
+                    correct += 1
+        return correct / len(frames), elapsed / (len(frames) * repeat)
+    finally:
+        engine.close()
+
+
+def describe(profile):
+    whitelist = 'yes' if profile['whitelist'] else 'no'
+    return (f"lang={profile['lang']:<8} psm={str(profile['psm']):<4} oem={str(profile['oem']):<4} "
+            f"whitelist={whitelist:<3} scale={profile['scale']}")
+
+
+def save_profile(profile, path=SETTINGS_FILE):
+    """Записывает профиль в настройки, не трогая остальные ключи"""
+    settings = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    settings['ocr_profile'] = profile
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=2, ensure_ascii=False)
+    print(f"OCR profile saved to {path}")
+
+
+def main():
+    langs = OCR_LANG.split('+')
+    if len(langs) > 1:
+        langs.append(OCR_LANG)
+
+    arg_parser = argparse.ArgumentParser(description='Автоподбор OCR профиля по размеченному корпусу')
+    arg_parser.add_argument('corpus', help='папка корпуса с frames.jsonl')
+    arg_parser.add_argument('--min-accuracy', type=float, default=0.98, help='минимальная точность (0-1)')
+    arg_parser.add_argument('--langs', default=','.join(langs), help='языки через запятую')
+    arg_parser.add_argument('--psm', default='3,4,6,7,11', help='режимы сегментации через запятую')
+    arg_parser.add_argument('--oem', default='1,3', help='режимы движка через запятую')
+    arg_parser.add_argument('--scales', default='1,2,3', help='коэффициенты увеличения через запятую')
+    arg_parser.add_argument('--no-whitelist', action='store_true', help='не пробовать белые списки символов')
+    arg_parser.add_argument('--repeat', type=int, default=1, help='сколько раз прогонять корпус для замера')
+    arg_parser.add_argument('--dry-run', action='store_true', help='только показать результаты')
+    args = arg_parser.parse_args()
+
+    records = [r for r in load_corpus(args.corpus) if r.get('action') not in (None, 'unknown')]
+    if not records:
+        print("Нет размеченных кадров для подбора.")
+        return
+
+    frames = [(load_frame(r), outcome_of(r['action'], r.get('value'))) for r in records]
+    print(f"Загружено {len(frames)} размеченных кадров.\n")
+
+    profiles = list(candidate_profiles(
+        parse_list(args.langs),
+        parse_list(args.psm, int),
+        parse_list(args.oem, int),
+        [False] if args.no_whitelist else [False, True],
+        parse_list(args.scales, int),
+    ))
+
+    parser = OcrParser()
+    results = []
+    for i, profile in enumerate(profiles, 1):
+        try:
+            accuracy, latency = evaluate(profile, frames, parser, args.repeat)
+        except Exception as e:
+            print(f"[{i}/{len(profiles)}] {describe(profile)}  ошибка: {e}")
+            continue
+        results.append((profile, accuracy, latency))
+        print(f"[{i}/{len(profiles)}] {describe(profile)}  "
+              f"точность {accuracy * 100:5.1f}%  {latency * 1000:7.1f} мс/кадр")
+
+    passing = [r for r in results if r[1] >= args.min_accuracy]
+    if not passing:
+        print(f"\nНи один профиль не достиг точности {args.min_accuracy * 100:.1f}%.")
+        return
+
+    best, accuracy, latency = min(passing, key=lambda r: r[2])
+    print("\n" + "=" * 70)
+    print(f"ЛУЧШИЙ ПРОФИЛЬ: {describe(best)}")
+    print(f"Точность {accuracy * 100:.1f}%, {latency * 1000:.1f} мс/кадр")
+    print("=" * 70)
+
+    if not args.dry_run:
+        save_profile(best)
+
+
+if __name__ == '__main__':
+    main()
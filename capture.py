@@ -0,0 +1,98 @@
+"""
+Сессия захвата экрана для Polisher
+
+Держит открытый контекст mss на весь цикл и переиспользует заранее выделенные
+буферы под выбранную область. Кадр отдается в OCR как grayscale изображение,
+посчитанное прямо из памяти BGRA без промежуточной RGB копии.
+"""
+
+import threading
+
+import mss
+import numpy as np
+from PIL import Image
+
+
+class CaptureSession:
+    def __init__(self):
+        # mss привязан к потоку, в котором создан, поэтому контекст и буферы у
+        # каждого потока свои (поток цикла, поток меню трея)
+        self.local = threading.local()
+        self.instances = []
+        self.lock = threading.Lock()
+
+    def _state(self, region):
+        state = self.local
+        if getattr(state, 'sct', None) is None:
+            state.sct = mss.mss()
+            state.region = None
+            with self.lock:
+                self.instances.append(state.sct)
+
+        if state.region != region:
+            x1, y1, x2, y2 = region
+            width = x2 - x1
+            height = y2 - y1
+            state.region = region
+            state.monitor = {"top": y1, "left": x1, "width": width, "height": height}
+            state.work = np.empty((height, width), dtype=np.uint16)
+            state.tmp = np.empty((height, width), dtype=np.uint16)
+            state.gray = np.empty((height, width), dtype=np.uint8)
+        return state
+
+    def grab_bgra(self, region):
+        """Захватывает область и возвращает массив (h, w, 4) поверх памяти mss, без копии"""
+        state = self._state(region)
+        screenshot = state.sct.grab(state.monitor)
+        height = screenshot.height
+        width = screenshot.width
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(height, width, 4)
+
+    def grab_gray(self, region):
+        """Захватывает область и возвращает grayscale массив (h, w) uint8
+
+        Массив принадлежит сессии и перезаписывается следующим захватом в этом потоке.
+        """
+        state = self._state(region)
+        bgra = self.grab_bgra(region)
+        work = state.work
+        tmp = state.tmp
+
+        # Y = (29*B + 150*G + 77*R) >> 8, считаем в заранее выделенных буферах
+        np.multiply(bgra[:, :, 0], 29, out=work, dtype=np.uint16)
+        np.multiply(bgra[:, :, 1], 150, out=tmp, dtype=np.uint16)
+        work += tmp
+        np.multiply(bgra[:, :, 2], 77, out=tmp, dtype=np.uint16)
+        work += tmp
+        np.right_shift(work, 8, out=work)
+        np.copyto(state.gray, work, casting='unsafe')
+        return state.gray
+
+    def grab_gray_image(self, region):
+        """То же, что grab_gray, но в виде PIL изображения поверх того же буфера"""
+        gray = self.grab_gray(region)
+        height, width = gray.shape
+        return Image.frombuffer('L', (width, height), gray, 'raw', 'L', 0, 1)
+
+    def close(self):
+        """Закрывает контекст mss текущего потока"""
+        state = self.local
+        sct = getattr(state, 'sct', None)
+        if sct is not None:
+            with self.lock:
+                if sct in self.instances:
+                    self.instances.remove(sct)
+            sct.close()
+            state.sct = None
+            state.region = None
+
+    def close_all(self):
+        """Закрывает контексты mss всех потоков (при выходе из приложения)"""
+        with self.lock:
+            instances = self.instances
+            self.instances = []
+        for sct in instances:
+            try:
+                sct.close()
+            except Exception:
+                pass
@@ -0,0 +1,28 @@
+"""
+Часы для Polisher
+
+Все паузы и отметки времени цикла идут через объект часов, чтобы симулятор мог
+подставить виртуальное время (см. simulator.py). sleep - блокирующая пауза,
+wait - пауза в asyncio цикле (см. loop_engine.py).
+"""
+
+import time
+from datetime import datetime
+
+
+class RealClock:
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    async def wait(self, seconds):
+        """Пауза внутри asyncio цикла, прерывается отменой задачи"""
+        import asyncio
+
+        await asyncio.sleep(max(0.0, seconds))
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def now(self):
+        return datetime.now()
@@ -4,9 +4,55 @@ import sys
 # Tesseract configuration
 TESSERACT_CMD = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+# Tesseract data directory for in-process OCR (tesserocr), None - default location
+TESSDATA_PREFIX = os.path.join(os.path.dirname(TESSERACT_CMD), 'tessdata') if sys.platform == 'win32' else None
+
 # OCR Languages (change as needed)
 OCR_LANG = 'rus+eng'
 
+# Image preprocessing before OCR
+OCR_PREPROCESS = {
+    'enabled': True,
+    'threshold': 'adaptive',  # 'adaptive' or None
+    'block_size': 31,  # adaptive threshold window (pixels)
+    'offset': 10,  # brightness below local mean counted as background
+    'invert': 'auto',  # True, False or 'auto' (light text on dark background)
+    'scale': 2,  # integer upscale factor
+}
+
+# OCR result cache keyed by a perceptual hash of the preprocessed region
+OCR_CACHE_ENABLED = True
+OCR_CACHE_SIZE = 256  # max cached frames (LRU)
+# Max differing pixels counted as the same frame. Level digits differ by only a
+# few pixels, so keep this at 0 unless the region is noisy
+OCR_CACHE_MAX_DISTANCE = 0
+OCR_CACHE_FILE = 'polisher_ocr_cache.json'
+
+# Template matching fast path for the result dialog (falls back to OCR when unsure)
+TEMPLATES_ENABLED = True
+TEMPLATES_FILE = 'polisher_templates.npz'
+TEMPLATE_MIN_SCORE = 0.9  # normalized correlation needed to trust a match
+TEMPLATE_MIN_MARGIN = 0.05  # required lead over the next best label
+TEMPLATE_SAMPLES = 5  # OCR-labelled samples averaged into one template
+
+# OCR text parser: allowed typos per key phrase, as a share of its length
+OCR_PARSE_MAX_ERROR_RATE = 0.15
+
+# Frame recorder - save every captured region with OCR text, parse result and
+# timings into a corpus (see corpus.py) for autotune.py and replay_benchmark.py
+FRAME_RECORDER_ENABLED = False
+FRAME_CORPUS_DIR = 'polisher_corpus'
+
+# Loop metrics in Prometheus text format on http://METRICS_HOST:METRICS_PORT/metrics (see metrics.py)
+METRICS_ENABLED = False
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9464
+
+# Phase tracing - spans in a ring buffer, saved as Chrome trace JSON from the tray menu (see tracer.py)
+TRACE_ENABLED = False  # can also be toggled from the tray menu
+TRACE_CAPACITY = 65536  # spans kept, oldest are overwritten
+TRACE_DIR = 'polisher_traces'
+
 # Application settings
 APP_NAME = 'Screen Text Capture'
 ICON_SIZE = (64, 64)
@@ -15,10 +61,28 @@ ICON_SIZE = (64, 64)
 SELECTION_OVERLAY_ALPHA = 0.3
 SELECTION_LINE_COLOR = 'red'
 SELECTION_LINE_WIDTH = 2
+# Notifications are toasts in the screen corner that close by themselves (click closes early)
+NOTIFICATION_SECONDS = 4.0
+NOTIFICATION_LIMIT = 5  # toasts on screen at once, the oldest is closed first
+# How often the UI thread picks up commands from other threads (in seconds)
+UI_POLL_INTERVAL = 0.05
+
+# How long F10 waits for the previous loop to finish its cleanup before refusing to start (in seconds)
+LOOP_STOP_TIMEOUT = 2.0
 
-# OCR Delay (in seconds) - time to wait after action before capturing OCR
+# OCR Delay (in seconds) - max time to wait after action before capturing OCR
 OCR_DELAY = 3.5
 
+# Result watcher - start OCR as soon as the result dialog appears and settles
+# instead of always waiting OCR_DELAY (OCR_DELAY then works as a timeout)
+OCR_WATCH_ENABLED = True
+OCR_WATCH_INTERVAL = 0.05  # seconds between cheap captures
+OCR_WATCH_STABLE_FRAMES = 3  # unchanged frames in a row before OCR
+OCR_WATCH_DOWNSAMPLE = 4  # take every N-th pixel
+OCR_WATCH_PIXEL_DELTA = 24  # brightness change counted as a changed pixel
+OCR_WATCH_CHANGED_SHARE = 0.005  # share of changed pixels counted as a changed frame
+OCR_WATCH_MIN_CONTRAST = 10.0  # brightness std below this means the region is empty
+
 # Random delay bounds (in seconds) - random delay before executing next action
 RANDOM_DELAY_MIN = 3
 RANDOM_DELAY_MAX = 8
@@ -37,6 +101,30 @@ SETTINGS_FILE = 'polisher_settings.json'
 # Statistics file path
 STATISTICS_FILE = 'polisher_statistics.jsonl'
 
+# Statistics storage: 'jsonl' (STATISTICS_FILE), 'sqlite' (STATISTICS_DB, see stats_db.py)
+# or 'binary' (STATISTICS_BINARY_FILE, fixed-width records, see stats_binary.py)
+STATISTICS_BACKEND = 'jsonl'
+STATISTICS_DB = 'polisher_statistics.db'
+STATISTICS_BINARY_FILE = 'polisher_statistics.bin'
+
+# analyze_statistics.py keeps its counters here and only reads lines appended since
+STATISTICS_CHECKPOINT_FILE = 'polisher_statistics.checkpoint.json'
+STATISTICS_WATCH_INTERVAL = 2.0  # seconds between checks in --watch mode
+# Without session ids (old records) a pause longer than this starts a new session
+STATISTICS_SESSION_GAP = 600
+# Files (or appended tails) smaller than this are parsed without the process pool
+STATISTICS_PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+# Statistics writer - records are written by a background thread (see stats_sink.py)
+STATISTICS_FLUSH_EVERY = 20  # flush after this many records
+STATISTICS_FLUSH_INTERVAL = 2.0  # or after this many seconds
+STATISTICS_DURABILITY = 'flush'  # 'flush' - OS buffers only, 'fsync' - force to disk (sqlite: synchronous=FULL)
+
+# F1/F5 policy table (see policy.py); without it the loop uses F5 from POLICY_F5_FROM_LEVEL
+POLICY_FILE = 'polisher_policy.json'
+POLICY_F5_FROM_LEVEL = 3
+POLICY_MIN_ATTEMPTS = 30  # an action is considered at a level only with this many attempts there
+
 def configure_tesseract():
     """Configure tesseract path if on Windows"""
     if sys.platform == 'win32' and os.path.exists(TESSERACT_CMD):
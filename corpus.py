@@ -0,0 +1,61 @@
+"""
+Корпус кадров окна результата для Polisher
+
+Корпус - это папка с PNG изображениями выбранной области (grayscale, до
+предобработки) и файлом frames.jsonl, по одной записи на кадр:
+
+{"file": "000001.png", "text": "...", "action": "f1", "value": null}
+
+action/value - ожидаемый результат parse_ocr_result для кадра. Такой корпус
+используют autotune.py и бенчмарки.
+"""
+
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+CORPUS_INDEX = 'frames.jsonl'
+
+
+def load_corpus(directory):
+    """Читает frames.jsonl и возвращает список записей с полным путем в 'path'"""
+    records = []
+    index_path = os.path.join(directory, CORPUS_INDEX)
+
+    if not os.path.exists(index_path):
+        print(f"Файл корпуса {index_path} не найден!")
+        return records
+
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Ошибка чтения строки: {e}")
+                continue
+            record['path'] = os.path.join(directory, record['file'])
+            records.append(record)
+
+    return records
+
+
+def load_frame(record):
+    """Загружает кадр записи как grayscale массив uint8"""
+    with Image.open(record['path']) as img:
+        return np.asarray(img.convert('L'))
+
+
+def outcome_of(action, value):
+    """Переводит (action, value) из parse_ocr_result в (исход, уровень) без учета стратегии F1/F5"""
+    if action == 'stop':
+        return ('success', 10)
+    if action in ('f1', 'f5'):
+        if value is None:
+            return ('failed', None)
+        return ('success', value)
+    return ('unknown', None)
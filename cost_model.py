@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Сколько стоит +10: модель заточки как поглощающая цепь Маркова
+
+По статистике попыток строится эмпирическая матрица переходов уровень -> уровень
+для каждого действия (F1, F5). Политика цикла (таблица POLICY_FILE, см. policy.py,
+или --default-policy - прежнее правило) дает одну цепь с поглощающим состоянием +10, для которой:
+- точно: ожидаемое число попыток и его разброс из фундаментальной матрицы
+  N = (I - Q)^-1;
+- Монте-Карло: векторный прогон на NumPy сразу по всем запускам (по умолчанию
+  миллион), среднее с 95% доверительным интервалом и перцентили.
+Время переводится из попыток по средней длительности цикла из статистики.
+
+Пример:
+    python cost_model.py --runs 1000000
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from config import STATISTICS_BACKEND
+from policy import default_actions, load_policy
+from stats_aggregate import ACTIONS, LEVELS, MAX_LEVEL, RESULTS, load_counters, iter_source
+from stats_sessions import analyze_sessions
+from stats_sink import default_path
+
+
+def transition_counts(counters):
+    """Счетчики попыток в массив [действие, с уровня, на уровень]"""
+    counts = np.asarray(counters.counts, dtype=np.int64).reshape(LEVELS, LEVELS, len(ACTIONS), len(RESULTS))
+    return counts.sum(axis=3).transpose(2, 0, 1)
+
+
+def policy_matrix(counts, policy):
+    """Матрица переходов цепи для политики, возвращает (P, замечания)
+
+    Если на уровне нет данных для действия политики, берется другое действие;
+    если нет данных ни для какого - ValueError.
+    """
+    matrix = np.zeros((LEVELS, LEVELS))
+    matrix[MAX_LEVEL, MAX_LEVEL] = 1.0
+    notes = []
+    for level in range(MAX_LEVEL):
+        action = policy[level]
+        row = counts[ACTIONS.index(action), level]
+        if row.sum() == 0:
+            other = ACTIONS[1 - ACTIONS.index(action)]
+            row = counts[ACTIONS.index(other), level]
+            if row.sum() == 0:
+                raise ValueError(f"нет попыток с уровня +{level}")
+            notes.append(f"+{level}: нет данных для {action}, взяты данные {other}")
+        matrix[level] = row / row.sum()
+    return matrix, notes
+
+
+def check_absorbing(matrix):
+    """Уровни, с которых +10 недостижим (по данным еще ни разу не поднимались дальше)"""
+    reachable = {MAX_LEVEL}
+    changed = True
+    while changed:
+        changed = False
+        for level in range(MAX_LEVEL):
+            if level not in reachable and any(matrix[level, target] > 0 for target in reachable):
+                reachable.add(level)
+                changed = True
+    return [level for level in range(MAX_LEVEL) if level not in reachable]
+
+
+def expected_attempts(matrix):
+    """Точное ожидание и стандартное отклонение числа попыток до +10 с каждого уровня"""
+    transient = matrix[:MAX_LEVEL, :MAX_LEVEL]
+    identity = np.eye(MAX_LEVEL)
+    fundamental = np.linalg.inv(identity - transient)
+    mean = fundamental.sum(axis=1)
+    variance = (2 * fundamental - identity) @ mean - mean * mean
+    return mean, np.sqrt(np.maximum(variance, 0.0))
+
+
+def block_kernel(matrix, block):
+    """Исходы block шагов цепи с каждого уровня: поглощение на шаге 1..block или уровень после block шагов
+
+    Строка уровня s: [P(+10 впервые на шаге 1), ..., P(+10 впервые на шаге block),
+    P(уровень 0 после block шагов), ..., P(уровень 9 после block шагов)].
+    """
+    transient = matrix[:MAX_LEVEL, :MAX_LEVEL]
+    absorb = matrix[:MAX_LEVEL, MAX_LEVEL]
+    kernel = np.zeros((MAX_LEVEL, block + MAX_LEVEL))
+    power = np.eye(MAX_LEVEL)  # Q^(j-1)
+    for step in range(block):
+        kernel[:, step] = power @ absorb
+        power = power @ transient
+    kernel[:, block:] = power
+    return kernel
+
+
+def monte_carlo(matrix, runs, rng, start=0, block=64, max_attempts=1000000):
+    """Число попыток до +10 для runs независимых запусков (векторно по всем сразу)
+
+    Запуски идут блоками по block попыток: исход блока (на какой попытке взят +10
+    или на каком уровне запуск после блока) выбирается одним случайным числом по
+    точному распределению block шагов цепи (block_kernel), так что на миллион
+    запусков уходит в block раз меньше итераций, чем при пошаговом прогоне.
+    Выбор - один searchsorted по склеенным накопленным строкам: строка уровня l
+    сдвинута на l, поэтому l + u попадает в свою строку. Закончившие запуски
+    выбрасываются из рабочих массивов.
+    Возвращает (попытки, число оборванных по max_attempts).
+    """
+    kernel = block_kernel(matrix, block)
+    width = kernel.shape[1]
+    cumulative = np.cumsum(kernel, axis=1)
+    cumulative /= cumulative[:, -1:]
+    cumulative[:, -1] = 1.0
+    flat = (cumulative + np.arange(MAX_LEVEL)[:, None]).ravel()
+
+    result = np.zeros(runs, dtype=np.int64)
+    ids = np.arange(runs)
+    levels = np.full(runs, start, dtype=np.int64)
+    attempts = 0
+    while ids.size and attempts < max_attempts:
+        u = rng.random(ids.size)
+        outcome = np.searchsorted(flat, levels + u, side='right') - levels * width
+        done = outcome < block
+        if done.any():
+            result[ids[done]] = attempts + outcome[done] + 1
+            keep = ~done
+            ids = ids[keep]
+            outcome = outcome[keep]
+        levels = outcome - block
+        attempts += block
+    result[ids] = attempts
+    return result, ids.size
+
+
+def mean_cycle_seconds(path, backend):
+    """Средняя длительность цикла по статистике (между соседними попытками сессии)"""
+    analyzer = analyze_sessions(iter_source(path, backend))
+    if not analyzer.cycle_count:
+        return None
+    return analyzer.cycle_sum / analyzer.cycle_count
+
+
+def format_hours(attempts, cycle_seconds):
+    if cycle_seconds is None:
+        return ""
+    return f" = {attempts * cycle_seconds / 3600:.2f} ч"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Ожидаемая стоимость +10 по статистике Polisher')
+    arg_parser.add_argument('path', nargs='?', default=None, help='файл статистики (по умолчанию из config.py)')
+    arg_parser.add_argument('--backend', choices=('jsonl', 'sqlite', 'binary'), default=STATISTICS_BACKEND,
+                            help='формат файла статистики')
+    arg_parser.add_argument('--runs', type=int, default=1000000, help='запусков Монте-Карло (0 - без него)')
+    arg_parser.add_argument('--default-policy', action='store_true',
+                            help='прежнее правило (F5 с POLICY_F5_FROM_LEVEL) вместо таблицы политики')
+    arg_parser.add_argument('--seed', type=int, default=None, help='seed генератора случайных чисел')
+    arg_parser.add_argument('--cycle-seconds', type=float, default=None,
+                            help='длительность цикла, сек (по умолчанию - средняя по статистике)')
+    args = arg_parser.parse_args()
+
+    path = args.path or default_path(args.backend)
+    if not os.path.exists(path):
+        print(f"Файл статистики {path} не найден!")
+        return
+
+    counters = load_counters(path, args.backend)
+    if not counters.total:
+        print("Нет данных для анализа.")
+        return
+
+    policy = default_actions() if args.default_policy else load_policy().actions
+    try:
+        matrix, notes = policy_matrix(transition_counts(counters), policy)
+    except ValueError as e:
+        print(f"Недостаточно данных для модели: {e}")
+        return
+    stuck = check_absorbing(matrix)
+    if stuck:
+        print("По данным +10 недостижим с уровней: " + ", ".join(f"+{level}" for level in stuck))
+        return
+
+    cycle_seconds = args.cycle_seconds
+    if cycle_seconds is None:
+        cycle_seconds = mean_cycle_seconds(path, args.backend)
+
+    print("\n" + "="*70)
+    print(f"СТОИМОСТЬ +10 (попыток в статистике: {counters.total})")
+    print("="*70)
+    print("Политика: " + " ".join(f"+{level}:{action}" for level, action in enumerate(policy)))
+    for note in notes:
+        print(f"  {note}")
+    if cycle_seconds is not None:
+        print(f"Длительность цикла: {cycle_seconds:.1f} сек")
+
+    mean, std = expected_attempts(matrix)
+    print("\n--- ТОЧНО (поглощающая цепь Маркова) ---")
+    print(f"  с +0: {mean[0]:.1f} попыток (σ {std[0]:.1f}){format_hours(mean[0], cycle_seconds)}")
+    for level in range(1, MAX_LEVEL):
+        print(f"  с +{level}: {mean[level]:.1f} попыток (σ {std[level]:.1f}){format_hours(mean[level], cycle_seconds)}")
+
+    if args.runs > 0:
+        rng = np.random.default_rng(args.seed)
+        started = time.perf_counter()
+        attempts, truncated = monte_carlo(matrix, args.runs, rng)
+        elapsed = time.perf_counter() - started
+
+        sample_mean = attempts.mean()
+        half_width = 1.96 * attempts.std(ddof=1) / np.sqrt(len(attempts)) if len(attempts) > 1 else 0.0
+        p5, p50, p95 = np.percentile(attempts, [5, 50, 95])
+        print(f"\n--- МОНТЕ-КАРЛО ({args.runs} запусков, {elapsed:.2f} сек) ---")
+        print(f"  среднее: {sample_mean:.1f} попыток, 95% ДИ [{sample_mean - half_width:.1f}, "
+              f"{sample_mean + half_width:.1f}]{format_hours(sample_mean, cycle_seconds)}")
+        print(f"  медиана: {p50:.0f}, 90% запусков: от {p5:.0f} до {p95:.0f} попыток")
+        if cycle_seconds is not None:
+            print(f"  время: медиана {p50 * cycle_seconds / 3600:.2f} ч, "
+                  f"90% запусков от {p5 * cycle_seconds / 3600:.2f} до {p95 * cycle_seconds / 3600:.2f} ч")
+        if truncated:
+            print(f"  ⚠ {truncated} запусков оборваны по лимиту попыток")
+    print("="*70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
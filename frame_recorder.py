@@ -0,0 +1,85 @@
+"""
+Запись кадров OCR в корпус для Polisher
+
+Сохраняет каждый захваченный кадр выбранной области вместе с текстом OCR,
+результатом parse_ocr_result и замерами времени в формате corpus.py. Запись на
+диск идет в фоновом потоке, цикл только кладет кадр в очередь.
+"""
+
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+from config import FRAME_CORPUS_DIR
+
+
+class FrameRecorder:
+    def __init__(self, directory=FRAME_CORPUS_DIR, max_pending=256):
+        self.directory = directory
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.prefix = None
+        self.count = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Префикс по времени запуска, чтобы файлы разных запусков не пересекались
+        self.prefix = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+        print(f"Frame recorder started: {self.directory}")
+
+    def record(self, frame, text, action, value, timings):
+        """Ставит кадр в очередь на запись (frame копируется, буфер захвата можно переиспользовать)"""
+        if self.thread is None:
+            return
+        self.count += 1
+        record = {
+            'file': f"{self.prefix}_{self.count:06d}.png",
+            'timestamp': datetime.now().isoformat(),
+            'text': text,
+            'action': action,
+            'value': value,
+            'timings': timings,
+        }
+        try:
+            self.queue.put_nowait((frame.copy(), record))
+        except queue.Full:
+            # Диск не успевает - лучше потерять кадр, чем тормозить цикл
+            self.dropped += 1
+
+    def _writer(self):
+        # PIL и corpus (numpy) нужны только потоку записи
+        from PIL import Image
+
+        from corpus import CORPUS_INDEX
+
+        index_path = os.path.join(self.directory, CORPUS_INDEX)
+        with open(index_path, 'a', encoding='utf-8') as index:
+            while True:
+                item = self.queue.get()
+                try:
+                    if item is None:
+                        return
+                    frame, record = item
+                    Image.fromarray(frame).save(os.path.join(self.directory, record['file']))
+                    index.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    index.flush()
+                except Exception as e:
+                    print(f"Error recording frame: {e}")
+                finally:
+                    self.queue.task_done()
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток записи"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        print(f"Frame recorder stopped: {self.count} frames, {self.dropped} dropped")
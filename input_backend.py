@@ -0,0 +1,32 @@
+"""
+Ввод (клавиатура и мышь) для Polisher
+
+Действия F1/F5 + перетаскивание + клик идут через объект ввода, чтобы симулятор
+мог подставить свою реализацию (см. simulator.py).
+"""
+
+
+class DesktopInput:
+    def __init__(self):
+        import keyboard
+        import pyautogui
+
+        # Отключаем защиту от случайных движений мыши в pyautogui
+        pyautogui.FAILSAFE = False
+        self.keyboard = keyboard
+        self.pyautogui = pyautogui
+
+    def press_key(self, key):
+        self.keyboard.press(key)
+
+    def release_key(self, key):
+        self.keyboard.release(key)
+
+    def move_to(self, x, y, duration):
+        self.pyautogui.moveTo(x, y, duration=duration)
+
+    def mouse_down(self):
+        self.pyautogui.mouseDown()
+
+    def mouse_up(self):
+        self.pyautogui.mouseUp()
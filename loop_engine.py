@@ -0,0 +1,296 @@
+"""
+Цикл заточки Polisher как конечный автомат на asyncio
+
+Состояния: act -> wait_result -> capture -> parse -> log -> delay -> act ...
+Автомат крутится в event loop на потоке цикла. Все ожидания (окно результата,
+повтор OCR, случайная задержка) - это await, которые снимаются отменой задачи,
+поэтому остановка по F10 срабатывает за миллисекунды. Действие F1/F5 и OCR
+выполняются в отдельном потоке: нажатия и перетаскивание не прерываются на
+середине, а event loop в это время остается отзывчивым.
+
+Для каждого состояния копится время выполнения (см. state_summary), счетчики
+попыток и гистограммы длительностей идут в app.metrics (см. metrics.py), а
+отрезки состояний - в app.tracer (см. tracer.py).
+
+LoopScheduler крутит автоматы нескольких рабочих областей в одном event loop с
+общим потоком действий и OCR: серии ввода идут строго по очереди, а ожидания
+окна результата и задержки разных областей перекрываются.
+"""
+
+import asyncio
+import random
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from config import OCR_DELAY, OCR_WATCH_ENABLED, RANDOM_DELAY_MIN, RANDOM_DELAY_MAX
+
+ACT = 'act'
+WAIT_RESULT = 'wait_result'
+CAPTURE = 'capture'
+PARSE = 'parse'
+LOG = 'log'
+DELAY = 'delay'
+STATES = (ACT, WAIT_RESULT, CAPTURE, PARSE, LOG, DELAY)
+
+# Пауза перед повторным OCR, если текст не распознан
+RETRY_DELAY = 1.0
+
+
+class LoopEngine:
+    def __init__(self, app):
+        self.app = app
+        self.loop = None
+        self.task = None
+        self.executor = None
+        self.current_level = 0
+        self.state = None
+        # Префикс сообщений рабочей области (у основной его нет)
+        self.label = f"[{app.name}] " if app.name else ""
+        # state -> [число входов, суммарное время, максимум]
+        self.state_stats = {state: [0, 0.0, 0.0] for state in STATES}
+        metrics = app.metrics
+        self.state_histograms = {ACT: metrics.action_seconds, PARSE: metrics.parse_seconds}
+
+    def run(self):
+        """Запускает автомат в текущем потоке и ждет его завершения"""
+        LoopScheduler([self]).run()
+
+    def cancel(self):
+        """Останавливает автомат из любого потока: текущее ожидание прерывается сразу"""
+        loop = self.loop
+        task = self.task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # event loop уже закрыт - автомат и так остановился
+                pass
+
+    async def _timed(self, state, awaitable):
+        """Выполняет состояние и записывает его длительность"""
+        self.state = state
+        clock = self.app.clock
+        started = clock.monotonic()
+        try:
+            with self.app.tracer.span(state):
+                return await awaitable
+        finally:
+            elapsed = clock.monotonic() - started
+            stats = self.state_stats[state]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            histogram = self.state_histograms.get(state)
+            if histogram is not None:
+                histogram.observe(elapsed)
+
+    async def _blocking(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+    async def _act(self, action):
+        app = self.app
+        if OCR_WATCH_ENABLED:
+            await self._blocking(app.arm_result_watch)
+        print(f"{self.label}Executing {action} action in loop (level +{self.current_level})")
+        if action == 'F5':
+            return await self._blocking(app.execute_drag_action_f5, True)
+        return await self._blocking(app.execute_drag_action, True)
+
+    async def _wait_result(self):
+        app = self.app
+        if not OCR_WATCH_ENABLED:
+            await app.clock.wait(OCR_DELAY)
+            return
+        started = app.clock.monotonic()
+        if await app.result_watcher.wait(app.selected_region, OCR_DELAY, self.executor):
+            print(f"Result dialog detected after {app.clock.monotonic() - started:.2f} sec")
+
+    async def _delay(self):
+        random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
+        print(f"Случайная задержка: {random_delay:.2f} сек")
+        await self.app.clock.wait(random_delay)
+
+    def _log(self, action, parsed):
+        """Записывает попытку и возвращает следующее действие ('F1', 'F5') или None для остановки"""
+        app = self.app
+        result, value = parsed
+        level = self.current_level
+        metrics = app.metrics
+        metrics.attempts.inc(action=action)
+
+        if result == 'stop':
+            print("Цикл завершен! Достигнут +10!")
+            app.log_statistics(level, action, 'success', 10)
+            metrics.successes.inc(action=action)
+            self.current_level = 10
+            return None
+
+        if value is None:
+            if action == 'F5':
+                print("F5 failed (поломка!), предмет упал на 0")
+                app.log_statistics(level, 'F5', 'failed', 0)
+                metrics.breaks.inc()
+                self.current_level = 0
+            else:
+                print("F1 failed, уровень не изменился")
+                app.log_statistics(level, 'F1', 'failed', level)
+        else:
+            print(f"{action} success to level {value}")
+            app.log_statistics(level, action, 'success', value)
+            metrics.successes.inc(action=action)
+            self.current_level = value
+
+        # Следующее действие по таблице политики для нового уровня (и после неудачи тоже)
+        return 'F5' if app.action_for_level(self.current_level)[0] == 'f5' else 'F1'
+
+    async def _run(self):
+        app = self.app
+        self.current_level = 0
+        action = 'F5' if app.action_for_level(0)[0] == 'f5' else 'F1'
+
+        while app.loop_running:
+            cycle_started = app.clock.monotonic()
+            if not app.drag_point_a or not app.drag_point_b or not app.drag_point_c:
+                print("Цикл остановлен: точки A, B, C не настроены!")
+                break
+            if not app.selected_region:
+                print("Цикл остановлен: область OCR не выбрана!")
+                break
+
+            if not await self._timed(ACT, self._act(action)):
+                print(f"Failed to execute {action} action, stopping loop")
+                break
+            if not app.loop_running:
+                break
+
+            await self._timed(WAIT_RESULT, self._wait_result())
+            if not app.loop_running:
+                break
+
+            # Захват и разбор, при нераспознанном тексте - один повтор через секунду
+            parsed = None
+            ocr_text = None
+            for attempt in range(2):
+                if attempt:
+                    app.metrics.ocr_retries.inc()
+                    print("Делаем повторную попытку OCR через 1 секунду...")
+                    await self._timed(DELAY, app.clock.wait(RETRY_DELAY))
+                ocr_text = await self._timed(CAPTURE, self._blocking(app.capture_ocr_only))
+                if not ocr_text:
+                    parsed = None
+                    break
+                parsed = await self._timed(PARSE, self._parse(ocr_text))
+                print(f"OCR результат после {action}: action={parsed[0]}, value={parsed[1]}")
+                if parsed[0] != 'unknown':
+                    break
+                app.metrics.unknown_parses.inc()
+                print(f"Текст не распознан. OCR: {ocr_text}")
+
+            if parsed is None:
+                print("Цикл остановлен: не удалось прочитать OCR")
+                break
+            if parsed[0] == 'unknown':
+                print(f"Цикл остановлен: текст не распознан после 2 попыток. OCR: {ocr_text}")
+                break
+
+            action = await self._timed(LOG, self._log_async(action, parsed))
+            if action is None:
+                app.show_notification(f"{self.label}Успех! Достигнут +10!")
+                break
+
+            if not app.loop_running:
+                break
+            await self._timed(DELAY, self._delay())
+            app.metrics.cycle_seconds.observe(app.clock.monotonic() - cycle_started)
+
+        app.loop_running = False
+
+    async def _parse(self, text):
+        return self.app.parse_ocr_result(text)
+
+    async def _log_async(self, action, parsed):
+        return self._log(action, parsed)
+
+    def state_summary(self):
+        parts = []
+        for state in STATES:
+            count, total, longest = self.state_stats[state]
+            if count:
+                parts.append(f"{state}: {count}x avg {total / count:.3f}s max {longest:.3f}s")
+        if not parts:
+            return f"{self.label}Loop states: no data"
+        return f"{self.label}Loop states: " + ", ".join(parts)
+
+
+class LoopScheduler:
+    """Автоматы нескольких рабочих областей в одном event loop
+
+    Блокирующие шаги всех областей (серия F1/F5 с перетаскиванием и кликом, захват
+    и OCR) идут через один поток по очереди: серии ввода на общей мыши и клавиатуре
+    не перемешиваются, а пока одна область ждет окно результата или случайную
+    задержку, поток занят другими. Попыток в час становится больше с числом
+    областей, пока поток ввода не занят целиком.
+
+    restart(engine) - вызывается, когда автомат области остановился сам (например,
+    на +10); если вернет True, автомат запускается заново (симулятор так выдает
+    новый предмет).
+    """
+
+    def __init__(self, engines, restart=None):
+        self.engines = engines
+        self.restart = restart
+
+    def run(self):
+        """Запускает все автоматы в текущем потоке и ждет, пока остановятся все"""
+        loop = asyncio.new_event_loop()
+        # Один поток на действия и OCR: контекст mss и модели tesseract живут в нем
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='polisher-io')
+        try:
+            running = {}
+            for engine in self.engines:
+                engine.loop = loop
+                engine.executor = executor
+                engine.task = loop.create_task(engine._run())
+                running[engine.task] = engine
+            while running:
+                # Ждем первый остановившийся автомат через future, а не asyncio.wait: так
+                # в event loop нет лишних задач (по ним VirtualClock в симуляторе решает,
+                # когда сдвигать время)
+                stopped = loop.create_future()
+
+                def wake(task, stopped=stopped):
+                    if not stopped.done():
+                        stopped.set_result(None)
+
+                for task in running:
+                    task.add_done_callback(wake)
+                loop.run_until_complete(stopped)
+                for task in list(running):
+                    task.remove_done_callback(wake)
+                    if not task.done():
+                        continue
+                    engine = running.pop(task)
+                    # Ошибка в одной области не останавливает остальные, о ней только сообщаем
+                    if task.cancelled():
+                        print(f"{engine.label}Loop cancelled")
+                    elif task.exception() is not None:
+                        error = task.exception()
+                        print(f"{engine.label}Error in loop: {error}")
+                        traceback.print_exception(type(error), error, error.__traceback__)
+                    elif self.restart is not None and self.restart(engine):
+                        engine.task = loop.create_task(engine._run())
+                        running[engine.task] = engine
+        finally:
+            sessions = {id(engine.app.capture_session): engine.app.capture_session for engine in self.engines}
+            for session in sessions.values():
+                executor.submit(session.close).result()
+            executor.shutdown(wait=True)
+            loop.close()
+            for engine in self.engines:
+                # Автомат мог уже перейти к следующему запуску: его состояние не трогаем
+                if engine.loop is not loop:
+                    continue
+                engine.loop = None
+                engine.task = None
+                engine.app.loop_running = False
+                print(engine.state_summary())
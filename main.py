@@ -1,25 +1,29 @@
-import pystray
-from PIL import Image, ImageDraw, ImageGrab
-import pytesseract
-import mss
-import tkinter as tk
-from tkinter import messagebox
-import pyperclip
 import threading
 import sys
-import pyautogui
 import time
-import keyboard
 import json
 import os
 import random
-from config import configure_tesseract, OCR_LANG, APP_NAME, OCR_DELAY, SETTINGS_FILE, STATISTICS_FILE, RANDOM_DELAY_MIN, RANDOM_DELAY_MAX, CLICK_DELAY_MIN, CLICK_DELAY_MAX, MOUSE_SPEED_MIN, MOUSE_SPEED_MAX
-
-# Configure Tesseract on startup
-configure_tesseract()
+from clock import RealClock
+from input_backend import DesktopInput
+from ocr_engine import OcrEngine
+from ocr_parser import OcrParser
+from frame_recorder import FrameRecorder
+from metrics import LoopMetrics, MetricsServer
+from tracer import Tracer
+from ui_thread import UiThread
+from policy import PolicyTable, load_policy, recompute_policy
+from stats_sink import StatisticsSink, default_path, workspace_path
+from config import APP_NAME, SETTINGS_FILE, STATISTICS_BACKEND, OCR_PREPROCESS, OCR_CACHE_ENABLED, TEMPLATES_ENABLED, FRAME_RECORDER_ENABLED, METRICS_ENABLED, POLICY_FILE, LOOP_STOP_TIMEOUT, CLICK_DELAY_MIN, CLICK_DELAY_MAX, MOUSE_SPEED_MIN, MOUSE_SPEED_MAX
+
+# Тяжелые модули (numpy, PIL, mss, tkinter, asyncio, tesserocr) импортируются при
+# первом использовании, а не при запуске: иконка в трее появляется быстрее.
+# Время импорта по модулям - python startup_benchmark.py
 
 
 class RegionSelector:
+    """Выбор области на полупрозрачном окне во весь экран (на потоке интерфейса, см. ui_thread.py)"""
+
     def __init__(self):
         self.start_x = None
         self.start_y = None
@@ -29,9 +33,11 @@ class RegionSelector:
         self.root = None
         self.canvas = None
 
-    def select_region(self, callback):
+    def select_region(self, root, callback):
+        import tkinter as tk
+
         self.callback = callback
-        self.root = tk.Tk()
+        self.root = tk.Toplevel(root)
         self.root.attributes('-fullscreen', True)
         self.root.attributes('-alpha', 0.3)
         self.root.attributes('-topmost', True)
@@ -64,7 +70,7 @@ class RegionSelector:
             font=('Arial', 14, 'bold')
         )
 
-        self.root.mainloop()
+        self.root.focus_force()
 
     def on_press(self, event):
         self.start_x = event.x
@@ -103,18 +109,31 @@ class RegionSelector:
 
 
 class PointSelector:
+    """Выбор точек A, B, C (или точки фокуса) на полупрозрачном окне во весь экран (на потоке интерфейса)"""
+
     def __init__(self):
         self.points = []
         self.root = None
         self.canvas = None
         self.circles = []
+        self.count = 3
+
+    def select_three_points(self, root, callback):
+        self._open(root, callback, 3, "Кликните на точку A (начало перетаскивания). ESC - отмена")
+
+    def select_focus_point(self, root, callback):
+        """Одна точка: клик по ней перед F1/F5 делает окно рабочей области активным"""
+        self._open(root, callback, 1, "Кликните в окно игры этой области (точка фокуса). ESC - отмена")
+
+    def _open(self, root, callback, count, instruction_text):
+        import tkinter as tk
 
-    def select_three_points(self, callback):
         self.callback = callback
+        self.count = count
         self.points = []
         self.circles = []
 
-        self.root = tk.Tk()
+        self.root = tk.Toplevel(root)
         self.root.attributes('-fullscreen', True)
         self.root.attributes('-alpha', 0.3)
         self.root.attributes('-topmost', True)
@@ -139,24 +158,24 @@ class PointSelector:
         self.instruction_label = self.canvas.create_text(
             screen_width // 2,
             30,
-            text="Кликните на точку A (начало перетаскивания). ESC - отмена",
+            text=instruction_text,
             fill='white',
             font=('Arial', 14, 'bold')
         )
 
-        self.root.mainloop()
+        self.root.focus_force()
 
     def on_click(self, event):
-        # Prevent clicks after 3 points are already selected
-        if len(self.points) >= 3:
+        # Prevent clicks after all points are already selected
+        if len(self.points) >= self.count:
             return
 
         x, y = event.x, event.y
         self.points.append((x, y))
 
         # Рисуем круг в месте клика
-        colors = ['green', 'red', 'blue']
-        labels = ['A', 'B', 'C']
+        colors = ['green', 'red', 'blue'] if self.count == 3 else ['orange']
+        labels = ['A', 'B', 'C'] if self.count == 3 else ['Фокус']
         point_idx = len(self.points) - 1
 
         color = colors[point_idx]
@@ -176,7 +195,10 @@ class PointSelector:
             font=('Arial', 12, 'bold')
         )
 
-        if len(self.points) == 1:
+        if len(self.points) == self.count:
+            # Все точки выбраны
+            self.root.after(500, self.finish)
+        elif len(self.points) == 1:
             # Ожидаем выбора точки B
             self.canvas.itemconfig(
                 self.instruction_label,
@@ -188,35 +210,154 @@ class PointSelector:
                 self.instruction_label,
                 text="Кликните на точку C (клик после перетаскивания). ESC - отмена"
             )
-        elif len(self.points) == 3:
-            # Все точки выбраны
-            self.root.after(500, self.finish)
 
     def finish(self):
-        point_a = self.points[0]
-        point_b = self.points[1]
-        point_c = self.points[2]
+        points = list(self.points)
         self.root.destroy()
 
         if self.callback:
-            self.callback(point_a, point_b, point_c)
+            self.callback(*points)
 
     def cancel(self):
         self.root.destroy()
 
 
 class ScreenTextCapture:
-    def __init__(self):
+    def __init__(self, clock=None, input_backend=None, capture_session=None, ocr_engine=None,
+                 persistent=True, parent=None, name=None):
+        """clock, input_backend, capture_session, ocr_engine - подмена окружения (симулятор)
+
+        persistent=False - не читать и не писать настройки, кэш OCR и шаблоны на диске.
+        parent - основной экземпляр, тогда это рабочая область name: свои область,
+        точки, уровень и статистика, а ввод, захват, OCR, метрики и политика общие.
+        """
+        self.name = name
+        self.parent = parent
+        if parent is not None:
+            persistent = False
+            clock = parent.clock
+            capture_session = parent.capture_session
+            ocr_engine = parent.ocr_engine
         self.selected_region = None
         self.icon = None
         self.drag_point_a = None
         self.drag_point_b = None
         self.drag_point_c = None
+        # Точка, по которой кликаем перед клавишей, чтобы окно области стало активным
+        self.focus_point = None
         self.loop_running = False
         self.loop_thread = None
-        self.load_settings()
+        self.ocr_profile = None
+        self.preprocess_options = dict(OCR_PREPROCESS)
+        self.statistics_file = default_path(STATISTICS_BACKEND)
+        # Таблица F1/F5 по уровням (см. policy.py); без файла - прежнее правило
+        self.policy_file = POLICY_FILE if persistent else None
+        self.policy = PolicyTable()
+        self.session_id = None
+        self.session_seq = 0
+        # Дополнительные рабочие области (экземпляры с parent=self) и их настройки
+        self.workspaces = []
+        self.workspace_settings = []
+        self.persistent = persistent
+        self.clock = clock or RealClock()
+        self.input = input_backend
+        self.ocr_engine = ocr_engine or OcrEngine()
+        # Захват, окно результата, кэш OCR, шаблоны и автомат цикла создаются при
+        # первом обращении (см. свойства ниже)
+        self._capture_session = capture_session
+        self._result_watcher = None
+        self._ocr_cache = None
+        self._template_classifier = None
+        self._loop_engine = None
+        if parent is not None:
+            self.ocr_profile = parent.ocr_profile
+            self.preprocess_options = parent.preprocess_options
+            self.ocr_parser = parent.ocr_parser
+            self.frame_recorder = parent.frame_recorder
+            self.metrics = parent.metrics
+            self.tracer = parent.tracer
+            self.metrics_server = parent.metrics_server
+            self.ui = parent.ui
+            self.policy = parent.policy
+        else:
+            self.ocr_parser = OcrParser()
+            self.frame_recorder = FrameRecorder()
+            self.metrics = LoopMetrics()
+            self.tracer = Tracer()
+            self.metrics_server = MetricsServer(self.metrics.registry)
+            # Уведомления и окна выбора (свой поток с одним корнем Tk)
+            self.ui = UiThread()
+        self.statistics_sink = StatisticsSink()
+        if persistent:
+            self.load_settings()
+            self.policy = load_policy(self.policy_file)
+
+    @property
+    def capture_session(self):
+        """Захват экрана (mss, numpy), общий для всех рабочих областей"""
+        if self.parent is not None:
+            return self.parent.capture_session
+        if self._capture_session is None:
+            from capture import CaptureSession
+
+            self._capture_session = CaptureSession()
+        return self._capture_session
+
+    @property
+    def result_watcher(self):
+        if self._result_watcher is None:
+            from result_watcher import ResultWatcher
+
+            self._result_watcher = ResultWatcher(self.capture_session, clock=self.clock)
+        return self._result_watcher
+
+    @property
+    def ocr_cache(self):
+        """Кэш OCR, загружается с диска при первом обращении"""
+        if self.parent is not None:
+            return self.parent.ocr_cache
+        if self._ocr_cache is None:
+            from ocr_cache import OcrCache
+
+            cache = OcrCache() if self.persistent else OcrCache(path=None)
+            if self.persistent and OCR_CACHE_ENABLED:
+                cache.load()
+            self._ocr_cache = cache
+        return self._ocr_cache
+
+    @property
+    def template_classifier(self):
+        """Шаблоны окна результата, загружаются с диска при первом обращении"""
+        if self.parent is not None:
+            return self.parent.template_classifier
+        if self._template_classifier is None:
+            from templates import TemplateClassifier
+
+            classifier = TemplateClassifier() if self.persistent else TemplateClassifier(path=None)
+            if self.persistent and TEMPLATES_ENABLED:
+                classifier.load()
+            self._template_classifier = classifier
+        return self._template_classifier
+
+    @property
+    def loop_engine(self):
+        if self._loop_engine is None:
+            from loop_engine import LoopEngine
+
+            self._loop_engine = LoopEngine(self)
+        return self._loop_engine
+
+    def get_input(self):
+        """Ввод создается при первом действии (pyautogui и keyboard грузятся долго)"""
+        if self.parent is not None:
+            return self.parent.get_input()
+        if self.input is None:
+            self.input = DesktopInput()
+        return self.input
 
     def create_icon_image(self):
+        from PIL import Image, ImageDraw
+
         width = 64
         height = 64
         image = Image.new('RGB', (width, height), 'white')
@@ -246,15 +387,54 @@ class ScreenTextCapture:
                 if 'selected_region' in settings and settings['selected_region']:
                     self.selected_region = tuple(settings['selected_region'])
 
+                if settings.get('focus_point'):
+                    self.focus_point = tuple(settings['focus_point'])
+
+                # Загружаем OCR профиль, подобранный autotune.py
+                if 'ocr_profile' in settings and settings['ocr_profile']:
+                    self.apply_ocr_profile(settings['ocr_profile'])
+
+                # Дополнительные рабочие области
+                self.workspace_settings = list(settings.get('workspaces') or [])
+                self.workspaces = [self.create_workspace(ws) for ws in self.workspace_settings]
+
                 print(f"Settings loaded from {SETTINGS_FILE}")
                 if self.drag_point_a and self.drag_point_b and self.drag_point_c:
                     print(f"Points: A={self.drag_point_a}, B={self.drag_point_b}, C={self.drag_point_c}")
                 if self.selected_region:
                     x1, y1, x2, y2 = self.selected_region
                     print(f"Region: {x2-x1}x{y2-y1} at ({x1},{y1})")
+                if self.workspaces:
+                    print(f"Workspaces: {', '.join(ws.name for ws in self.workspaces)}")
         except Exception as e:
             print(f"Error loading settings: {e}")
 
+    def create_workspace(self, settings):
+        """Рабочая область из настроек: name, selected_region, drag_point_a/b/c, focus_point, statistics_file"""
+        name = settings['name']
+        workspace = ScreenTextCapture(parent=self, name=name)
+        for key in ('drag_point_a', 'drag_point_b', 'drag_point_c', 'focus_point', 'selected_region'):
+            if settings.get(key):
+                setattr(workspace, key, tuple(settings[key]))
+        workspace.statistics_file = settings.get('statistics_file') or workspace_path(self.statistics_file, name)
+        return workspace
+
+    def all_workspaces(self):
+        """Основная область и дополнительные"""
+        return [self] + self.workspaces
+
+    def loop_ready(self):
+        return bool(self.drag_point_a and self.drag_point_b and self.drag_point_c and self.selected_region)
+
+    def apply_ocr_profile(self, profile):
+        """Применяет OCR профиль (lang, psm, oem, whitelist, scale)"""
+        self.ocr_profile = profile
+        self.ocr_engine.configure(profile)
+        if profile.get('scale'):
+            self.preprocess_options['scale'] = profile['scale']
+        print(f"OCR profile: lang={profile.get('lang')}, psm={profile.get('psm')}, "
+              f"oem={profile.get('oem')}, scale={profile.get('scale')}")
+
     def save_settings(self):
         """Сохраняет текущие настройки в файл"""
         try:
@@ -262,7 +442,10 @@ class ScreenTextCapture:
                 'drag_point_a': list(self.drag_point_a) if self.drag_point_a else None,
                 'drag_point_b': list(self.drag_point_b) if self.drag_point_b else None,
                 'drag_point_c': list(self.drag_point_c) if self.drag_point_c else None,
-                'selected_region': list(self.selected_region) if self.selected_region else None
+                'selected_region': list(self.selected_region) if self.selected_region else None,
+                'focus_point': list(self.focus_point) if self.focus_point else None,
+                'ocr_profile': self.ocr_profile,
+                'workspaces': self.workspace_settings
             }
 
             with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
@@ -272,6 +455,13 @@ class ScreenTextCapture:
         except Exception as e:
             print(f"Error saving settings: {e}")
 
+    def start_session(self):
+        """Новая сессия статистики: свой session_id и нумерация попыток с 1"""
+        import uuid
+
+        self.session_id = uuid.uuid4().hex[:12]
+        self.session_seq = 0
+
     def log_statistics(self, from_level, action, result, to_level):
         """Логирует статистику попыток в файл
 
@@ -282,27 +472,29 @@ class ScreenTextCapture:
             to_level: уровень после попытки (0-10)
         """
         try:
-            from datetime import datetime
-
+            if self.session_id is None:
+                self.start_session()
+            self.session_seq += 1
             stat_entry = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': self.clock.now().isoformat(),
                 'from_level': from_level,
                 'action': action,
                 'result': result,
-                'to_level': to_level
+                'to_level': to_level,
+                'session_id': self.session_id,
+                'seq': self.session_seq
             }
 
-            # Append to JSONL file (one JSON object per line)
-            with open(STATISTICS_FILE, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(stat_entry, ensure_ascii=False) + '\n')
+            # Запись идет в фоновом потоке (см. stats_sink.py)
+            self.statistics_sink.write(stat_entry)
 
             print(f"Stats logged: {from_level} -> {to_level} ({action}, {result})")
         except Exception as e:
             print(f"Error logging statistics: {e}")
 
     def select_region_handler(self):
-        selector = RegionSelector()
-        selector.select_region(self.on_region_selected)
+        # Окно откроется на потоке интерфейса, обработчик меню не ждет выбора
+        self.ui.submit(RegionSelector().select_region, self.on_region_selected)
 
     def on_region_selected(self, region):
         self.selected_region = region
@@ -318,22 +510,13 @@ class ScreenTextCapture:
             self.show_notification("Сначала выберите область экрана!")
             return
 
-        x1, y1, x2, y2 = self.selected_region
-
         try:
-            with mss.mss() as sct:
-                monitor = {
-                    "top": y1,
-                    "left": x1,
-                    "width": x2 - x1,
-                    "height": y2 - y1
-                }
-                screenshot = sct.grab(monitor)
-                img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
-
-            text = pytesseract.image_to_string(img, lang=OCR_LANG)
+            img = self.grab_ocr_image()
+            text = self.ocr_engine.recognize(img)
 
             if text.strip():
+                import pyperclip
+
                 pyperclip.copy(text)
                 self.show_notification(
                     f"Текст распознан и скопирован в буфер обмена!\n\n"
@@ -346,8 +529,7 @@ class ScreenTextCapture:
             self.show_notification(f"Ошибка: {str(e)}")
 
     def select_drag_points_handler(self):
-        selector = PointSelector()
-        selector.select_three_points(self.on_drag_points_selected)
+        self.ui.submit(PointSelector().select_three_points, self.on_drag_points_selected)
 
     def on_drag_points_selected(self, point_a, point_b, point_c):
         self.drag_point_a = point_a
@@ -365,6 +547,17 @@ class ScreenTextCapture:
             f"F10 - Запустить/остановить автоцикл"
         )
 
+    def focus_window(self, inp):
+        """Клик в focus_point (если задан), чтобы клавиша ушла в окно этой рабочей области"""
+        if not self.focus_point:
+            return
+        with self.tracer.span('action.focus'):
+            inp.move_to(*self.focus_point, random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX))
+            inp.mouse_down()
+            self.clock.sleep(random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX))
+            inp.mouse_up()
+            self.clock.sleep(0.1)
+
     def execute_drag_action(self, from_loop=False):
         try:
             if not from_loop:
@@ -379,17 +572,20 @@ class ScreenTextCapture:
                     self.show_notification(msg)
                     return False
 
-            # Отключаем защиту от случайных движений мыши в pyautogui
-            pyautogui.FAILSAFE = False
+            inp = self.get_input()
 
             # Небольшая задержка для стабильности
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
+
+            tracer = self.tracer
+            self.focus_window(inp)
 
             # Нажимаем клавишу F1 как настоящее нажатие (press → delay → release)
-            keyboard.press('f1')
-            time.sleep(random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX))
-            keyboard.release('f1')
-            time.sleep(0.3)
+            with tracer.span('action.key'):
+                inp.press_key('f1')
+                self.clock.sleep(random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX))
+                inp.release_key('f1')
+                self.clock.sleep(0.3)
 
             # Получаем координаты точек
             x1, y1 = self.drag_point_a
@@ -397,34 +593,38 @@ class ScreenTextCapture:
             x3, y3 = self.drag_point_c
 
             # Перемещаем мышь к точке A с рандомной скоростью
-            move_duration_1 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
-            pyautogui.moveTo(x1, y1, duration=move_duration_1)
-            time.sleep(0.1)
-
-            # Зажимаем левую кнопку мыши в точке A
-            pyautogui.mouseDown()
-            # Держим зажатой некоторое время перед началом перетаскивания
-            time.sleep(0.4)
-
-            # Перетаскиваем к точке B с рандомной скоростью
-            move_duration_2 = random.uniform(MOUSE_SPEED_MIN + 0.2, MOUSE_SPEED_MAX + 0.3)
-            pyautogui.moveTo(x2, y2, duration=move_duration_2)
-            time.sleep(0.1)
-
-            # Отпускаем левую кнопку мыши
-            pyautogui.mouseUp()
-            time.sleep(0.3)
+            with tracer.span('action.move_a'):
+                move_duration_1 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
+                inp.move_to(x1, y1, move_duration_1)
+                self.clock.sleep(0.1)
+
+            with tracer.span('action.drag'):
+                # Зажимаем левую кнопку мыши в точке A
+                inp.mouse_down()
+                # Держим зажатой некоторое время перед началом перетаскивания
+                self.clock.sleep(0.4)
+
+                # Перетаскиваем к точке B с рандомной скоростью
+                move_duration_2 = random.uniform(MOUSE_SPEED_MIN + 0.2, MOUSE_SPEED_MAX + 0.3)
+                inp.move_to(x2, y2, move_duration_2)
+                self.clock.sleep(0.1)
+
+                # Отпускаем левую кнопку мыши
+                inp.mouse_up()
+                self.clock.sleep(0.3)
 
             # Перемещаем мышь к точке C с рандомной скоростью
-            move_duration_3 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
-            pyautogui.moveTo(x3, y3, duration=move_duration_3)
-            time.sleep(0.1)
+            with tracer.span('action.move_c'):
+                move_duration_3 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
+                inp.move_to(x3, y3, move_duration_3)
+                self.clock.sleep(0.1)
 
             # Зажимаем и отпускаем мышь (эмулируем клик с рандомной задержкой)
-            pyautogui.mouseDown()
-            click_delay = random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX)
-            time.sleep(click_delay)
-            pyautogui.mouseUp()
+            with tracer.span('action.click'):
+                inp.mouse_down()
+                click_delay = random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX)
+                self.clock.sleep(click_delay)
+                inp.mouse_up()
 
             return True
 
@@ -450,17 +650,20 @@ class ScreenTextCapture:
                     self.show_notification(msg)
                     return False
 
-            # Отключаем защиту от случайных движений мыши в pyautogui
-            pyautogui.FAILSAFE = False
+            inp = self.get_input()
 
             # Небольшая задержка для стабильности
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
+
+            tracer = self.tracer
+            self.focus_window(inp)
 
             # Нажимаем клавишу F5 как настоящее нажатие (press → delay → release)
-            keyboard.press('f5')
-            time.sleep(random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX))
-            keyboard.release('f5')
-            time.sleep(0.3)
+            with tracer.span('action.key'):
+                inp.press_key('f5')
+                self.clock.sleep(random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX))
+                inp.release_key('f5')
+                self.clock.sleep(0.3)
 
             # Получаем координаты точек
             x1, y1 = self.drag_point_a
@@ -468,34 +671,38 @@ class ScreenTextCapture:
             x3, y3 = self.drag_point_c
 
             # Перемещаем мышь к точке A с рандомной скоростью
-            move_duration_1 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
-            pyautogui.moveTo(x1, y1, duration=move_duration_1)
-            time.sleep(0.1)
-
-            # Зажимаем левую кнопку мыши в точке A
-            pyautogui.mouseDown()
-            # Держим зажатой некоторое время перед началом перетаскивания
-            time.sleep(0.4)
-
-            # Перетаскиваем к точке B с рандомной скоростью
-            move_duration_2 = random.uniform(MOUSE_SPEED_MIN + 0.2, MOUSE_SPEED_MAX + 0.3)
-            pyautogui.moveTo(x2, y2, duration=move_duration_2)
-            time.sleep(0.1)
-
-            # Отпускаем левую кнопку мыши
-            pyautogui.mouseUp()
-            time.sleep(0.3)
+            with tracer.span('action.move_a'):
+                move_duration_1 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
+                inp.move_to(x1, y1, move_duration_1)
+                self.clock.sleep(0.1)
+
+            with tracer.span('action.drag'):
+                # Зажимаем левую кнопку мыши в точке A
+                inp.mouse_down()
+                # Держим зажатой некоторое время перед началом перетаскивания
+                self.clock.sleep(0.4)
+
+                # Перетаскиваем к точке B с рандомной скоростью
+                move_duration_2 = random.uniform(MOUSE_SPEED_MIN + 0.2, MOUSE_SPEED_MAX + 0.3)
+                inp.move_to(x2, y2, move_duration_2)
+                self.clock.sleep(0.1)
+
+                # Отпускаем левую кнопку мыши
+                inp.mouse_up()
+                self.clock.sleep(0.3)
 
             # Перемещаем мышь к точке C с рандомной скоростью
-            move_duration_3 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
-            pyautogui.moveTo(x3, y3, duration=move_duration_3)
-            time.sleep(0.1)
+            with tracer.span('action.move_c'):
+                move_duration_3 = random.uniform(MOUSE_SPEED_MIN, MOUSE_SPEED_MAX)
+                inp.move_to(x3, y3, move_duration_3)
+                self.clock.sleep(0.1)
 
             # Зажимаем и отпускаем мышь (эмулируем клик с рандомной задержкой)
-            pyautogui.mouseDown()
-            click_delay = random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX)
-            time.sleep(click_delay)
-            pyautogui.mouseUp()
+            with tracer.span('action.click'):
+                inp.mouse_down()
+                click_delay = random.uniform(CLICK_DELAY_MIN, CLICK_DELAY_MAX)
+                self.clock.sleep(click_delay)
+                inp.mouse_up()
 
             return True
 
@@ -507,416 +714,360 @@ class ScreenTextCapture:
                 self.show_notification(msg)
             return False
 
-    def parse_ocr_result(self, text):
+    def parse_ocr_result(self, text, count=True):
         """
         Парсит OCR текст и возвращает действие
-        Возвращает: ('stop', None), ('f1', None), ('f5', None), ('unknown', N)
+        Возвращает: ('stop', 10), ('f1', None), ('f1', N), ('f5', N), ('unknown', None)
+        count=False - служебный разбор, не попадает в счетчики правил
         """
-        import re
-
-        # Убираем знаки препинания и приводим к нижнему регистру
-        clean_text = re.sub(r'[^\w\s+]', '', text.lower())
-
-        # Проверяем на +10 в первую очередь (это цель!)
-        # Ищем паттерн "+10" или "+ 10" или "10" после "now a"
-        if re.search(r'\+\s*10|now\s+a\s+10', text.lower()):
-            return ('stop', 10)
+        # Какое правило сработало, копится в счетчиках парсера (см. summary)
+        outcome, level, rule = self.ocr_parser.parse(text, count=count)
 
-        # Проверяем на Failed
-        if 'failed' in clean_text and ('you have obtained' in clean_text or 'youhaveobtained' in clean_text):
+        if outcome == 'failed':
             return ('f1', None)
 
-        # Проверяем на Success
-        if 'success' in clean_text and ('the item is now a' in clean_text or 'theitemisnowa' in clean_text):
-            # Ищем число после "the item is now a" или "now a"
-            match = re.search(r'(?:the item is now a|now a)\s*\+?\s*(\d+)', clean_text)
-            if match:
-                n = int(match.group(1))
-                if n >= 3:
-                    return ('f5', n)
-                else:
-                    return ('f1', n)
+        if outcome == 'success':
+            return self.action_for_level(level)
 
         # Ничего не найдено - останавливаем
         return ('unknown', None)
 
+    def action_for_level(self, n):
+        """Выбирает следующее действие для предмета на уровне +n по таблице политики"""
+        if n >= 10:
+            return ('stop', 10)
+        if self.policy.action(n) == 'F5':
+            return ('f5', n)
+        return ('f1', n)
+
+    def arm_result_watch(self):
+        """Запоминает область перед действием, чтобы потом заметить окно результата"""
+        if self.selected_region:
+            self.result_watcher.arm(self.selected_region)
+
+    def prepare_ocr_image(self, gray):
+        """Готовит grayscale кадр для OCR (предобработка по настройкам)"""
+        if not self.preprocess_options.get('enabled', True):
+            from PIL import Image
+
+            height, width = gray.shape
+            return Image.frombuffer('L', (width, height), gray, 'raw', 'L', 0, 1)
+        from preprocess import preprocess_image
+
+        return preprocess_image(gray, self.preprocess_options)
+
+    def grab_ocr_image(self):
+        """Захватывает выбранную область и готовит изображение для OCR"""
+        return self.prepare_ocr_image(self.capture_session.grab_gray(self.selected_region))
+
+    def recognize_result(self, img):
+        """Распознает окно результата: сначала по шаблонам, при сомнениях - через OCR
+
+        Результат по шаблонам возвращается в виде канонического текста окна,
+        чтобы дальше он проходил через тот же parse_ocr_result.
+        Возвращает (текст, источник): источник 'template' или 'ocr'.
+        """
+        if not TEMPLATES_ENABLED:
+            return self.ocr_engine.recognize(img).strip(), 'ocr'
+
+        matched = self.template_classifier.classify(img)
+        if matched is not None:
+            outcome, value, score = matched
+            if outcome == 'failed':
+                return "Failed... you have obtained", 'template'
+            return f"Success! The item is now a +{value}", 'template'
+
+        if not self.template_classifier.needs_samples():
+            return self.ocr_engine.recognize(img).strip(), 'ocr'
+
+        # Пока шаблонов не хватает, размечаем кадры результатом OCR
+        text, words = self.ocr_engine.recognize_words(img)
+        text = text.strip()
+        action, value = self.parse_ocr_result(text, count=False)
+        if action != 'unknown':
+            outcome = 'failed' if action == 'f1' and value is None else 'success'
+            try:
+                self.template_classifier.learn(img, words, outcome, value)
+            except Exception as e:
+                print(f"Error learning templates: {e}")
+        return text, 'ocr'
+
     def capture_ocr_only(self):
         """Захватывает текст из выбранной области без копирования в буфер"""
         if not self.selected_region:
             return None
 
-        x1, y1, x2, y2 = self.selected_region
-
         try:
-            with mss.mss() as sct:
-                monitor = {
-                    "top": y1,
-                    "left": x1,
-                    "width": x2 - x1,
-                    "height": y2 - y1
+            tracer = self.tracer
+            started = time.perf_counter()
+            with tracer.span('capture.grab'):
+                gray = self.capture_session.grab_gray(self.selected_region)
+            captured = time.perf_counter()
+            with tracer.span('capture.preprocess'):
+                img = self.prepare_ocr_image(gray)
+            prepared = time.perf_counter()
+
+            key = None
+            text = None
+            source = 'cache'
+            if OCR_CACHE_ENABLED:
+                with tracer.span('capture.cache'):
+                    key = self.ocr_cache.key(img, int(self.preprocess_options.get('scale', 1)))
+                    text = self.ocr_cache.get(key)
+                self.metrics.ocr_cache_lookups.inc(result='miss' if text is None else 'hit')
+
+            if text is None:
+                with tracer.span('capture.ocr'):
+                    text, source = self.recognize_result(img)
+                # Кэшируем только распознанные окна, а не промежуточные кадры анимации
+                if key is not None and text and self.parse_ocr_result(text, count=False)[0] != 'unknown':
+                    self.ocr_cache.put(key, text)
+            recognized = time.perf_counter()
+            self.metrics.capture_seconds.observe(captured - started)
+            self.metrics.ocr_seconds.observe(recognized - prepared)
+
+            if FRAME_RECORDER_ENABLED:
+                action, value = self.parse_ocr_result(text, count=False)
+                timings = {
+                    'capture_ms': round((captured - started) * 1000, 2),
+                    'preprocess_ms': round((prepared - captured) * 1000, 2),
+                    'ocr_ms': round((recognized - prepared) * 1000, 2),
+                    'source': source,
                 }
-                screenshot = sct.grab(monitor)
-                img = Image.frombytes('RGB', screenshot.size, screenshot.rgb)
+                self.frame_recorder.record(gray, text, action, value, timings)
 
-            text = pytesseract.image_to_string(img, lang=OCR_LANG)
-            return text.strip()
+            return text
 
         except Exception as e:
             return None
 
-    def run_loop(self):
-        """Основной цикл выполнения"""
+    def run_loop(self, workspaces=None, restart=None):
+        """Основной цикл выполнения (конечный автомат, см. loop_engine.py)
+
+        workspaces - рабочие области, которые крутятся вместе (по умолчанию только эта),
+        restart - см. LoopScheduler.
+        """
+        from loop_engine import LoopScheduler
+
         print("Loop thread started")
-        current_level = 0  # Отслеживаем текущий уровень предмета
+        workspaces = workspaces or [self]
         try:
-            while self.loop_running:
-                if not self.drag_point_a or not self.drag_point_b or not self.drag_point_c:
-                    print("Цикл остановлен: точки A, B, C не настроены!")
-                    self.loop_running = False
-                    break
-
-                if not self.selected_region:
-                    print("Цикл остановлен: область OCR не выбрана!")
-                    self.loop_running = False
-                    break
-
-                # Выполняем F1-флоу
-                print("Executing F1 action in loop")
-                if not self.execute_drag_action(from_loop=True):
-                    print("Failed to execute F1 action, stopping loop")
-                    self.loop_running = False
-                    break
-
-                # Ждем перед OCR
-                time.sleep(OCR_DELAY)
-
-                # Проверяем, не остановили ли цикл
-                if not self.loop_running:
-                    break
-
-                # Захватываем и парсим текст
-                ocr_text = self.capture_ocr_only()
-
-                if ocr_text:
-                    action, value = self.parse_ocr_result(ocr_text)
-                    print(f"OCR результат: action={action}, value={value}")
-
-                    if action == 'stop':
-                        print(f"Цикл завершен! Достигнут +10!")
-                        # Логируем успешное достижение +10
-                        self.log_statistics(current_level, 'F1', 'success', 10)
-                        self.show_notification("Успех! Достигнут +10!")
-                        self.loop_running = False
-                        break
-                    elif action == 'unknown':
-                        print(f"Текст не распознан с первой попытки. OCR: {ocr_text}")
-                        print("Делаем повторную попытку OCR через 1 секунду...")
-                        time.sleep(1)
-
-                        # Повторная попытка OCR
-                        ocr_text_retry = self.capture_ocr_only()
-                        if ocr_text_retry:
-                            action, value = self.parse_ocr_result(ocr_text_retry)
-                            print(f"OCR результат (повторная попытка): action={action}, value={value}")
-
-                            if action == 'unknown':
-                                print(f"Цикл остановлен: текст не распознан после 2 попыток. OCR: {ocr_text_retry}")
-                                self.loop_running = False
-                                break
-                            # Если распознали - обрабатываем результат через continue, чтобы перейти к следующим elif
-                            # Но нам нужно обработать результат прямо здесь
-                            elif action == 'stop':
-                                print(f"Цикл завершен! Достигнут +10! (после повтора)")
-                                self.log_statistics(current_level, 'F1', 'success', 10)
-                                self.show_notification("Успех! Достигнут +10!")
-                                self.loop_running = False
-                                break
-                            elif action == 'f1':
-                                if value is None:
-                                    print("F1 failed (после повтора), продолжаем с F1-флоу")
-                                    self.log_statistics(current_level, 'F1', 'failed', current_level)
-                                else:
-                                    print(f"F1 success to level {value} (после повтора), продолжаем с F1-флоу")
-                                    self.log_statistics(current_level, 'F1', 'success', value)
-                                    current_level = value
-                                random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                print(f"Случайная задержка: {random_delay:.2f} сек")
-                                time.sleep(random_delay)
-                                continue
-                            elif action == 'f5':
-                                # Переходим на F5 подцикл - копируем логику из основного блока
-                                print(f"Переходим на F5-флоу для +{value} (после повтора)")
-                                self.log_statistics(current_level, 'F1', 'success', value)
-                                current_level = value
-                                random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                print(f"Случайная задержка: {random_delay:.2f} сек")
-                                time.sleep(random_delay)
-                                # Запускаем подцикл F5 (копия кода ниже)
-                                while self.loop_running and action == 'f5':
-                                    print(f"Запускаю F5-флоу для +{value}")
-                                    if not self.execute_drag_action_f5(from_loop=True):
-                                        print("Failed to execute F5 action, stopping loop")
-                                        self.loop_running = False
-                                        break
-                                    time.sleep(OCR_DELAY)
-                                    if not self.loop_running:
-                                        break
-                                    ocr_text = self.capture_ocr_only()
-                                    if ocr_text:
-                                        action, value = self.parse_ocr_result(ocr_text)
-                                        print(f"OCR результат после F5: action={action}, value={value}")
-                                        if action == 'stop':
-                                            print(f"Цикл завершен! Достигнут +10!")
-                                            self.log_statistics(current_level, 'F5', 'success', 10)
-                                            self.show_notification("Успех! Достигнут +10!")
-                                            self.loop_running = False
-                                            break
-                                        elif action == 'unknown':
-                                            print(f"Текст не распознан после F5. Попытка повтора...")
-                                            time.sleep(1)
-                                            ocr_text_retry2 = self.capture_ocr_only()
-                                            if ocr_text_retry2:
-                                                action, value = self.parse_ocr_result(ocr_text_retry2)
-                                                print(f"OCR результат после F5 (повтор): action={action}, value={value}")
-                                                if action == 'unknown':
-                                                    print(f"Цикл остановлен: текст не распознан после F5 (2 попытки). OCR: {ocr_text_retry2}")
-                                                    self.loop_running = False
-                                                    break
-                                            else:
-                                                print("Цикл остановлен: не удалось прочитать OCR после F5 (повтор)")
-                                                self.loop_running = False
-                                                break
-                                        if action == 'f1':
-                                            if value is None:
-                                                print("F5 failed (поломка!), предмет упал на 0, выходим из F5-подцикла, переходим к F1")
-                                                self.log_statistics(current_level, 'F5', 'failed', 0)
-                                                current_level = 0
-                                            else:
-                                                print(f"F5 success but dropped to level {value}, переходим к F1")
-                                                self.log_statistics(current_level, 'F5', 'success', value)
-                                                current_level = value
-                                            random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                            print(f"Случайная задержка: {random_delay:.2f} сек")
-                                            time.sleep(random_delay)
-                                            break
-                                        else:
-                                            self.log_statistics(current_level, 'F5', 'success', value)
-                                            current_level = value
-                                            random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                            print(f"Случайная задержка: {random_delay:.2f} сек")
-                                            time.sleep(random_delay)
-                                    else:
-                                        print("Цикл остановлен: не удалось прочитать OCR после F5")
-                                        self.loop_running = False
-                                        break
-                                continue
-                        else:
-                            print("Цикл остановлен: не удалось прочитать OCR при повторе")
-                            self.loop_running = False
-                            break
-                    elif action == 'f1':
-                        if value is None:
-                            # Провал (уровень не изменился)
-                            print("F1 failed, продолжаем с F1-флоу")
-                            self.log_statistics(current_level, 'F1', 'failed', current_level)
-                        else:
-                            # Успех, но уровень низкий (< 3)
-                            print(f"F1 success to level {value}, продолжаем с F1-флоу")
-                            self.log_statistics(current_level, 'F1', 'success', value)
-                            current_level = value
-                        # Случайная задержка перед следующим действием
-                        random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                        print(f"Случайная задержка: {random_delay:.2f} сек")
-                        time.sleep(random_delay)
-                        # Продолжаем цикл с F1-флоу (начнется со следующей итерации)
-                        continue
-                    elif action == 'f5':
-                        # Логируем успешный переход на уровень N (value)
-                        self.log_statistics(current_level, 'F1', 'success', value)
-                        current_level = value  # Обновляем текущий уровень
-                        # Случайная задержка перед F5-флоу
-                        random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                        print(f"Случайная задержка: {random_delay:.2f} сек")
-                        time.sleep(random_delay)
-                        # Запускаем подцикл F5
-                        while self.loop_running and action == 'f5':
-                            print(f"Запускаю F5-флоу для +{value}")
-                            if not self.execute_drag_action_f5(from_loop=True):
-                                print("Failed to execute F5 action, stopping loop")
-                                self.loop_running = False
-                                break
-                            time.sleep(OCR_DELAY)
-
-                            # Проверяем, не остановили ли цикл
-                            if not self.loop_running:
-                                break
-
-                            # Захватываем и парсим текст после F5
-                            ocr_text = self.capture_ocr_only()
-
-                            if ocr_text:
-                                action, value = self.parse_ocr_result(ocr_text)
-                                print(f"OCR результат после F5: action={action}, value={value}")
-
-                                if action == 'stop':
-                                    print(f"Цикл завершен! Достигнут +10!")
-                                    # Логируем успешное достижение +10 через F5
-                                    self.log_statistics(current_level, 'F5', 'success', 10)
-                                    self.show_notification("Успех! Достигнут +10!")
-                                    self.loop_running = False
-                                    break
-                                elif action == 'unknown':
-                                    print(f"Текст не распознан после F5 с первой попытки. OCR: {ocr_text}")
-                                    print("Делаем повторную попытку OCR через 1 секунду...")
-                                    time.sleep(1)
-
-                                    # Повторная попытка OCR
-                                    ocr_text_retry = self.capture_ocr_only()
-                                    if ocr_text_retry:
-                                        action, value = self.parse_ocr_result(ocr_text_retry)
-                                        print(f"OCR результат после F5 (повторная попытка): action={action}, value={value}")
-
-                                        if action == 'unknown':
-                                            print(f"Цикл остановлен: текст не распознан после F5 (2 попытки). OCR: {ocr_text_retry}")
-                                            self.loop_running = False
-                                            break
-                                        elif action == 'stop':
-                                            print(f"Цикл завершен! Достигнут +10! (после повтора)")
-                                            self.log_statistics(current_level, 'F5', 'success', 10)
-                                            self.show_notification("Успех! Достигнут +10!")
-                                            self.loop_running = False
-                                            break
-                                        elif action == 'f1':
-                                            if value is None:
-                                                print("F5 failed (поломка!) (после повтора), предмет упал на 0, выходим из F5-подцикла, переходим к F1")
-                                                self.log_statistics(current_level, 'F5', 'failed', 0)
-                                                current_level = 0
-                                            else:
-                                                print(f"F5 success but dropped to level {value} (после повтора), переходим к F1")
-                                                self.log_statistics(current_level, 'F5', 'success', value)
-                                                current_level = value
-                                            random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                            print(f"Случайная задержка: {random_delay:.2f} сек")
-                                            time.sleep(random_delay)
-                                            break
-                                        else:  # action == 'f5'
-                                            print(f"F5 success to level {value} (после повтора), продолжаем F5-подцикл")
-                                            self.log_statistics(current_level, 'F5', 'success', value)
-                                            current_level = value
-                                            random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                            print(f"Случайная задержка: {random_delay:.2f} сек")
-                                            time.sleep(random_delay)
-                                            # Продолжаем F5 подцикл
-                                    else:
-                                        print("Цикл остановлен: не удалось прочитать OCR после F5 при повторе")
-                                        self.loop_running = False
-                                        break
-                                elif action == 'f1':
-                                    if value is None:
-                                        # Провал F5 (поломка!) - предмет упал на 0
-                                        print("F5 failed (поломка!), предмет упал на 0, выходим из F5-подцикла, переходим к F1")
-                                        self.log_statistics(current_level, 'F5', 'failed', 0)
-                                        current_level = 0
-                                    else:
-                                        # Успех, но уровень упал ниже 3 (это редкий случай)
-                                        print(f"F5 success but dropped to level {value}, переходим к F1")
-                                        self.log_statistics(current_level, 'F5', 'success', value)
-                                        current_level = value
-                                    # Случайная задержка перед переходом к F1
-                                    random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                    print(f"Случайная задержка: {random_delay:.2f} сек")
-                                    time.sleep(random_delay)
-                                    # Выходим из подцикла F5, продолжаем основной цикл
-                                    break
-                                # Если action == 'f5', подцикл продолжится
-                                else:  # action == 'f5'
-                                    # Логируем успешный переход на новый уровень через F5
-                                    self.log_statistics(current_level, 'F5', 'success', value)
-                                    current_level = value  # Обновляем текущий уровень
-                                    # Случайная задержка перед следующим F5
-                                    random_delay = random.uniform(RANDOM_DELAY_MIN, RANDOM_DELAY_MAX)
-                                    print(f"Случайная задержка: {random_delay:.2f} сек")
-                                    time.sleep(random_delay)
-                            else:
-                                print("Цикл остановлен: не удалось прочитать OCR после F5")
-                                self.loop_running = False
-                                break
-                else:
-                    print("Цикл остановлен: не удалось прочитать OCR")
-                    self.loop_running = False
-                    break
+            # Модели загружаются один раз на весь цикл
+            self.ocr_engine.start()
+            if FRAME_RECORDER_ENABLED:
+                self.frame_recorder.start()
+            # Таблица могла быть пересчитана python policy.py, пока цикл стоял
+            if self.policy_file is not None:
+                self.policy = load_policy(self.policy_file)
+            print(f"Policy: {self.policy.describe()}")
+            for workspace in workspaces:
+                workspace.policy = self.policy
+                workspace.statistics_sink.start(workspace.statistics_file)
+                workspace.start_session()
+
+            LoopScheduler([workspace.loop_engine for workspace in workspaces], restart).run()
         except Exception as e:
             print(f"Error in run_loop: {e}")
             import traceback
             traceback.print_exc()
             print(f"Ошибка в цикле: {str(e)}")
-            self.loop_running = False
+        finally:
+            self.capture_session.close()
+            self.frame_recorder.stop()
+            for workspace in workspaces:
+                workspace.loop_running = False
+                workspace.statistics_sink.stop()
+            print(self.ocr_parser.summary())
+            if OCR_CACHE_ENABLED:
+                print(self.ocr_cache.stats())
+                self.ocr_cache.save()
 
     def toggle_loop(self):
         """Включает/выключает цикл по F10"""
         try:
             print("F10 pressed - toggle_loop called")
-            if self.loop_running:
-                # Останавливаем цикл
-                self.loop_running = False
+            if any(workspace.loop_running for workspace in self.all_workspaces()):
+                # Останавливаем цикл: текущее ожидание прерывается сразу
+                self.stop_loops()
                 print("Loop stopped")
             else:
                 # Запускаем цикл
                 print("Attempting to start loop")
-                if not self.drag_point_a or not self.drag_point_b or not self.drag_point_c:
-                    print("Error: Points not configured")
+                # Прошлый запуск еще дописывает статистику и закрывает захват:
+                # новый не должен стартовать под его finally
+                if self.loop_thread is not None and self.loop_thread.is_alive():
+                    self.loop_thread.join(timeout=LOOP_STOP_TIMEOUT)
+                    if self.loop_thread.is_alive():
+                        print("Error: Previous loop is still stopping")
+                        self.show_notification("Предыдущий цикл еще останавливается, нажмите F10 еще раз")
+                        return
+                if not self.workspaces:
+                    if not self.drag_point_a or not self.drag_point_b or not self.drag_point_c:
+                        print("Error: Points not configured")
+                        return
+
+                    if not self.selected_region:
+                        print("Error: Region not selected")
+                        return
+                ready = [workspace for workspace in self.all_workspaces() if workspace.loop_ready()]
+                if not ready:
+                    print("Error: No workspace has region and points configured")
                     return
-
-                if not self.selected_region:
-                    print("Error: Region not selected")
+                # Без точки фокуса F1/F5 уйдут в окно, по которому кликнули последним
+                unfocused = [workspace.name or 'main' for workspace in ready if not workspace.focus_point]
+                if len(ready) > 1 and unfocused:
+                    print(f"Error: Focus point not set for {', '.join(unfocused)}")
+                    self.show_notification(
+                        f"Несколько рабочих областей: задайте точку фокуса для {', '.join(unfocused)}\n"
+                        f"(меню 'Настроить точку фокуса' или 'Добавить рабочую область')"
+                    )
                     return
 
-                self.loop_running = True
+                for workspace in ready:
+                    workspace.loop_running = True
+                if self.workspaces:
+                    print(f"Workspaces: {', '.join(workspace.name or 'main' for workspace in ready)}")
                 print("Loop started successfully. Press F10 to stop.")
 
                 # Запускаем цикл в отдельном потоке
-                self.loop_thread = threading.Thread(target=self.run_loop, daemon=True)
+                self.loop_thread = threading.Thread(target=self.run_loop, args=(ready,), daemon=True)
                 self.loop_thread.start()
         except Exception as e:
             print(f"Error in toggle_loop: {e}")
             import traceback
             traceback.print_exc()
 
+    def stop_loops(self):
+        """Останавливает циклы всех рабочих областей"""
+        for workspace in self.all_workspaces():
+            workspace.loop_running = False
+            # Автомата еще нет, если цикл ни разу не запускался
+            if workspace._loop_engine is not None:
+                workspace._loop_engine.cancel()
+
+    def add_workspace_handler(self):
+        """Новая рабочая область: выбор области OCR, затем точек A, B, C и точки фокуса"""
+        names = {settings['name'] for settings in self.workspace_settings}
+        number = len(names) + 1
+        while f"ws{number}" in names:
+            number += 1
+        settings = {'name': f"ws{number}"}
+
+        def on_focus_selected(focus_point):
+            settings['focus_point'] = list(focus_point)
+            self.workspace_settings.append(settings)
+            self.workspaces.append(self.create_workspace(settings))
+            self.save_settings()
+            self.show_notification(
+                f"Рабочая область {settings['name']} добавлена\n"
+                f"Она запускается вместе с остальными по F10"
+            )
+
+        def on_points_selected(point_a, point_b, point_c):
+            settings['drag_point_a'] = list(point_a)
+            settings['drag_point_b'] = list(point_b)
+            settings['drag_point_c'] = list(point_c)
+            self.ui.submit(PointSelector().select_focus_point, on_focus_selected)
+
+        def on_region_selected(region):
+            settings['selected_region'] = list(region)
+            self.ui.submit(PointSelector().select_three_points, on_points_selected)
+
+        self.ui.submit(RegionSelector().select_region, on_region_selected)
+
+    def select_focus_point_handler(self):
+        """Точка фокуса основной рабочей области"""
+        self.ui.submit(PointSelector().select_focus_point, self.on_focus_point_selected)
+
+    def on_focus_point_selected(self, focus_point):
+        self.focus_point = focus_point
+        self.save_settings()
+        self.show_notification(f"Точка фокуса: {focus_point}\nПеред F1/F5 цикл кликает в нее")
+
     def show_notification(self, message):
-        try:
-            root = tk.Tk()
-            root.withdraw()
-            messagebox.showinfo(APP_NAME, message)
-            root.destroy()
-        except Exception as e:
-            # If Tkinter fails (e.g., called from non-main thread), print to console
-            print(f"{APP_NAME}: {message}")
+        """Всплывающее уведомление, которое закрывается само; из любого потока, не блокирует"""
+        self.ui.notify(message)
 
     def quit_app(self):
+        import keyboard
+
         keyboard.unhook_all()  # Отменяем все горячие клавиши
+        self.stop_loops()
+        for workspace in self.all_workspaces():
+            workspace.statistics_sink.stop()
+        self.metrics_server.stop()
+        self.ocr_engine.close()
+        if self._capture_session is not None:
+            self._capture_session.close_all()
+        if OCR_CACHE_ENABLED and self._ocr_cache is not None:
+            self._ocr_cache.save()
+        self.ui.stop()
         self.icon.stop()
         sys.exit(0)
 
+    def toggle_tracing(self):
+        self.tracer.toggle()
+
+    def dump_trace(self):
+        """Сохраняет буфер трассировки в JSON для Perfetto / chrome://tracing"""
+        try:
+            if not self.tracer.recorded:
+                self.show_notification("Трассировка пуста - включите ее в меню и запустите цикл")
+                return
+            path = self.tracer.dump()
+            self.show_notification(f"Трассировка сохранена: {path}")
+        except Exception as e:
+            self.show_notification(f"Ошибка сохранения трассировки: {str(e)}")
+
+    def recompute_policy_handler(self):
+        """Пересчитывает таблицу F1/F5 по накопленной статистике (цикл подхватывает ее сразу)"""
+        try:
+            table, cycle_seconds = recompute_policy(self.statistics_file, STATISTICS_BACKEND, self.policy_file)
+            for workspace in self.all_workspaces():
+                workspace.policy = table
+            self.show_notification(f"Политика пересчитана по {table.attempts} попыткам:\n{table.describe()}")
+        except ValueError as e:
+            self.show_notification(f"Недостаточно данных для политики: {e}")
+        except Exception as e:
+            self.show_notification(f"Ошибка пересчета политики: {str(e)}")
+
     def create_menu(self):
+        import pystray
+
         return pystray.Menu(
             pystray.MenuItem('Выбрать область', self.select_region_handler),
             pystray.MenuItem('Захватить текст', self.capture_and_ocr),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem('Настроить точки A, B, C', self.select_drag_points_handler),
+            pystray.MenuItem('Настроить точку фокуса', self.select_focus_point_handler),
+            pystray.MenuItem('Добавить рабочую область', self.add_workspace_handler),
             pystray.MenuItem('F1 + Drag + Click (F8)', self.execute_drag_action),
             pystray.MenuItem('F5 + Drag + Click (F9)', self.execute_drag_action_f5),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem('Запустить/Остановить цикл (F10)', self.toggle_loop),
+            pystray.MenuItem('Пересчитать политику F1/F5', self.recompute_policy_handler),
+            pystray.Menu.SEPARATOR,
+            pystray.MenuItem('Трассировка', self.toggle_tracing, checked=lambda item: self.tracer.enabled),
+            pystray.MenuItem('Сохранить трассировку', self.dump_trace),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem('Выход', self.quit_app)
         )
 
     def run(self):
+        import keyboard
+        import pystray
+
         # Регистрируем горячие клавиши
         keyboard.add_hotkey('f8', self.execute_drag_action, suppress=False)
         keyboard.add_hotkey('f9', self.execute_drag_action_f5, suppress=False)
         keyboard.add_hotkey('f10', self.toggle_loop, suppress=False)
 
+        # Прогреваем OCR в фоне, пока появляется иконка в трее
+        threading.Thread(target=self.ocr_engine.prewarm, daemon=True).start()
+
+        if METRICS_ENABLED:
+            self.metrics_server.start()
+
         image = self.create_icon_image()
         self.icon = pystray.Icon(
             'screen_text_capture',
@@ -0,0 +1,191 @@
+"""
+Метрики цикла Polisher
+
+Легкий реестр счетчиков и гистограмм внутри процесса. Обновление метрики - это
+блокировка и пара сложений, поэтому они считаются всегда. При METRICS_ENABLED
+реестр отдается в текстовом формате Prometheus на http://127.0.0.1:METRICS_PORT/metrics
+из фонового потока, чтобы снимать пропускную способность по каждой машине.
+"""
+
+import bisect
+import threading
+
+from config import METRICS_HOST, METRICS_PORT
+
+# Границы гистограмм по умолчанию, секунды
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.values = {}  # значения меток -> счетчик
+        self.lock = threading.Lock()
+        if not self.label_names:
+            self.values[()] = 0
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.lock:
+            return self.values.get(key, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Последний элемент - попадания выше верхней границы (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+            total_count = self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{format_value(float(bound))}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {format_value(total_sum)}")
+        lines.append(f"{self.name}_count {total_count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def _register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class LoopMetrics:
+    """Метрики цикла заточки"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.attempts = r.counter('polisher_attempts_total', 'Attempts made, by action', ('action',))
+        self.successes = r.counter('polisher_successes_total', 'Successful attempts, by action', ('action',))
+        self.breaks = r.counter('polisher_breaks_total', 'F5 failures that dropped the item to +0')
+        self.ocr_retries = r.counter('polisher_ocr_retries_total', 'OCR repeated because the text was not recognized')
+        self.unknown_parses = r.counter('polisher_unknown_parses_total', 'OCR results that matched no rule')
+        self.ocr_cache_lookups = r.counter('polisher_ocr_cache_lookups_total',
+                                           'OCR cache lookups (exact frame match), by result', ('result',))
+        self.action_seconds = r.histogram('polisher_action_seconds', 'F1/F5 input burst duration')
+        self.capture_seconds = r.histogram('polisher_capture_seconds', 'Screen capture of the result region')
+        self.ocr_seconds = r.histogram('polisher_ocr_seconds', 'Recognition time (cache, templates or OCR)')
+        self.parse_seconds = r.histogram('polisher_parse_seconds', 'OCR text parsing time')
+        self.cycle_seconds = r.histogram('polisher_cycle_seconds', 'Full attempt cycle, action to next action')
+
+
+class MetricsServer:
+    """HTTP сервер /metrics в фоновом потоке"""
+
+    def __init__(self, registry, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        if self.server is not None:
+            return
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # без строки в консоли на каждый опрос
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"Error starting metrics server: {e}")
+            return
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"Metrics: http://{self.host}:{self.server.server_address[1]}/metrics")
+
+    def stop(self):
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.server = None
+        self.thread = None
@@ -0,0 +1,134 @@
+"""
+Кэш результатов OCR по точному совпадению кадра для Polisher
+
+Окна результата в игре повторяются (несколько вариантов "Failed" и "Success +N"),
+поэтому вместо повторного OCR текст берется из LRU кэша по отпечатку
+предобработанной области: битовой маске темных пикселей в исходном разрешении.
+
+По умолчанию это кэш точных совпадений, а не похожих кадров: цифры уровня
+занимают мало пикселей, грубые хэши (dHash 16x16) путают +2 и +3, поэтому допуск
+OCR_CACHE_MAX_DISTANCE нулевой. Кадр, в котором сдвинулся хоть один пиксель маски
+(анимация, фон под окном), - промах. Насколько часто кэш попадает на реальных
+кадрах, показывают stats() при остановке цикла, счетчик
+polisher_ocr_cache_lookups_total и replay_benchmark.py по записанному корпусу.
+Кэш сохраняется на диск, чтобы после перезапуска начинать уже с заполненным
+кэшем.
+"""
+
+import json
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from config import OCR_CACHE_SIZE, OCR_CACHE_MAX_DISTANCE, OCR_CACHE_FILE
+
+CACHE_VERSION = 2
+
+
+def perceptual_hash(img, step=1):
+    """Отпечаток кадра: маска темных пикселей каждого step-го пикселя вместе с размером
+
+    step - коэффициент увеличения из предобработки, чтобы вернуться к исходному разрешению.
+    """
+    if isinstance(img, Image.Image):
+        img = img.convert('L')
+    pixels = np.asarray(img)[::step, ::step]
+    height, width = pixels.shape
+    bits = np.packbits(pixels < 128)
+    return int.from_bytes(struct.pack('>HH', height, width) + bits.tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class OcrCache:
+    def __init__(self, max_size=OCR_CACHE_SIZE, max_distance=OCR_CACHE_MAX_DISTANCE, path=OCR_CACHE_FILE):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.path = path
+        self.entries = OrderedDict()  # hash -> text
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, img, step=1):
+        return perceptual_hash(img, step)
+
+    def get(self, key):
+        """Возвращает закэшированный текст для хэша или None"""
+        with self.lock:
+            found = key if key in self.entries else None
+
+            if found is None and self.max_distance > 0:
+                best_distance = self.max_distance + 1
+                texts = set()
+                for cached_key in self.entries:
+                    distance = hamming_distance(key, cached_key)
+                    if distance <= self.max_distance:
+                        texts.add(self.entries[cached_key])
+                        if distance < best_distance:
+                            found = cached_key
+                            best_distance = distance
+                # Рядом несколько разных окон - не угадываем, пусть решает OCR
+                if len(texts) > 1:
+                    found = None
+
+            if found is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.entries.move_to_end(found)
+            return self.entries[found]
+
+    def put(self, key, text):
+        with self.lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total) * 100 if total else 0.0
+        return f"OCR cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}%), {len(self.entries)} entries"
+
+    def load(self):
+        """Загружает кэш с диска (если файл есть и того же формата)"""
+        try:
+            if not self.path or not os.path.exists(self.path):
+                return
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CACHE_VERSION:
+                print(f"OCR cache {self.path} has an old format, ignoring")
+                return
+            with self.lock:
+                self.entries.clear()
+                for key, text in data.get('entries', []):
+                    self.entries[int(key, 16)] = text
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+            print(f"OCR cache loaded from {self.path} ({len(self.entries)} entries)")
+        except Exception as e:
+            print(f"Error loading OCR cache: {e}")
+
+    def save(self):
+        """Сохраняет кэш на диск (от самых старых к самым свежим)"""
+        try:
+            if not self.path:
+                return
+            with self.lock:
+                data = {
+                    'version': CACHE_VERSION,
+                    'entries': [[format(key, 'x'), text] for key, text in self.entries.items()]
+                }
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error saving OCR cache: {e}")
@@ -0,0 +1,152 @@
+"""
+Долгоживущий OCR движок для Polisher
+
+Загружает модели tesseract один раз и распознает изображения прямо из памяти,
+без запуска отдельного процесса tesseract и временных файлов на каждый захват.
+Если tesserocr не установлен, используется pytesseract (медленнее, но работает).
+tesserocr (вместе с libtesseract) импортируется только при первом OCR, а не при
+запуске приложения.
+"""
+
+import os
+import threading
+
+from config import OCR_LANG, TESSDATA_PREFIX, configure_tesseract
+
+_tesserocr = False  # False - еще не пробовали импортировать, None - не установлен
+
+
+def load_tesserocr():
+    """Модуль tesserocr или None, если он не установлен"""
+    global _tesserocr
+    if _tesserocr is False:
+        try:
+            import tesserocr
+        except ImportError:
+            tesserocr = None
+        _tesserocr = tesserocr
+    return _tesserocr
+
+
+class OcrEngine:
+    def __init__(self, lang=OCR_LANG, psm=None, oem=None, whitelist=None):
+        self.lang = lang
+        self.psm = psm  # режим сегментации страницы, None - по умолчанию tesseract
+        self.oem = oem  # режим движка, None - по умолчанию tesseract
+        self.whitelist = whitelist  # допустимые символы, None - все
+        self.api = None
+        self.fallback_ready = False  # pytesseract настроен (путь к tesseract.exe)
+        self.lock = threading.Lock()
+
+    def configure(self, profile):
+        """Применяет OCR профиль (lang, psm, oem, whitelist), модели перезагрузятся при следующем вызове"""
+        self.close()
+        with self.lock:
+            self.lang = profile.get('lang') or OCR_LANG
+            self.psm = profile.get('psm')
+            self.oem = profile.get('oem')
+            self.whitelist = profile.get('whitelist')
+
+    def _tesseract_config(self):
+        """Те же настройки в виде аргументов командной строки для pytesseract"""
+        options = []
+        if self.psm is not None:
+            options.append(f'--psm {self.psm}')
+        if self.oem is not None:
+            options.append(f'--oem {self.oem}')
+        if self.whitelist:
+            options.append(f'-c tessedit_char_whitelist={self.whitelist}')
+        return ' '.join(options)
+
+    @property
+    def in_process(self):
+        return load_tesserocr() is not None
+
+    def start(self):
+        """Загружает модели (без tesserocr - настраивает pytesseract). Безопасно вызывать повторно"""
+        with self.lock:
+            if self.api is not None or self.fallback_ready:
+                return
+            tesserocr = load_tesserocr()
+            if tesserocr is None:
+                configure_tesseract()
+                self.fallback_ready = True
+                print("tesserocr not installed, falling back to pytesseract subprocess")
+                return
+            kwargs = {'lang': self.lang}
+            if TESSDATA_PREFIX and os.path.isdir(TESSDATA_PREFIX):
+                kwargs['path'] = TESSDATA_PREFIX
+            if self.psm is not None:
+                kwargs['psm'] = self.psm
+            if self.oem is not None:
+                kwargs['oem'] = self.oem
+            self.api = tesserocr.PyTessBaseAPI(**kwargs)
+            if self.whitelist:
+                self.api.SetVariable('tessedit_char_whitelist', self.whitelist)
+            print(f"OCR engine started (tesserocr, lang={self.lang}, psm={self.psm}, oem={self.oem})")
+
+    def prewarm(self):
+        """Прогревает движок на пустом изображении, чтобы первый захват не был медленным"""
+        from PIL import Image
+
+        self.start()
+        try:
+            self.recognize(Image.new('L', (64, 16), 255))
+        except Exception as e:
+            print(f"Error prewarming OCR engine: {e}")
+
+    def recognize(self, img):
+        """Распознает текст на PIL изображении и возвращает строку"""
+        if self.api is None:
+            self.start()
+
+        if self.api is None:
+            import pytesseract
+            return pytesseract.image_to_string(img, lang=self.lang, config=self._tesseract_config())
+
+        with self.lock:
+            self.api.SetImage(img)
+            return self.api.GetUTF8Text()
+
+    def recognize_words(self, img):
+        """Распознает текст и возвращает (текст, слова)
+
+        слова - список (текст слова, (x, y, ширина, высота), уверенность 0-100).
+        """
+        if self.api is None:
+            self.start()
+
+        if self.api is None:
+            import pytesseract
+            data = pytesseract.image_to_data(img, lang=self.lang, config=self._tesseract_config(),
+                                             output_type=pytesseract.Output.DICT)
+            words = []
+            for i, word in enumerate(data['text']):
+                if word.strip():
+                    box = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
+                    words.append((word, box, float(data['conf'][i])))
+            return ' '.join(word for word, _, _ in words), words
+
+        with self.lock:
+            self.api.SetImage(img)
+            self.api.Recognize()
+            text = self.api.GetUTF8Text()
+            words = []
+            tesserocr = load_tesserocr()
+            iterator = self.api.GetIterator()
+            level = tesserocr.RIL.WORD
+            for word in tesserocr.iterate_level(iterator, level):
+                word_text = word.GetUTF8Text(level)
+                box = word.BoundingBox(level)
+                if word_text and box:
+                    x1, y1, x2, y2 = box
+                    words.append((word_text, (x1, y1, x2 - x1, y2 - y1), word.Confidence(level)))
+            return text, words
+
+    def close(self):
+        """Освобождает модели tesseract"""
+        with self.lock:
+            if self.api is not None:
+                self.api.End()
+                self.api = None
+                print("OCR engine stopped")
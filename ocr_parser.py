@@ -0,0 +1,133 @@
+"""
+Разбор текста окна результата для Polisher
+
+Табличный парсер: правила и регулярные выражения компилируются один раз при
+импорте, ключевые фразы ищутся с допуском по расстоянию редактирования, так что
+одна ошибочно распознанная буква больше не превращает результат в 'unknown'.
+Каждый разбор сообщает, какое правило сработало, а счетчики правил позволяют
+оценить, сколько повторных OCR удалось избежать.
+"""
+
+import re
+import threading
+from collections import Counter
+
+from config import OCR_PARSE_MAX_ERROR_RATE
+
+# Все, кроме букв, цифр, пробелов и '+', выбрасываем
+CLEAN_RE = re.compile(r'[^\w\s+]')
+SPACES_RE = re.compile(r'\s+')
+# Число уровня сразу после ключевой фразы ("now a +7", "теперь +7"). OCR путает 0
+# с буквой O (латинской или русской), поэтому "+1O" читается как 10, а не как 1
+LEVEL_RE = re.compile(r'\s*\+?\s*([0-9][0-9oо]?)(?![0-9oо])')
+LETTER_ZERO = str.maketrans('oо', '00')
+# Прямое упоминание +10 (цель) проверяем до всех остальных правил
+TARGET_RE = re.compile(r'\+\s*10(?![0-9])|now\s+a\s+10(?![0-9])|теперь\s+\+?\s*10(?![0-9])')
+
+# Правила проверяются по порядку: (имя, исход, фразы-маркеры, фразы перед уровнем)
+# Для каждой позиции достаточно найти любую из альтернатив.
+RULES = (
+    ('failed_en', 'failed', (('failed',), ('you have obtained',)), None),
+    ('failed_ru', 'failed', (('неудача', 'провал'), ('вы получили',)), None),
+    ('success_en', 'success', (('success',),), ('the item is now a', 'now a')),
+    ('success_ru', 'success', (('успех', 'успешно'),), ('предмет теперь', 'теперь')),
+)
+
+
+def max_errors(phrase, error_rate=OCR_PARSE_MAX_ERROR_RATE):
+    return int(len(phrase) * error_rate + 0.5)
+
+
+def fuzzy_find(text, phrase, errors):
+    """Ищет phrase в text с не более чем errors правками (алгоритм Селлерса)
+
+    Возвращает (число правок, позиция конца совпадения) для лучшего совпадения
+    или None.
+    """
+    if phrase in text:
+        return 0, text.index(phrase) + len(phrase)
+    if errors <= 0:
+        return None
+
+    m = len(phrase)
+    # column[i] - расстояние между phrase[:i] и лучшей подстрокой, кончающейся в текущей позиции
+    column = list(range(m + 1))
+    best = None
+    for j, char in enumerate(text, 1):
+        previous_diagonal = column[0]
+        column[0] = 0
+        for i in range(1, m + 1):
+            previous = column[i]
+            cost = 0 if phrase[i - 1] == char else 1
+            column[i] = min(previous + 1, column[i - 1] + 1, previous_diagonal + cost)
+            previous_diagonal = previous
+        if column[m] <= errors and (best is None or column[m] < best[0]):
+            best = (column[m], j)
+            if column[m] == 0:
+                break
+    return best
+
+
+def normalize(text):
+    return SPACES_RE.sub(' ', CLEAN_RE.sub('', text.lower())).strip()
+
+
+class OcrParser:
+    def __init__(self, error_rate=OCR_PARSE_MAX_ERROR_RATE):
+        self.error_rate = error_rate
+        self.rule_counts = Counter()
+        self.lock = threading.Lock()
+
+    def _find_any(self, text, phrases):
+        for phrase in phrases:
+            found = fuzzy_find(text, phrase, max_errors(phrase, self.error_rate))
+            if found is not None:
+                return found
+        return None
+
+    def _level_after(self, text, phrases):
+        for phrase in phrases:
+            found = fuzzy_find(text, phrase, max_errors(phrase, self.error_rate))
+            if found is None:
+                continue
+            match = LEVEL_RE.match(text, found[1])
+            if match:
+                return int(match.group(1).translate(LETTER_ZERO))
+        return None
+
+    def parse(self, text, count=True):
+        """Разбирает текст окна
+
+        Возвращает (исход, уровень, правило): ('success', N, ...),
+        ('failed', None, ...) или ('unknown', None, None).
+        count=False - не учитывать разбор в счетчиках правил.
+        """
+        result = self._parse(text)
+        if count:
+            with self.lock:
+                self.rule_counts[result[2] or 'unknown'] += 1
+        return result
+
+    def _parse(self, text):
+        lowered = text.lower()
+        if TARGET_RE.search(lowered):
+            return ('success', 10, 'target_10')
+
+        clean_text = normalize(text)
+        for name, outcome, markers, level_phrases in RULES:
+            if not all(self._find_any(clean_text, phrases) for phrases in markers):
+                continue
+            if level_phrases is None:
+                return (outcome, None, name)
+            level = self._level_after(clean_text, level_phrases)
+            if level is not None and 0 <= level <= 10:
+                return (outcome, level, name)
+
+        return ('unknown', None, None)
+
+    def summary(self):
+        with self.lock:
+            counts = dict(self.rule_counts)
+        if not counts:
+            return "Parse rules: no results yet"
+        return "Parse rules: " + ", ".join(f"{rule}={count}" for rule, count in sorted(counts.items()))
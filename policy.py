@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Политика F1/F5: какое действие делать на каждом уровне
+
+Таблица политики (POLICY_FILE) хранит действие для уровней +0 ... +9, цикл
+берет из нее следующее действие (ScreenTextCapture.action_for_level). Пока таблицы
+нет, действует прежнее правило: F1 до +2, F5 с POLICY_F5_FROM_LEVEL.
+
+Пересчет (из меню трея или python policy.py) решает задачу кратчайшего пути
+до +10 динамическим программированием (итерациями по политикам): по статистике
+берутся эмпирические вероятности переходов для F1 и F5 и средняя длительность
+цикла каждого действия, и на каждом уровне выбирается действие с наименьшим
+ожидаемым временем до +10. Действие участвует в выборе на уровне только если
+по нему там набралось POLICY_MIN_ATTEMPTS попыток.
+
+Пример:
+    python policy.py
+    python policy.py polisher_statistics.db --backend sqlite --dry-run
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+
+from config import POLICY_FILE, POLICY_F5_FROM_LEVEL, POLICY_MIN_ATTEMPTS, STATISTICS_BACKEND
+
+MAX_LEVEL = 10
+# Предел итераций по политикам (обычно сходится за 2-3)
+MAX_ITERATIONS = 100
+
+
+def default_actions():
+    """Прежнее правило цикла: действие для уровней +0 ... +9"""
+    return ['F1' if level < POLICY_F5_FROM_LEVEL else 'F5' for level in range(MAX_LEVEL)]
+
+
+class PolicyTable:
+    def __init__(self, actions=None, expected_seconds=None, computed_at=None, attempts=0):
+        self.actions = list(actions) if actions else default_actions()
+        self.expected_seconds = expected_seconds  # ожидаемое время до +10 с каждого уровня
+        self.computed_at = computed_at
+        self.attempts = attempts  # сколько попыток статистики легло в расчет
+
+    def action(self, level):
+        """Действие ('F1' или 'F5') для предмета на уровне +level"""
+        if 0 <= level < MAX_LEVEL:
+            return self.actions[level]
+        return 'F5' if level >= POLICY_F5_FROM_LEVEL else 'F1'
+
+    def to_dict(self):
+        return {
+            'actions': self.actions,
+            'expected_seconds': self.expected_seconds,
+            'computed_at': self.computed_at,
+            'attempts': self.attempts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        actions = data.get('actions')
+        if not isinstance(actions, list) or len(actions) != MAX_LEVEL or any(a not in ('F1', 'F5') for a in actions):
+            raise ValueError("bad policy table")
+        return cls(actions, data.get('expected_seconds'), data.get('computed_at'), data.get('attempts', 0))
+
+    def describe(self):
+        return " ".join(f"+{level}:{action}" for level, action in enumerate(self.actions))
+
+
+def load_policy(path=POLICY_FILE):
+    """Таблица из файла; без файла (или при ошибке) - прежнее правило"""
+    if path is None or not os.path.exists(path):
+        return PolicyTable()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return PolicyTable.from_dict(json.load(f))
+    except Exception as e:
+        print(f"Error loading policy: {e}")
+        return PolicyTable()
+
+
+def save_policy(table, path=POLICY_FILE):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(table.to_dict(), f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def action_cycle_seconds(analyzer):
+    """Средняя длительность цикла по действиям {'F1': сек, 'F5': сек} из SessionAnalyzer
+
+    Если по действию нет данных - средняя по всем циклам, если нет совсем - 1 сек
+    (тогда политика минимизирует число попыток).
+    """
+    overall = analyzer.cycle_sum / analyzer.cycle_count if analyzer.cycle_count else 1.0
+    seconds = {}
+    for action in ('F1', 'F5'):
+        count = analyzer.action_cycle_count.get(action, 0)
+        seconds[action] = analyzer.action_cycle_sum[action] / count if count else overall
+    return seconds
+
+
+def optimize(counts, cycle_seconds, min_attempts=POLICY_MIN_ATTEMPTS, start=None):
+    """Политика с наименьшим ожидаемым временем до +10, возвращает (действия, ожидаемые секунды)
+
+    counts - массив [действие, с уровня, на уровень] (cost_model.transition_counts),
+    cycle_seconds - {'F1': сек, 'F5': сек}. Итерации по политикам: оценка текущей
+    политики решением (I - Q) V = c, затем на каждом уровне действие с наименьшим
+    c_a + P_a V (при равенстве остается прежнее), пока политика не перестанет меняться.
+    ValueError, если данных не хватает ни на одну политику, доводящую до +10.
+    """
+    import numpy as np
+
+    from stats_aggregate import ACTIONS
+
+    counts = np.asarray(counts, dtype=np.float64)
+    attempts = counts[:, :MAX_LEVEL].sum(axis=2)  # [действие, уровень]
+    allowed = attempts >= max(min_attempts, 1)
+    for level in range(MAX_LEVEL):
+        if not allowed[:, level].any():
+            # Мало данных для обоих действий - берем то, по которому есть хоть что-то
+            allowed[:, level] = attempts[:, level] == attempts[:, level].max()
+            if attempts[:, level].max() == 0:
+                raise ValueError(f"нет попыток с уровня +{level}")
+    matrices = counts / np.maximum(counts.sum(axis=2, keepdims=True), 1)
+    costs = np.array([cycle_seconds[action] for action in ACTIONS])
+
+    policy = [ACTIONS.index(action) for action in (start or default_actions())]
+    for level in range(MAX_LEVEL):
+        if not allowed[policy[level], level]:
+            policy[level] = 1 - policy[level]
+
+    identity = np.eye(MAX_LEVEL)
+    for _ in range(MAX_ITERATIONS):
+        transient = np.array([matrices[policy[level], level, :MAX_LEVEL] for level in range(MAX_LEVEL)])
+        cost = costs[policy]
+        try:
+            values = np.linalg.solve(identity - transient, cost)
+        except np.linalg.LinAlgError:
+            raise ValueError("+10 недостижим по данным при текущей политике")
+        if not np.all(np.isfinite(values)) or np.any(values < 0):
+            raise ValueError("+10 недостижим по данным при текущей политике")
+
+        full = np.append(values, 0.0)
+        q_values = costs[:, None] + matrices[:, :MAX_LEVEL] @ full  # [действие, уровень]
+        q_values[~allowed] = np.inf
+        changed = False
+        for level in range(MAX_LEVEL):
+            best = int(np.argmin(q_values[:, level]))
+            if q_values[best, level] < q_values[policy[level], level] - 1e-9 * max(1.0, values[level]):
+                policy[level] = best
+                changed = True
+        if not changed:
+            break
+
+    return [ACTIONS[index] for index in policy], values.tolist()
+
+
+def recompute_policy(path, backend=STATISTICS_BACKEND, policy_path=POLICY_FILE, min_attempts=POLICY_MIN_ATTEMPTS):
+    """Пересчитывает политику по файлу статистики и сохраняет ее (policy_path=None - не сохранять)"""
+    from cost_model import transition_counts
+    from stats_aggregate import load_counters, iter_source
+    from stats_sessions import analyze_sessions
+
+    counters = load_counters(path, backend)
+    if not counters.total:
+        raise ValueError("нет данных")
+    cycle_seconds = action_cycle_seconds(analyze_sessions(iter_source(path, backend)))
+    actions, expected = optimize(transition_counts(counters), cycle_seconds, min_attempts,
+                                 start=load_policy(policy_path).actions)
+    table = PolicyTable(actions, [round(value, 1) for value in expected],
+                        datetime.now().isoformat(timespec='seconds'), counters.total)
+    if policy_path is not None:
+        save_policy(table, policy_path)
+    return table, cycle_seconds
+
+
+def main():
+    from stats_sink import default_path
+
+    arg_parser = argparse.ArgumentParser(description='Пересчет политики F1/F5 по статистике Polisher')
+    arg_parser.add_argument('path', nargs='?', default=None, help='файл статистики (по умолчанию из config.py)')
+    arg_parser.add_argument('--backend', choices=('jsonl', 'sqlite', 'binary'), default=STATISTICS_BACKEND,
+                            help='формат файла статистики')
+    arg_parser.add_argument('--min-attempts', type=int, default=POLICY_MIN_ATTEMPTS,
+                            help='минимум попыток действия на уровне, чтобы его рассматривать')
+    arg_parser.add_argument('--dry-run', action='store_true', help=f'только показать, не записывать {POLICY_FILE}')
+    args = arg_parser.parse_args()
+
+    path = args.path or default_path(args.backend)
+    if not os.path.exists(path):
+        print(f"Файл статистики {path} не найден!")
+        return
+
+    previous = load_policy()
+    try:
+        table, cycle_seconds = recompute_policy(path, args.backend, None if args.dry_run else POLICY_FILE,
+                                                args.min_attempts)
+    except ValueError as e:
+        print(f"Недостаточно данных для политики: {e}")
+        return
+
+    print("\n" + "="*70)
+    print(f"ПОЛИТИКА F1/F5 (попыток в статистике: {table.attempts})")
+    print("="*70)
+    print(f"Длительность цикла: F1 {cycle_seconds['F1']:.1f} сек, F5 {cycle_seconds['F5']:.1f} сек")
+    print(f"Было:  {previous.describe()}")
+    print(f"Стало: {table.describe()}")
+    print("\nОжидаемое время до +10:")
+    for level, seconds in enumerate(table.expected_seconds):
+        print(f"  с +{level}: {table.actions[level]}, {seconds / 3600:.2f} ч")
+    if args.dry_run:
+        print(f"\n{POLICY_FILE} не изменен (--dry-run)")
+    else:
+        print(f"\nСохранено в {POLICY_FILE}")
+    print("="*70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Офлайн бенчмарк OCR для Polisher
+
+Прогоняет записанный корпус кадров (см. frame_recorder.py) через тот же путь,
+что и цикл: декодирование кадра -> предобработка -> OCR -> разбор, и выводит
+пропускную способность, p50/p95 задержки по этапам, долю ошибок разбора
+относительно разметки корпуса и долю попаданий в кэш OCR (точное совпадение
+кадра) при первом проходе корпуса по порядку записи.
+
+Пример:
+    python replay_benchmark.py polisher_corpus --repeat 3
+"""
+
+import argparse
+import json
+import os
+import time
+
+from config import OCR_PREPROCESS, SETTINGS_FILE
+from corpus import load_corpus, load_frame, outcome_of
+from ocr_cache import OcrCache
+from ocr_engine import OcrEngine
+from ocr_parser import OcrParser
+from preprocess import preprocess_image
+
+
+def percentile(values, p):
+    """Перцентиль p (0-100) по отсортированному списку методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def load_ocr_profile(path=SETTINGS_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('ocr_profile')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Офлайн бенчмарк OCR + разбора по корпусу кадров')
+    arg_parser.add_argument('corpus', help='папка корпуса с frames.jsonl')
+    arg_parser.add_argument('--repeat', type=int, default=1, help='сколько раз прогонять корпус')
+    arg_parser.add_argument('--no-profile', action='store_true',
+                            help='не применять ocr_profile из настроек')
+    arg_parser.add_argument('--show-misparses', action='store_true', help='печатать кадры с ошибкой разбора')
+    args = arg_parser.parse_args()
+
+    records = load_corpus(args.corpus)
+    if not records:
+        print("Нет кадров для бенчмарка.")
+        return
+
+    engine = OcrEngine()
+    options = dict(OCR_PREPROCESS)
+    profile = None if args.no_profile else load_ocr_profile()
+    if profile:
+        engine.configure(profile)
+        if profile.get('scale'):
+            options['scale'] = profile['scale']
+        print(f"OCR профиль: {profile}")
+
+    parser = OcrParser()
+    timings = {'decode': [], 'preprocess': [], 'ocr': [], 'parse': [], 'total': []}
+    # Отдельный кэш без файла: повторные проходы корпуса попадали бы всегда
+    cache = OcrCache(path=None)
+    scale = int(options.get('scale', 1))
+    labelled = 0
+    misparsed = 0
+    unknown = 0
+
+    engine.start()
+    try:
+        wall_started = time.perf_counter()
+        for repeat in range(args.repeat):
+            for record in records:
+                t0 = time.perf_counter()
+                frame = load_frame(record)
+                t1 = time.perf_counter()
+                img = preprocess_image(frame, options)
+                t2 = time.perf_counter()
+                text = engine.recognize(img)
+                t3 = time.perf_counter()
+                outcome, level, _ = parser.parse(text)
+                t4 = time.perf_counter()
+
+                if repeat == 0:
+                    key = cache.key(img, scale)
+                    if cache.get(key) is None and outcome != 'unknown':
+                        cache.put(key, text)
+
+                timings['decode'].append(t1 - t0)
+                timings['preprocess'].append(t2 - t1)
+                timings['ocr'].append(t3 - t2)
+                timings['parse'].append(t4 - t3)
+                timings['total'].append(t4 - t0)
+
+                if outcome == 'unknown':
+                    unknown += 1
+                if record.get('action') in (None, 'unknown'):
+                    continue
+                labelled += 1
+                if (outcome, level) != outcome_of(record['action'], record.get('value')):
+                    misparsed += 1
+                    if args.show_misparses:
+                        print(f"  {record['file']}: ожидалось {record['action']}/{record.get('value')}, "
+                              f"OCR: {text.strip()!r}")
+        wall = time.perf_counter() - wall_started
+    finally:
+        engine.close()
+
+    frames = len(timings['total'])
+    print("\n" + "=" * 70)
+    print("БЕНЧМАРК OCR + РАЗБОРА")
+    print("=" * 70)
+    print(f"Кадров: {frames} ({len(records)} x {args.repeat})")
+    print(f"Пропускная способность: {frames / wall:.1f} кадров/сек")
+    print(f"\n{'этап':<12}{'p50, мс':>10}{'p95, мс':>10}")
+    for stage, values in timings.items():
+        print(f"{stage:<12}{percentile(values, 50) * 1000:>10.2f}{percentile(values, 95) * 1000:>10.2f}")
+
+    print()
+    if labelled:
+        print(f"Ошибки разбора: {misparsed}/{labelled} ({misparsed / labelled * 100:.1f}%)")
+    print(f"Нераспознанные (unknown): {unknown}/{frames} ({unknown / frames * 100:.1f}%)")
+    print(cache.stats())
+    print("=" * 70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Ожидание окна результата для Polisher
+
+Вместо фиксированной паузы OCR_DELAY опрашивает уменьшенную копию выбранной
+области и запускает OCR, как только картинка изменилась и перестала меняться
+несколько кадров подряд. OCR_DELAY остается только как таймаут.
+"""
+
+import asyncio
+
+import numpy as np
+
+from clock import RealClock
+from config import (OCR_WATCH_INTERVAL, OCR_WATCH_STABLE_FRAMES, OCR_WATCH_DOWNSAMPLE,
+                    OCR_WATCH_PIXEL_DELTA, OCR_WATCH_CHANGED_SHARE, OCR_WATCH_MIN_CONTRAST)
+
+
+class ResultWatcher:
+    def __init__(self, capture_session,
+                 interval=OCR_WATCH_INTERVAL,
+                 stable_frames=OCR_WATCH_STABLE_FRAMES,
+                 downsample=OCR_WATCH_DOWNSAMPLE,
+                 pixel_delta=OCR_WATCH_PIXEL_DELTA,
+                 changed_share=OCR_WATCH_CHANGED_SHARE,
+                 min_contrast=OCR_WATCH_MIN_CONTRAST,
+                 clock=None):
+        self.capture_session = capture_session
+        self.clock = clock or RealClock()
+        self.interval = interval
+        self.stable_frames = stable_frames
+        self.downsample = max(1, int(downsample))
+        self.pixel_delta = pixel_delta
+        self.changed_share = changed_share
+        self.min_contrast = min_contrast
+        self.baseline = None
+
+    def sample(self, region):
+        """Дешевый захват: каждый N-й пиксель зеленого канала"""
+        bgra = self.capture_session.grab_bgra(region)
+        step = self.downsample
+        return bgra[::step, ::step, 1].astype(np.int16)
+
+    def differs(self, a, b):
+        """Кадры разные, если заметно изменилась достаточная доля пикселей
+
+        Доля, а не средняя разница: текст окна занимает мало пикселей и почти не
+        сдвигает среднюю яркость области.
+        """
+        changed = np.count_nonzero(np.abs(a - b) > self.pixel_delta)
+        return changed > self.changed_share * a.size
+
+    def arm(self, region):
+        """Запоминает картинку области до действия"""
+        try:
+            self.baseline = self.sample(region)
+        except Exception as e:
+            print(f"Error arming result watcher: {e}")
+            self.baseline = None
+
+    async def wait(self, region, timeout, executor=None):
+        """Ждет появления и стабилизации окна результата
+
+        Корутина: ожидание снимается отменой задачи. Возвращает True, если окно
+        дождались, False - по таймауту. Кадры снимаются в executor (поток ввода и
+        OCR автомата), чтобы весь захват шел в одном потоке с контекстом mss.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = self.clock.monotonic() + timeout
+        baseline = self.baseline
+        self.baseline = None
+        if baseline is None:
+            # Не с чем сравнивать - ведем себя как раньше
+            await self.clock.wait(timeout)
+            return False
+
+        changed = False
+        previous = None
+        stable = 0
+
+        while self.clock.monotonic() < deadline:
+            frame = await loop.run_in_executor(executor, self.sample, region)
+
+            if not changed:
+                changed = self.differs(frame, baseline)
+            elif previous is not None and not self.differs(frame, previous):
+                stable += 1
+            else:
+                stable = 0
+            previous = frame
+
+            # Пустая однотонная область - окно еще не нарисовано
+            if changed and stable >= self.stable_frames and float(frame.std()) >= self.min_contrast:
+                return True
+
+            await self.clock.wait(self.interval)
+
+        return False
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Симулятор игры для Polisher
+
+Рисует окно результата в буфер в памяти через Pillow и разыгрывает попытки
+заточки с настраиваемыми по уровням вероятностями успеха и поломки. Подставляется
+вместо ввода, захвата экрана и OCR, которые используют execute_drag_action,
+execute_drag_action_f5 и capture_ocr_only, а все паузы идут по виртуальным
+часам. Тысячи попыток проходят за секунды, без игры и без дисплея.
+
+С --workspaces N разыгрываются N независимых окон (каждое - своя рабочая
+область со своей областью и точками) на одних мыши и клавиатуре.
+
+Пример:
+    python simulator.py --attempts 5000 --seed 1
+    python simulator.py --attempts 5000 --seed 1 --workspaces 3
+"""
+
+import argparse
+import asyncio
+import contextlib
+import heapq
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Вероятности по уровню предмета (индекс - текущий уровень +0 ... +9)
+DEFAULT_F1_SUCCESS = [1.0, 1.0, 1.0, 0.60, 0.50, 0.40, 0.35, 0.30, 0.25, 0.20]
+DEFAULT_F5_SUCCESS = [1.0, 1.0, 1.0, 0.70, 0.60, 0.50, 0.45, 0.40, 0.35, 0.30]
+# F5 при неудаче ломает предмет (падение на 0) с этой вероятностью, иначе уровень падает на 1
+DEFAULT_F5_BREAK = [0.0, 0.0, 0.0, 0.25, 0.30, 0.35, 0.40, 0.45, 0.50, 0.55]
+
+REGION_SIZE = (360, 80)
+POINT_A = (100, 300)
+POINT_B = (200, 300)
+POINT_C = (300, 300)
+FOCUS_POINT = (20, 200)  # клик в окно перед клавишей, когда окон несколько
+WINDOW_STEP = 1000  # сдвиг по вертикали между окнами
+
+
+class VirtualClock:
+    """Часы, которые не ждут: sleep только сдвигает текущее время
+
+    wait - дискретные события: ожидание встает в очередь по своему сроку, и время
+    прыгает к ближайшему сроку, только когда все задачи event loop ждут. Так
+    ожидания нескольких рабочих областей перекрываются, как на настоящих часах,
+    а sleep внутри действия (в потоке ввода) сдвигает время для всех.
+    """
+
+    def __init__(self, start=None):
+        self.elapsed = 0.0
+        self.start = start or datetime.now()
+        self.waiters = []  # куча (срок, номер, future)
+        self.order = itertools.count()
+        self.watched = set()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.elapsed += seconds
+
+    async def wait(self, seconds):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (self.elapsed + max(seconds, 0), next(self.order), future))
+        for task in asyncio.all_tasks():
+            if task not in self.watched:
+                # Закончившаяся задача больше не держит время
+                self.watched.add(task)
+                task.add_done_callback(self._task_done)
+        self._advance()
+        await future
+        await asyncio.sleep(0)
+
+    def _task_done(self, task):
+        self.watched.discard(task)
+        self._advance()
+
+    def _advance(self):
+        while self.waiters and self.waiters[0][2].done():
+            heapq.heappop(self.waiters)  # отмененные ожидания
+        if not self.waiters:
+            return
+        running = sum(1 for task in self.watched if not task.done())
+        waiting = sum(1 for _, _, future in self.waiters if not future.done())
+        if waiting >= running:
+            deadline, _, future = heapq.heappop(self.waiters)
+            self.elapsed = max(self.elapsed, deadline)
+            future.set_result(None)
+
+    def monotonic(self):
+        return self.elapsed
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+
+class GameSimulator:
+    def __init__(self, clock, f1_success=None, f5_success=None, f5_break=None,
+                 dialog_delay=(0.8, 1.6), region_size=REGION_SIZE, seed=None):
+        self.clock = clock
+        self.f1_success = f1_success or DEFAULT_F1_SUCCESS
+        self.f5_success = f5_success or DEFAULT_F5_SUCCESS
+        self.f5_break = f5_break or DEFAULT_F5_BREAK
+        self.dialog_delay = dialog_delay
+        self.region_size = region_size
+        self.rng = random.Random(seed)
+        self.frames = {}  # текст -> отрисованный кадр
+        self.frames_bgra = {}  # текст -> тот же кадр в BGRA
+        self.level = 0
+        self.text = ''
+        self.visible_at = 0.0
+        self.attempts = 0
+        self.completed = 0
+        self.breaks = 0
+
+    def reset_item(self):
+        """Новый предмет +0"""
+        self.level = 0
+        self.text = ''
+
+    def hide_dialog(self):
+        self.text = ''
+
+    def perform(self, action):
+        """Разыгрывает попытку 'F1' или 'F5' и через случайную задержку показывает окно результата"""
+        level = self.level
+        self.attempts += 1
+
+        if action == 'F5':
+            roll = self.rng.random()
+            if roll < self.f5_success[level]:
+                self.level = level + 1
+            elif roll < self.f5_success[level] + (1 - self.f5_success[level]) * self.f5_break[level]:
+                self.level = 0
+                self.breaks += 1
+            else:
+                self.level = max(0, level - 1)
+        elif self.rng.random() < self.f1_success[level]:
+            self.level = level + 1
+
+        if action == 'F5' and self.level == 0 and level > 0:
+            self.text = "Failed!\nYou have obtained a Black Stone."
+        elif self.level == level:
+            self.text = "Failed!\nYou have obtained a Black Stone."
+        else:
+            self.text = f"Success!\nThe item is now a +{self.level}."
+
+        if self.level >= 10:
+            self.completed += 1
+        self.visible_at = self.clock.monotonic() + self.rng.uniform(*self.dialog_delay)
+
+    def current_text(self):
+        if self.clock.monotonic() < self.visible_at:
+            return ''
+        return self.text
+
+    def render(self, text):
+        frame = self.frames.get(text)
+        if frame is None:
+            img = Image.new('L', self.region_size, 25)
+            if text:
+                ImageDraw.Draw(img).multiline_text((12, 12), text, fill=235, spacing=8)
+            frame = np.asarray(img)
+            self.frames[text] = frame
+        return frame
+
+    def frame(self):
+        return self.render(self.current_text())
+
+    def frame_bgra(self):
+        text = self.current_text()
+        frame = self.frames_bgra.get(text)
+        if frame is None:
+            frame = np.repeat(self.render(text)[:, :, None], 4, axis=2)
+            self.frames_bgra[text] = frame
+        return frame
+
+
+class SimInput:
+    """Ввод: F1/F5, перетаскивание A -> B и клик в C запускают попытку в симуляторе
+
+    Окон может быть несколько (add_window): клавиша уходит в активное окно, клик в
+    точку фокуса делает окно активным.
+    """
+
+    def __init__(self, game, clock, point_c=POINT_C, on_attempt=None):
+        self.game = game  # активное окно
+        self.clock = clock
+        self.on_attempt = on_attempt
+        self.click_points = {point_c: game}
+        self.focus_points = {}
+        self.pending = None
+        self.position = (0, 0)
+        self.pressed_at = None
+
+    def add_window(self, game, point_c, focus_point):
+        self.click_points[point_c] = game
+        self.focus_points[focus_point] = game
+
+    def press_key(self, key):
+        self.pending = key.upper()
+        self.game.hide_dialog()
+
+    def release_key(self, key):
+        pass
+
+    def move_to(self, x, y, duration):
+        self.clock.sleep(duration)
+        self.position = (x, y)
+
+    def mouse_down(self):
+        self.pressed_at = self.position
+
+    def mouse_up(self):
+        if self.pressed_at != self.position:
+            return
+        if self.position in self.focus_points:
+            self.game = self.focus_points[self.position]
+            return
+        game = self.click_points.get(self.position)
+        if game is None:
+            return
+        if game is not self.game:
+            # Клавиша ушла в другое окно - клик в C ничего не запускает
+            self.game = game
+            self.pending = None
+        elif self.pending:
+            game.perform(self.pending)
+            self.pending = None
+            if self.on_attempt is not None:
+                self.on_attempt()
+
+
+class SimCapture:
+    """Захват экрана из буфера симулятора (интерфейс как у capture.CaptureSession)
+
+    Окно выбирается по области захвата (add_window), по умолчанию - первое.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.windows = {}  # область -> окно
+        self.last = game  # окно последнего кадра для OCR (см. SimOcr)
+
+    def add_window(self, game, region):
+        self.windows[tuple(region)] = game
+
+    def window(self, region):
+        return self.windows.get(tuple(region), self.game) if region else self.game
+
+    def grab_gray(self, region):
+        self.last = self.window(region)
+        return self.last.frame()
+
+    def grab_bgra(self, region):
+        return self.window(region).frame_bgra()
+
+    def grab_gray_image(self, region):
+        self.last = self.window(region)
+        return Image.fromarray(self.last.frame())
+
+    def close(self):
+        pass
+
+    def close_all(self):
+        pass
+
+
+class SimOcr:
+    """OCR, который сразу знает текст окна последнего кадра (интерфейс как у ocr_engine.OcrEngine)"""
+
+    def __init__(self, capture):
+        self.capture = capture
+
+    def configure(self, profile):
+        pass
+
+    def start(self):
+        pass
+
+    def prewarm(self):
+        pass
+
+    def recognize(self, img):
+        return self.capture.last.current_text()
+
+    def recognize_words(self, img):
+        return self.capture.last.current_text(), []
+
+    def close(self):
+        pass
+
+
+class NullWriter:
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def window_layout(index, region_size):
+    """Область, точки A, B, C и точка фокуса окна index (окна друг под другом)"""
+    dy = index * WINDOW_STEP
+    width, height = region_size
+
+    def shift(point):
+        return (point[0], point[1] + dy)
+
+    return (0, dy, width, dy + height), shift(POINT_A), shift(POINT_B), shift(POINT_C), shift(FOCUS_POINT)
+
+
+def statistics_backend(path):
+    """Файл *.db - пишем в SQLite (см. stats_db.py), *.bin - в двоичный формат, иначе в JSONL"""
+    if path and path.endswith('.db'):
+        return 'sqlite'
+    if path and path.endswith('.bin'):
+        return 'binary'
+    return 'jsonl'
+
+
+def build_app(game, clock, real_ocr=False, statistics_file=None, max_attempts=None, policy_file=None,
+              extra_games=()):
+    """Собирает ScreenTextCapture поверх симулятора
+
+    extra_games - окна дополнительных рабочих областей ws1, ws2, ... (см. ScreenTextCapture.create_workspace).
+    """
+    from main import ScreenTextCapture
+    from ocr_engine import OcrEngine
+    from policy import load_policy
+    from stats_sink import StatisticsSink, workspace_path
+
+    app = None
+    games = [game] + list(extra_games)
+
+    def on_attempt():
+        if max_attempts is not None and sum(g.attempts for g in games) >= max_attempts:
+            for workspace in app.all_workspaces():
+                workspace.loop_running = False
+
+    sim_input = SimInput(game, clock, on_attempt=on_attempt)
+    capture = SimCapture(game)
+    app = ScreenTextCapture(
+        clock=clock,
+        input_backend=sim_input,
+        capture_session=capture,
+        ocr_engine=OcrEngine() if real_ocr else SimOcr(capture),
+        persistent=False,
+    )
+    if policy_file is not None:
+        app.policy = load_policy(policy_file)
+    app.show_notification = lambda message: None
+    app.statistics_file = statistics_file or os.devnull
+    for index, window in enumerate(games):
+        if index == 0:
+            workspace = app
+        else:
+            name = f"ws{index}"
+            path = workspace_path(statistics_file, name) if statistics_file else os.devnull
+            workspace = app.create_workspace({'name': name, 'statistics_file': path})
+            app.workspaces.append(workspace)
+        region, point_a, point_b, point_c, focus_point = window_layout(index, window.region_size)
+        workspace.selected_region = region
+        workspace.drag_point_a = point_a
+        workspace.drag_point_b = point_b
+        workspace.drag_point_c = point_c
+        if extra_games:
+            # Несколько окон - перед клавишей кликаем в свое окно
+            workspace.focus_point = focus_point
+            sim_input.add_window(window, point_c, focus_point)
+            capture.add_window(window, region)
+        workspace.statistics_sink = StatisticsSink(workspace.statistics_file,
+                                                   backend=statistics_backend(statistics_file))
+        workspace.show_notification = app.show_notification
+    return app
+
+
+def run_simulation(attempts, seed=None, real_ocr=False, statistics_file=None, verbose=False, policy_file=None,
+                   workspaces=1):
+    """Гоняет цикл до attempts попыток и возвращает (окна игры, часы, секунды реального времени)"""
+    random.seed(seed)
+    clock = VirtualClock()
+    games = [GameSimulator(clock, seed=None if seed is None else seed + index) for index in range(workspaces)]
+    app = build_app(games[0], clock, real_ocr, statistics_file, max_attempts=attempts, policy_file=policy_file,
+                    extra_games=games[1:])
+
+    windows = {id(workspace): game for workspace, game in zip(app.all_workspaces(), games)}
+
+    def restart(engine):
+        """Область дошла до +10 - сразу новый предмет в ее окне, остальные не ждут"""
+        if engine.current_level != 10 or sum(game.attempts for game in games) >= attempts:
+            return False
+        windows[id(engine.app)].reset_item()
+        engine.app.start_session()
+        engine.app.loop_running = True
+        return True
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(NullWriter())
+    started = time.perf_counter()
+    with output:
+        while sum(game.attempts for game in games) < attempts:
+            before = sum(game.attempts for game in games)
+            for game in games:
+                game.reset_item()
+            for workspace in app.all_workspaces():
+                workspace.loop_running = True
+            app.run_loop(app.all_workspaces(), restart)
+            if sum(game.attempts for game in games) == before:
+                # Цикл остановился, не сделав ни одной попытки - дальше крутить бессмысленно
+                break
+    wall = time.perf_counter() - started
+    return games, clock, wall
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Прогон цикла Polisher на симуляторе игры')
+    arg_parser.add_argument('--attempts', type=int, default=1000, help='сколько попыток сыграть')
+    arg_parser.add_argument('--seed', type=int, default=None, help='seed генератора случайных чисел')
+    arg_parser.add_argument('--real-ocr', action='store_true', help='распознавать кадры настоящим tesseract')
+    arg_parser.add_argument('--statistics', default=None, help='куда писать статистику попыток (JSONL, *.db - SQLite, *.bin - двоичный)')
+    arg_parser.add_argument('--policy', default=None, help='таблица политики F1/F5 (см. policy.py), по умолчанию - прежнее правило')
+    arg_parser.add_argument('--workspaces', type=int, default=1, help='сколько окон (рабочих областей) крутить вместе')
+    arg_parser.add_argument('--verbose', action='store_true', help='показывать вывод цикла')
+    args = arg_parser.parse_args()
+
+    games, clock, wall = run_simulation(args.attempts, args.seed, args.real_ocr, args.statistics, args.verbose,
+                                        args.policy, max(1, args.workspaces))
+    attempts = sum(game.attempts for game in games)
+
+    hours = clock.monotonic() / 3600
+    print("\n" + "=" * 70)
+    print("СИМУЛЯЦИЯ ЦИКЛА")
+    print("=" * 70)
+    if len(games) > 1:
+        print(f"Рабочих областей: {len(games)}")
+    print(f"Попыток: {attempts}")
+    print(f"Достигнуто +10: {sum(game.completed for game in games)}")
+    print(f"Поломок: {sum(game.breaks for game in games)}")
+    print(f"Виртуальное время: {hours:.2f} ч ({attempts / hours if hours else 0:.1f} попыток/ч)")
+    print(f"Реальное время: {wall:.2f} сек ({attempts / wall if wall else 0:.0f} попыток/сек)")
+    print("=" * 70 + "\n")
+
+
+if __name__ == '__main__':
+    main()
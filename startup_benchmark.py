@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк запуска Polisher
+
+Запускает в отдельном процессе python -X importtime с импортом main и созданием
+ScreenTextCapture (то, что происходит до появления иконки в трее), разбирает
+отчет интерпретатора и выводит время импорта по пакетам: собственное время
+модулей пакета и сколько пакет занял целиком. Модули, которые сам интерпретатор
+грузит при старте (site, encodings ...), не считаются.
+
+Тяжелые пакеты (numpy, PIL, mss, tkinter, asyncio, tesserocr ...) должны
+импортироваться только при первом цикле, горячей клавише или окне выбора. Если
+какой-то из них попал в запуск или запуск дольше --budget-ms, скрипт выходит с
+кодом 1, так что его можно ставить в проверку перед коммитом.
+
+Пример:
+    python startup_benchmark.py
+    python startup_benchmark.py --repeat 10 --top 30 --budget-ms 100
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Что выполняется при запуске приложения до иконки в трее
+STARTUP_CODE = "import main; main.ScreenTextCapture(persistent=False)"
+# Пакеты, которые не должны грузиться при запуске
+LAZY_PACKAGES = ('numpy', 'PIL', 'mss', 'tkinter', 'asyncio', 'tesserocr', 'pytesseract',
+                 'pyautogui', 'keyboard', 'pystray', 'pyperclip', 'http', 'sqlite3',
+                 'capture', 'preprocess', 'result_watcher', 'ocr_cache', 'templates', 'loop_engine')
+DEFAULT_BUDGET_MS = 150.0
+
+
+def run_importtime(code):
+    """Отчет -X importtime для code: список (пакет, модуль, собственное мкс, накопленное мкс, глубина)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "startup failed")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # заголовок таблицы
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        module = name.strip()
+        rows.append((module.split('.')[0], module, int(parts[0]), int(parts[1]), depth))
+    return rows
+
+
+def package_times(rows, skip):
+    """{пакет: (собственное мкс, накопленное мкс)} без модулей из skip
+
+    Накопленное время пакета - сумма накопленного времени его модулей, импортированных
+    не из самого пакета, то есть полная цена того, что пакет попал в запуск.
+    """
+    times = {}
+    # Отчет идет снизу вверх: вложенные импорты перед тем, кто их импортировал
+    parents = []
+    for package, module, own, cumulative, depth in reversed(rows):
+        del parents[depth:]
+        if module not in skip:
+            own_total, cumulative_total = times.get(package, (0, 0))
+            if package not in parents:
+                cumulative_total += cumulative
+            times[package] = (own_total + own, cumulative_total)
+        parents.append(package)
+    return times
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Время импорта при запуске Polisher по пакетам')
+    arg_parser.add_argument('--code', default=STARTUP_CODE, help='что выполнять вместо запуска приложения')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='сколько запусков (берется медиана)')
+    arg_parser.add_argument('--top', type=int, default=20, help='сколько пакетов показать')
+    arg_parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                            help='предел времени импорта при запуске, мс')
+    args = arg_parser.parse_args()
+
+    # Модули, которые интерпретатор грузит и без приложения
+    baseline = {module for _, module, _, _, _ in run_importtime('pass')}
+
+    runs = []
+    loaded = set()
+    try:
+        for _ in range(max(args.repeat, 1)):
+            rows = run_importtime(args.code)
+            runs.append(package_times(rows, baseline))
+            loaded.update(module for _, module, _, _, _ in rows if module not in baseline)
+    except RuntimeError as e:
+        print(f"Ошибка запуска: {e}")
+        sys.exit(1)
+
+    packages = set().union(*runs)
+    median = {}
+    for package in packages:
+        own = statistics.median(run.get(package, (0, 0))[0] for run in runs)
+        cumulative = statistics.median(run.get(package, (0, 0))[1] for run in runs)
+        median[package] = (own / 1000, cumulative / 1000)
+    total_ms = statistics.median(sum(own for own, _ in run.values()) for run in runs) / 1000
+
+    print("\n" + "="*70)
+    print(f"ИМПОРТ ПРИ ЗАПУСКЕ ({len(runs)} запусков, медиана)")
+    print("="*70)
+    print(f"Код: {args.code}")
+    print(f"Модулей: {len(loaded)}, время импорта: {total_ms:.1f} мс (предел {args.budget_ms:.0f} мс)")
+    print(f"\n{'пакет':<24}{'свое, мс':>12}{'всего, мс':>12}")
+    ranked = sorted(median.items(), key=lambda item: item[1][1], reverse=True)
+    for package, (own, cumulative) in ranked[:args.top]:
+        print(f"{package:<24}{own:>12.1f}{cumulative:>12.1f}")
+
+    failed = False
+    eager = sorted(package for package in LAZY_PACKAGES
+                   if any(module == package or module.startswith(package + '.') for module in loaded))
+    if eager:
+        failed = True
+        print("\n⚠ При запуске импортируются пакеты, которые должны грузиться лениво: " + ", ".join(eager))
+    if total_ms > args.budget_ms:
+        failed = True
+        print(f"\n⚠ Импорт при запуске дольше предела: {total_ms:.1f} > {args.budget_ms:.0f} мс")
+    if not failed:
+        print("\nOK")
+    print("="*70 + "\n")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
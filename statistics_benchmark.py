@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора статистики Polisher
+
+Разбирает файл статистики последовательно и в пуле из 1, 2, 4 ... процессов
+(см. stats_aggregate.aggregate_parallel), проверяет, что счетчики совпадают с
+последовательным разбором, и выводит время, скорость и ускорение для каждого
+числа процессов. Без файла генерирует синтетическую историю нужного размера.
+
+Пример:
+    python statistics_benchmark.py --generate 2000000
+    python statistics_benchmark.py polisher_statistics.jsonl --jobs 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from stats_aggregate import ACTIONS, MAX_LEVEL, aggregate_file, aggregate_parallel
+
+
+def generate_statistics(path, count, seed=1):
+    """Пишет count синтетических попыток в формате log_statistics"""
+    rng = random.Random(seed)
+    timestamp = datetime(2026, 1, 1)
+    level = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(count):
+            action = rng.choice(ACTIONS) if level >= 3 else 'F1'
+            if rng.random() < 0.5:
+                result, to_level = 'success', level + 1
+            elif action == 'F5':
+                result, to_level = 'failed', 0
+            else:
+                result, to_level = 'failed', level
+            f.write(json.dumps({
+                'timestamp': timestamp.isoformat(),
+                'from_level': level,
+                'action': action,
+                'result': result,
+                'to_level': to_level,
+            }, ensure_ascii=False) + '\n')
+            level = 0 if to_level >= MAX_LEVEL else to_level
+            timestamp += timedelta(seconds=rng.uniform(5, 12))
+
+
+def default_jobs():
+    jobs = [1]
+    while jobs[-1] * 2 <= (os.cpu_count() or 1):
+        jobs.append(jobs[-1] * 2)
+    return jobs
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Масштабирование разбора статистики Polisher по числу процессов')
+    arg_parser.add_argument('path', nargs='?', default=None, help='файл статистики JSONL')
+    arg_parser.add_argument('--generate', type=int, default=1000000,
+                            help='сколько попыток сгенерировать, если файл не указан')
+    arg_parser.add_argument('--jobs', type=int, nargs='+', default=None,
+                            help='числа процессов (по умолчанию 1, 2, 4 ... до числа ядер)')
+    arg_parser.add_argument('--repeat', type=int, default=1, help='сколько раз повторить каждый замер')
+    args = arg_parser.parse_args()
+
+    temp_dir = None
+    path = args.path
+    if path is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        path = os.path.join(temp_dir.name, 'statistics.jsonl')
+        print(f"Генерация {args.generate} попыток...")
+        generate_statistics(path, args.generate)
+
+    try:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        def measure(run):
+            best = None
+            result = None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                result = run()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            return result, best
+
+        serial, serial_time = measure(lambda: aggregate_file(path))
+
+        print("\n" + "=" * 70)
+        print(f"РАЗБОР СТАТИСТИКИ: {serial.total} записей, {size_mb:.1f} МБ, ядер: {os.cpu_count()}")
+        print("=" * 70)
+        print(f"  последовательно: {serial_time:6.2f} сек ({serial.total / serial_time:9.0f} записей/сек)")
+
+        for jobs in args.jobs or default_jobs():
+            (counters, _), elapsed = measure(lambda: aggregate_parallel(path, jobs=jobs, min_bytes=0))
+            same = "совпадает" if counters.counts == serial.counts and counters.total == serial.total else "РАСХОЖДЕНИЕ"
+            print(f"  процессов {jobs:3d}:   {elapsed:6.2f} сек ({counters.total / elapsed:9.0f} записей/сек), "
+                  f"ускорение x{serial_time / elapsed:.2f}, {same}")
+        print("=" * 70 + "\n")
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
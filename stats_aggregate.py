@@ -0,0 +1,400 @@
+"""
+Потоковая агрегация статистики Polisher
+
+Файл статистики читается построчно генератором, и за один проход каждая попытка
+увеличивает счетчик в плоском массиве фиксированного размера, индексированном
+(from_level, to_level, action, result). Все отчеты analyze_statistics.py
+строятся из этих счетчиков, так что память не зависит от длины истории.
+
+Большие файлы делятся на диапазоны байт по границам строк, которые разбираются
+в пуле процессов (aggregate_parallel), а счетчики частей складываются.
+
+IncrementalAggregator сохраняет счетчики вместе с достигнутым смещением в файле
+и его идентичностью (размер, inode, хэш начала) и при следующем запуске читает
+только дописанные строки. Если файл обрезали или заменили - пересчет с нуля.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from config import STATISTICS_PARALLEL_MIN_BYTES, STATISTICS_BACKEND
+
+MAX_LEVEL = 10
+LEVELS = MAX_LEVEL + 1
+ACTIONS = ('F1', 'F5')
+RESULTS = ('success', 'failed')
+
+ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
+RESULT_INDEX = {result: i for i, result in enumerate(RESULTS)}
+
+SIZE = LEVELS * LEVELS * len(ACTIONS) * len(RESULTS)
+
+
+def counter_index(from_level, to_level, action_index, result_index):
+    return ((from_level * LEVELS + to_level) * len(ACTIONS) + action_index) * len(RESULTS) + result_index
+
+
+def iter_statistics(path):
+    """Построчно отдает записи JSONL файла, пропуская битые строки"""
+    loads = json.loads
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Ошибка чтения строки: {e}")
+
+
+# Размер блока при чтении с заданного смещения
+READ_BLOCK_SIZE = 1 << 20
+
+
+def iter_statistics_from(path, offset=0, end=None):
+    """Отдает записи JSONL файла из диапазона байт [offset, end), читая блоками
+
+    Недописанная последняя строка (без перевода строки) не отдается, чтобы
+    дочитать ее в следующий раз целиком.
+    """
+    loads = json.loads
+    rest = b''
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = None if end is None else end - offset
+        while remaining is None or remaining > 0:
+            size = READ_BLOCK_SIZE if remaining is None else min(READ_BLOCK_SIZE, remaining)
+            block = f.read(size)
+            if not block:
+                return
+            if remaining is not None:
+                remaining -= len(block)
+            block = rest + block
+            cut = block.rfind(b'\n') + 1
+            rest = block[cut:]
+            # Декодируем блок целиком: json.loads по str быстрее, чем по bytes
+            for line in block[:cut].decode('utf-8', errors='replace').split('\n'):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"Ошибка чтения строки: {e}")
+
+
+class StatisticsCounters:
+    def __init__(self):
+        self.counts = [0] * SIZE
+        self.total = 0
+        self.skipped = 0
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total, 'skipped': self.skipped}
+
+    @classmethod
+    def from_dict(cls, data):
+        counters = cls()
+        if len(data['counts']) != SIZE:
+            raise ValueError("counter layout changed")
+        counters.counts = [int(count) for count in data['counts']]
+        counters.total = int(data['total'])
+        counters.skipped = int(data['skipped'])
+        return counters
+
+    def add(self, from_level, to_level, action, result, count=1):
+        """Учитывает count попыток, записи вне диапазона уровней и действий пропускаются"""
+        action_index = ACTION_INDEX.get(action)
+        result_index = RESULT_INDEX.get(result)
+        if (action_index is None or result_index is None or
+                not 0 <= from_level <= MAX_LEVEL or not 0 <= to_level <= MAX_LEVEL):
+            self.skipped += count
+            return
+        self.counts[counter_index(from_level, to_level, action_index, result_index)] += count
+        self.total += count
+
+    def add_entry(self, entry):
+        try:
+            self.add(entry['from_level'], entry['to_level'], entry['action'], entry['result'])
+        except (KeyError, TypeError):
+            self.skipped += 1
+
+    def merge(self, other):
+        counts = self.counts
+        for i, count in enumerate(other.counts):
+            if count:
+                counts[i] += count
+        self.total += other.total
+        self.skipped += other.skipped
+
+    def items(self):
+        """Отдает (from_level, to_level, action, result, count) для ненулевых счетчиков"""
+        i = 0
+        for from_level in range(LEVELS):
+            for to_level in range(LEVELS):
+                for action in ACTIONS:
+                    for result in RESULTS:
+                        count = self.counts[i]
+                        if count:
+                            yield from_level, to_level, action, result, count
+                        i += 1
+
+    def success_rates(self):
+        """Структуры для print_statistics: level -> action -> {result: count} и поломки по действиям"""
+        transitions = {}
+        breaks_to_zero = {}
+        for from_level, to_level, action, result, count in self.items():
+            by_action = transitions.setdefault(from_level, {})
+            by_action.setdefault(action, {'success': 0, 'failed': 0})[result] += count
+            if result == 'success' and to_level == 0 and from_level > 0:
+                breaks_to_zero[action] = breaks_to_zero.get(action, 0) + count
+        return transitions, breaks_to_zero
+
+    def detailed_transitions(self):
+        """Структуры для print_detailed_transitions: повышения по (from, to) и поломки по уровню"""
+        upgrades = {}
+        breaks = {}
+        for from_level, to_level, action, result, count in self.items():
+            if result != 'success':
+                continue
+            if to_level > from_level:
+                by_action = upgrades.setdefault((from_level, to_level), {})
+                by_action[action] = by_action.get(action, 0) + count
+            elif to_level == 0 and from_level > 0:
+                by_action = breaks.setdefault(from_level, {})
+                by_action[action] = by_action.get(action, 0) + count
+        return upgrades, breaks
+
+    def sessions_completed(self):
+        return sum(count for _, to_level, _, result, count in self.items()
+                   if result == 'success' and to_level == MAX_LEVEL)
+
+
+def aggregate(entries, counters=None):
+    """Один проход по записям: все попадают в общие счетчики"""
+    if counters is None:
+        counters = StatisticsCounters()
+    # Горячий цикл: индекс считается на месте, без вызова add на каждую запись
+    counts = counters.counts
+    action_index = ACTION_INDEX.get
+    result_index = RESULT_INDEX.get
+    actions = len(ACTIONS)
+    results = len(RESULTS)
+    total = 0
+    skipped = 0
+    for entry in entries:
+        try:
+            from_level = entry['from_level']
+            to_level = entry['to_level']
+            a = action_index(entry['action'])
+            r = result_index(entry['result'])
+        except (KeyError, TypeError):
+            skipped += 1
+            continue
+        if (a is None or r is None or
+                not 0 <= from_level <= MAX_LEVEL or not 0 <= to_level <= MAX_LEVEL):
+            skipped += 1
+            continue
+        counts[((from_level * LEVELS + to_level) * actions + a) * results + r] += 1
+        total += 1
+    counters.total += total
+    counters.skipped += skipped
+    return counters
+
+
+def aggregate_file(path, jobs=None):
+    """Счетчики по всему файлу (jobs > 1 - в пуле процессов, см. aggregate_parallel)"""
+    if jobs is not None and jobs > 1:
+        return aggregate_parallel(path, jobs=jobs)[0]
+    return aggregate(iter_statistics(path))
+
+
+def load_counters(path, backend=STATISTICS_BACKEND, jobs=None):
+    """Счетчики по файлу статистики любого хранилища ('jsonl', 'sqlite', 'binary')"""
+    if backend == 'sqlite':
+        import stats_db
+
+        conn = stats_db.connect(path)
+        try:
+            return stats_db.query_counters(conn)
+        finally:
+            conn.close()
+    if backend == 'binary':
+        import stats_binary
+
+        return stats_binary.read_counters(path)
+    return aggregate_file(path, jobs)
+
+
+def iter_source(path, backend=STATISTICS_BACKEND):
+    """Записи статистики любого хранилища в порядке записи"""
+    if backend == 'sqlite':
+        import stats_db
+
+        conn = stats_db.connect(path)
+        try:
+            yield from stats_db.iter_attempts(conn)
+        finally:
+            conn.close()
+    elif backend == 'binary':
+        import stats_binary
+
+        yield from stats_binary.iter_entries(path)
+    else:
+        yield from iter_statistics(path)
+
+
+def complete_end(path):
+    """Смещение сразу после последнего перевода строки в файле (0, если строк нет)"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        while position > 0:
+            size = min(READ_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return position + newline + 1
+    return 0
+
+
+def split_ranges(path, start, end, parts):
+    """Делит [start, end) на parts диапазонов, границы сдвинуты на начало строки"""
+    bounds = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(start + (end - start) * i // parts)
+            f.readline()
+            bound = min(f.tell(), end)
+            if bound > bounds[-1]:
+                bounds.append(bound)
+    if end > bounds[-1]:
+        bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def aggregate_range(path, start, end):
+    """Счетчики по диапазону байт [start, end), который начинается и кончается на границе строки"""
+    return aggregate(iter_statistics_from(path, start, end=end))
+
+
+def aggregate_parallel(path, start=0, jobs=None, min_bytes=STATISTICS_PARALLEL_MIN_BYTES):
+    """Счетчики по полным строкам файла от start, возвращает (счетчики, смещение после последней строки)
+
+    Файл делится на jobs * 4 диапазонов (чтобы процессы были загружены равномерно),
+    диапазоны разбираются в пуле из jobs процессов, счетчики складываются.
+    Маленькие хвосты (меньше min_bytes) разбираются в текущем процессе.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    end = complete_end(path)
+    if end <= start:
+        return StatisticsCounters(), start
+
+    if jobs <= 1 or end - start < min_bytes:
+        return aggregate_range(path, start, end), end
+
+    ranges = split_ranges(path, start, end, jobs * 4)
+    counters = StatisticsCounters()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(aggregate_range, path, range_start, range_end)
+                   for range_start, range_end in ranges]
+        for future in futures:
+            counters.merge(future.result())
+    return counters, end
+
+
+CHECKPOINT_VERSION = 1
+# Сколько первых байт файла хэшируется, чтобы заметить перезапись на месте
+CHECKPOINT_HEAD_BYTES = 4096
+
+
+def file_identity(path, length):
+    """Размер, inode и хэш первых байт файла (не дальше length)"""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        head = f.read(min(length, CHECKPOINT_HEAD_BYTES))
+    return {'size': stat.st_size, 'inode': stat.st_ino, 'head': hashlib.sha1(head).hexdigest()}
+
+
+class IncrementalAggregator:
+    def __init__(self, path, checkpoint_path, jobs=None):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.jobs = jobs
+        self.counters = StatisticsCounters()
+        self.offset = 0
+        self.identity = None
+
+    def load(self):
+        """Поднимает счетчики из файла контрольной точки (если он есть и подходит)"""
+        try:
+            if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+                return False
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CHECKPOINT_VERSION or data.get('path') != os.path.abspath(self.path):
+                return False
+            self.counters = StatisticsCounters.from_dict(data['counters'])
+            self.offset = int(data['offset'])
+            self.identity = data['identity']
+            return True
+        except Exception as e:
+            print(f"Error loading statistics checkpoint: {e}")
+            self.reset()
+            return False
+
+    def save(self):
+        try:
+            if not self.checkpoint_path:
+                return
+            data = {
+                'version': CHECKPOINT_VERSION,
+                'path': os.path.abspath(self.path),
+                'offset': self.offset,
+                'identity': self.identity,
+                'counters': self.counters.to_dict(),
+            }
+            # Через временный файл, чтобы прерванная запись не портила контрольную точку
+            temp_path = self.checkpoint_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.checkpoint_path)
+        except Exception as e:
+            print(f"Error saving statistics checkpoint: {e}")
+
+    def reset(self):
+        self.counters = StatisticsCounters()
+        self.offset = 0
+        self.identity = None
+
+    def is_continuation(self):
+        """Файл тот же и только дописан с момента контрольной точки"""
+        if self.identity is None:
+            return self.offset == 0
+        try:
+            current = file_identity(self.path, self.offset)
+        except OSError:
+            return False
+        return (current['inode'] == self.identity['inode'] and
+                current['size'] >= self.offset and
+                current['head'] == self.identity['head'])
+
+    def update(self):
+        """Дочитывает новые строки, возвращает (число новых записей, был ли полный пересчет)"""
+        rebuilt = False
+        if not self.is_continuation():
+            self.reset()
+            rebuilt = True
+
+        counters = self.counters
+        before = counters.total + counters.skipped
+        new_counters, self.offset = aggregate_parallel(self.path, self.offset, self.jobs)
+        counters.merge(new_counters)
+        self.identity = file_identity(self.path, self.offset)
+        return counters.total + counters.skipped - before, rebuilt
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Двоичный формат статистики Polisher
+
+Запись фиксированной длины 12 байт: время попытки (микросекунды от 1970-01-01,
+int64) и по одному байту на from_level, to_level, action и result. Файл
+начинается с 16-байтного заголовка, дальше записи только дописываются.
+analyze_statistics.py читает файл через numpy.memmap и считает счетчики одним
+bincount, без разбора JSON.
+
+session_id и seq в двоичный формат не попадают, сессии по нему восстанавливаются
+по разрывам во времени (см. stats_sessions.py).
+
+Конвертация в обе стороны, чтобы работали инструменты для JSONL:
+    python stats_binary.py to-binary polisher_statistics.jsonl polisher_statistics.bin
+    python stats_binary.py to-jsonl polisher_statistics.bin polisher_statistics.jsonl
+"""
+
+import argparse
+import json
+import os
+import struct
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import STATISTICS_FILE, STATISTICS_BINARY_FILE
+from stats_aggregate import (ACTIONS, RESULTS, ACTION_INDEX, RESULT_INDEX, LEVELS, MAX_LEVEL, SIZE,
+                             StatisticsCounters, iter_statistics)
+
+MAGIC = b'PLSTAT\x00\x01'
+HEADER = struct.Struct('<8sII')  # магия, длина записи, резерв
+RECORD = struct.Struct('<qBBBB')
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('from_level', 'u1'),
+    ('to_level', 'u1'),
+    ('action', 'u1'),
+    ('result', 'u1'),
+])
+UNKNOWN = 255
+EPOCH = datetime(1970, 1, 1)
+
+
+def header_bytes():
+    return HEADER.pack(MAGIC, RECORD.size, 0)
+
+
+def encode(entry):
+    """Запись статистики (словарь как в log_statistics) -> 12 байт"""
+    try:
+        timestamp = datetime.fromisoformat(entry['timestamp'])
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.replace(tzinfo=None)
+        micros = (timestamp - EPOCH) // timedelta(microseconds=1)
+    except (TypeError, ValueError):
+        micros = 0
+
+    def level(value):
+        return value if isinstance(value, int) and 0 <= value <= MAX_LEVEL else UNKNOWN
+
+    return RECORD.pack(
+        micros,
+        level(entry['from_level']),
+        level(entry['to_level']),
+        ACTION_INDEX.get(entry['action'], UNKNOWN),
+        RESULT_INDEX.get(entry['result'], UNKNOWN),
+    )
+
+
+def decode(record):
+    """Одна запись из массива RECORD_DTYPE -> словарь как в log_statistics"""
+    timestamp = EPOCH + timedelta(microseconds=int(record['timestamp']))
+    action = int(record['action'])
+    result = int(record['result'])
+    return {
+        'timestamp': timestamp.isoformat(),
+        'from_level': int(record['from_level']),
+        'action': ACTIONS[action] if action < len(ACTIONS) else None,
+        'result': RESULTS[result] if result < len(RESULTS) else None,
+        'to_level': int(record['to_level']),
+    }
+
+
+def open_records(path):
+    """Записи файла как numpy.memmap (или пустой массив); недописанная запись в конце отбрасывается"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    magic, record_size, _ = HEADER.unpack(header)
+    if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a Polisher statistics file")
+    count = (size - HEADER.size) // RECORD_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+
+
+def iter_entries(path):
+    """Записи двоичного файла по порядку как словари"""
+    for record in open_records(path):
+        yield decode(record)
+
+
+def read_counters(path):
+    """Счетчики analyze_statistics по двоичному файлу одним bincount"""
+    records = open_records(path)
+    counters = StatisticsCounters()
+    if len(records) == 0:
+        return counters
+
+    from_level = records['from_level'].astype(np.intp)
+    to_level = records['to_level'].astype(np.intp)
+    action = records['action'].astype(np.intp)
+    result = records['result'].astype(np.intp)
+    valid = ((from_level <= MAX_LEVEL) & (to_level <= MAX_LEVEL) &
+             (action < len(ACTIONS)) & (result < len(RESULTS)))
+
+    # Тот же порядок индексов, что и в stats_aggregate.counter_index
+    index = ((from_level * LEVELS + to_level) * len(ACTIONS) + action) * len(RESULTS) + result
+    counts = np.bincount(index[valid], minlength=SIZE)
+
+    counters.counts = counts.tolist()
+    counters.total = int(valid.sum())
+    counters.skipped = len(records) - counters.total
+    return counters
+
+
+class BinaryWriter:
+    """Дописывает записи в двоичный файл, держа его открытым (интерфейс как у JsonlWriter)"""
+
+    def __init__(self, path=STATISTICS_BINARY_FILE, durable=False):
+        self.file = open(path, 'ab')
+        self.durable = durable
+        size = self.file.tell()
+        if size == 0:
+            self.file.write(header_bytes())
+            return
+        if size < HEADER.size:
+            # Заголовок не дописан: обрезка по записям испортила бы файл окончательно
+            self.file.close()
+            raise ValueError(f"{path} is shorter than the header ({size} of {HEADER.size} bytes), "
+                             f"remove or rename it to start a new statistics file")
+        with open(path, 'rb') as f:
+            magic, record_size, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a Polisher statistics file")
+        # Обрезаем недописанную запись после сбоя, чтобы не сдвинуть все следующие
+        tail = (size - HEADER.size) % RECORD.size
+        if tail:
+            self.file.truncate(size - tail)
+
+    def write(self, entry):
+        self.file.write(encode(entry))
+
+    def flush(self):
+        self.file.flush()
+        if self.durable:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def jsonl_to_binary(jsonl_path, binary_path):
+    count = 0
+    with open(binary_path, 'wb') as out:
+        out.write(header_bytes())
+        for entry in iter_statistics(jsonl_path):
+            try:
+                out.write(encode(entry))
+                count += 1
+            except KeyError as e:
+                print(f"Ошибка чтения строки: нет поля {e}")
+    return count
+
+
+def binary_to_jsonl(binary_path, jsonl_path):
+    count = 0
+    with open(jsonl_path, 'w', encoding='utf-8') as out:
+        for entry in iter_entries(binary_path):
+            out.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Конвертация статистики Polisher между JSONL и двоичным форматом')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    to_binary = commands.add_parser('to-binary', help='JSONL -> двоичный файл')
+    to_binary.add_argument('source', nargs='?', default=STATISTICS_FILE)
+    to_binary.add_argument('target', nargs='?', default=STATISTICS_BINARY_FILE)
+    to_jsonl = commands.add_parser('to-jsonl', help='двоичный файл -> JSONL')
+    to_jsonl.add_argument('source', nargs='?', default=STATISTICS_BINARY_FILE)
+    to_jsonl.add_argument('target', nargs='?', default=STATISTICS_FILE)
+    args = arg_parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"Файл статистики {args.source} не найден!")
+        return
+    if os.path.exists(args.target):
+        print(f"Файл {args.target} уже существует, не перезаписываем")
+        return
+
+    if args.command == 'to-binary':
+        count = jsonl_to_binary(args.source, args.target)
+    else:
+        count = binary_to_jsonl(args.source, args.target)
+    print(f"Записано {count} записей в {args.target}")
+
+
+if __name__ == '__main__':
+    main()
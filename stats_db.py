@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+SQLite хранилище статистики Polisher
+
+Таблица attempts с индексами по времени, уровню и действию. База открывается в
+режиме WAL, записи вставляются пачками (см. SqliteWriter и stats_sink.py), а
+analyze_statistics.py получает счетчики попыток агрегатным SQL запросом.
+
+Перенос накопленной истории из JSONL (один раз):
+    python stats_db.py polisher_statistics.jsonl polisher_statistics.db
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+
+from config import STATISTICS_FILE, STATISTICS_DB
+from stats_aggregate import StatisticsCounters
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    from_level INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    result TEXT NOT NULL,
+    to_level INTEGER NOT NULL,
+    session_id TEXT,
+    seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_timestamp ON attempts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_attempts_level ON attempts (from_level, action, result);
+CREATE INDEX IF NOT EXISTS idx_attempts_action ON attempts (action);
+"""
+
+INSERT_SQL = ("INSERT INTO attempts (timestamp, from_level, action, result, to_level, session_id, seq) "
+              "VALUES (:timestamp, :from_level, :action, :result, :to_level, :session_id, :seq)")
+
+FIELDS = ('timestamp', 'from_level', 'action', 'result', 'to_level')
+# Поля, которых нет в старых записях
+OPTIONAL_FIELDS = ('session_id', 'seq')
+
+
+def row(entry):
+    """Параметры INSERT_SQL из записи статистики (KeyError, если нет обязательного поля)"""
+    values = {key: entry[key] for key in FIELDS}
+    for key in OPTIONAL_FIELDS:
+        values[key] = entry.get(key)
+    return values
+
+
+def migrate(conn):
+    """Добавляет колонки сессии в базу, созданную до их появления"""
+    columns = {info[1] for info in conn.execute("PRAGMA table_info(attempts)")}
+    with conn:
+        if 'session_id' not in columns:
+            conn.execute("ALTER TABLE attempts ADD COLUMN session_id TEXT")
+        if 'seq' not in columns:
+            conn.execute("ALTER TABLE attempts ADD COLUMN seq INTEGER")
+
+
+def connect(path=STATISTICS_DB, durable=False):
+    """Открывает базу статистики (WAL) и создает схему, если ее еще нет
+
+    durable - synchronous=FULL (каждый коммит на диске), иначе NORMAL.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+    conn.executescript(SCHEMA)
+    migrate(conn)
+    return conn
+
+
+class SqliteWriter:
+    """Пишет записи в базу пачками: write копит, flush вставляет одной транзакцией"""
+
+    def __init__(self, path=STATISTICS_DB, durable=False):
+        self.conn = connect(path, durable)
+        self.pending = []
+
+    def write(self, entry):
+        self.pending.append(row(entry))
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(INSERT_SQL, self.pending)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def query_counters(conn):
+    """Заполняет счетчики analyze_statistics одним агрегатным запросом"""
+    counters = StatisticsCounters()
+    rows = conn.execute(
+        "SELECT from_level, to_level, action, result, COUNT(*) FROM attempts "
+        "GROUP BY from_level, to_level, action, result")
+    for from_level, to_level, action, result, count in rows:
+        counters.add(from_level, to_level, action, result, count)
+    return counters
+
+
+def iter_attempts(conn):
+    """Попытки в порядке записи как словари (для восстановления сессий)"""
+    rows = conn.execute(
+        "SELECT timestamp, from_level, action, result, to_level, session_id, seq FROM attempts ORDER BY id")
+    for timestamp, from_level, action, result, to_level, session_id, seq in rows:
+        yield {
+            'timestamp': timestamp,
+            'from_level': from_level,
+            'action': action,
+            'result': result,
+            'to_level': to_level,
+            'session_id': session_id,
+            'seq': seq,
+        }
+
+
+def query_count(conn):
+    return conn.execute("SELECT COUNT(*) FROM attempts").fetchone()[0]
+
+
+def import_jsonl(jsonl_path, db_path, batch_size=5000):
+    """Переносит историю из JSONL в базу, возвращает (импортировано, пропущено)"""
+    conn = connect(db_path)
+    imported = 0
+    skipped = 0
+    batch = []
+    try:
+        with open(jsonl_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    batch.append(row(json.loads(line)))
+                except (json.JSONDecodeError, KeyError) as e:
+                    print(f"Ошибка чтения строки: {e}")
+                    skipped += 1
+                    continue
+                if len(batch) >= batch_size:
+                    with conn:
+                        conn.executemany(INSERT_SQL, batch)
+                    imported += len(batch)
+                    batch = []
+        if batch:
+            with conn:
+                conn.executemany(INSERT_SQL, batch)
+            imported += len(batch)
+    finally:
+        conn.close()
+    return imported, skipped
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Перенос статистики Polisher из JSONL в SQLite')
+    arg_parser.add_argument('jsonl', nargs='?', default=STATISTICS_FILE, help='исходный JSONL файл')
+    arg_parser.add_argument('db', nargs='?', default=STATISTICS_DB, help='база SQLite')
+    arg_parser.add_argument('--append', action='store_true', help='дописать в непустую базу')
+    args = arg_parser.parse_args()
+
+    if not os.path.exists(args.jsonl):
+        print(f"Файл статистики {args.jsonl} не найден!")
+        return
+
+    if os.path.exists(args.db) and not args.append:
+        conn = connect(args.db)
+        existing = query_count(conn)
+        conn.close()
+        if existing:
+            print(f"В базе {args.db} уже {existing} записей, используйте --append, чтобы дописать")
+            return
+
+    imported, skipped = import_jsonl(args.jsonl, args.db)
+    print(f"Импортировано {imported} записей в {args.db} (пропущено строк: {skipped})")
+
+
+if __name__ == '__main__':
+    main()
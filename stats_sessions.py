@@ -0,0 +1,177 @@
+"""
+Сессии и пропускная способность по статистике Polisher
+
+Восстанавливает сессии из потока попыток (по порядку записи). Если в записи есть
+session_id и seq (их пишет log_statistics), сессия определяется точно, иначе -
+по разрыву во времени больше STATISTICS_SESSION_GAP и по достижению +10.
+
+Считает:
+- длительность цикла (время между соседними попытками сессии) - гистограмма с
+  фиксированными корзинами, из нее перцентили;
+- попытки и время на каждый +10 (от начала сессии или прошлого +10);
+- время, потерянное на поломки: от поломки до возврата на прежний уровень;
+- разбивку попыток, успехов, поломок и +10 по часам суток.
+
+Память не растет с длиной истории, кроме короткого списка сессий и +10.
+"""
+
+from datetime import datetime
+
+from config import STATISTICS_SESSION_GAP
+
+MAX_LEVEL = 10
+# Корзины гистограммы длительности цикла: по 0.5 сек до 2 минут, дальше - одна общая
+CYCLE_BUCKET = 0.5
+CYCLE_BUCKETS = 240
+
+
+class Session:
+    __slots__ = ('session_id', 'start', 'end', 'attempts', 'completed', 'breaks', 'lost_seconds')
+
+    def __init__(self, session_id, start):
+        self.session_id = session_id
+        self.start = start
+        self.end = start
+        self.attempts = 0
+        self.completed = 0
+        self.breaks = 0
+        self.lost_seconds = 0.0
+
+    @property
+    def seconds(self):
+        return (self.end - self.start).total_seconds()
+
+
+class SessionAnalyzer:
+    def __init__(self, gap=STATISTICS_SESSION_GAP):
+        self.gap = gap
+        self.sessions = []
+        self.completions = []  # (попыток, секунд) на каждый +10
+        self.cycle_counts = [0] * (CYCLE_BUCKETS + 1)
+        self.cycle_sum = 0.0
+        self.cycle_count = 0
+        self.hour_attempts = [0] * 24
+        self.hour_successes = [0] * 24
+        self.hour_breaks = [0] * 24
+        self.hour_completions = [0] * 24
+        self.hour_cycle_sum = [0.0] * 24
+        self.hour_cycle_count = [0] * 24
+        # Цикл относится к действию попытки, которой он закончился
+        self.action_cycle_sum = {}
+        self.action_cycle_count = {}
+        self.skipped = 0
+
+        self.current = None
+        self.last_time = None
+        self.last_seq = None
+        self.last_to_level = None
+        # Текущий предмет: начало и число попыток до +10
+        self.item_start = None
+        self.item_attempts = 0
+        # Незакрытая поломка: (уровень до поломки, время поломки)
+        self.pending_break = None
+
+    def add_entry(self, entry):
+        try:
+            timestamp = entry['timestamp']
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp)
+            self.add(timestamp, entry['from_level'], entry['to_level'], entry['action'], entry['result'],
+                     entry.get('session_id'), entry.get('seq'))
+        except (KeyError, TypeError, ValueError):
+            self.skipped += 1
+
+    def _is_new_session(self, timestamp, session_id):
+        if self.current is None:
+            return True
+        if session_id is not None or self.current.session_id is not None:
+            return session_id != self.current.session_id
+        return ((timestamp - self.last_time).total_seconds() > self.gap or
+                self.last_to_level == MAX_LEVEL)
+
+    def _close_session(self):
+        session = self.current
+        if session is None:
+            return
+        if self.pending_break is not None:
+            # Так и не вернулись на прежний уровень до конца сессии
+            session.lost_seconds += (session.end - self.pending_break[1]).total_seconds()
+            self.pending_break = None
+        self.sessions.append(session)
+        self.current = None
+
+    def add(self, timestamp, from_level, to_level, action, result, session_id=None, seq=None):
+        """Учитывает одну попытку (попытки должны идти в порядке записи)"""
+        if self._is_new_session(timestamp, session_id):
+            self._close_session()
+            self.current = Session(session_id, timestamp)
+            self.item_start = timestamp
+            self.item_attempts = 0
+            self.last_seq = None
+        elif seq is None or self.last_seq is None or seq == self.last_seq + 1:
+            # Длительность цикла - только между соседними попытками (без пропусков по seq)
+            cycle = (timestamp - self.last_time).total_seconds()
+            if cycle >= 0:
+                bucket = min(int(cycle / CYCLE_BUCKET), CYCLE_BUCKETS)
+                self.cycle_counts[bucket] += 1
+                self.cycle_sum += cycle
+                self.cycle_count += 1
+                self.hour_cycle_sum[timestamp.hour] += cycle
+                self.hour_cycle_count[timestamp.hour] += 1
+                self.action_cycle_sum[action] = self.action_cycle_sum.get(action, 0.0) + cycle
+                self.action_cycle_count[action] = self.action_cycle_count.get(action, 0) + 1
+
+        session = self.current
+        session.end = timestamp
+        session.attempts += 1
+        self.item_attempts += 1
+        hour = timestamp.hour
+        self.hour_attempts[hour] += 1
+        if result == 'success' and to_level > from_level:
+            self.hour_successes[hour] += 1
+
+        if to_level == 0 and from_level > 0:
+            session.breaks += 1
+            self.hour_breaks[hour] += 1
+            if self.pending_break is None:
+                self.pending_break = (from_level, timestamp)
+            else:
+                self.pending_break = (max(from_level, self.pending_break[0]), self.pending_break[1])
+        elif self.pending_break is not None and to_level >= self.pending_break[0]:
+            session.lost_seconds += (timestamp - self.pending_break[1]).total_seconds()
+            self.pending_break = None
+
+        if to_level == MAX_LEVEL:
+            session.completed += 1
+            self.hour_completions[hour] += 1
+            self.completions.append((self.item_attempts, (timestamp - self.item_start).total_seconds()))
+            self.item_start = timestamp
+            self.item_attempts = 0
+
+        self.last_time = timestamp
+        self.last_seq = seq
+        self.last_to_level = to_level
+
+    def finish(self):
+        """Закрывает последнюю сессию (вызывать после последней попытки)"""
+        self._close_session()
+        return self
+
+    def cycle_percentile(self, p):
+        """Перцентиль длительности цикла по гистограмме (верхняя граница корзины)"""
+        if not self.cycle_count:
+            return 0.0
+        rank = max(1, int(round(p / 100 * self.cycle_count)))
+        seen = 0
+        for bucket, count in enumerate(self.cycle_counts):
+            seen += count
+            if seen >= rank:
+                return (bucket + 1) * CYCLE_BUCKET
+        return (CYCLE_BUCKETS + 1) * CYCLE_BUCKET
+
+
+def analyze_sessions(entries, gap=STATISTICS_SESSION_GAP):
+    analyzer = SessionAnalyzer(gap)
+    for entry in entries:
+        analyzer.add_entry(entry)
+    return analyzer.finish()
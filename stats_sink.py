@@ -0,0 +1,156 @@
+"""
+Фоновая запись статистики попыток для Polisher
+
+Цикл только кладет запись в очередь, а поток записи держит файл статистики
+открытым, сериализует записи и сбрасывает их на диск пачками: по числу записей
+или по времени. Открытие файла и антивирус на Windows больше не тормозят цикл.
+При остановке цикла и выходе очередь дописывается до конца (stop).
+
+STATISTICS_BACKEND выбирает хранилище: 'jsonl' (файл STATISTICS_FILE),
+'sqlite' (база STATISTICS_DB, см. stats_db.py) или 'binary' (файл
+STATISTICS_BINARY_FILE, см. stats_binary.py).
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from config import (STATISTICS_FILE, STATISTICS_DB, STATISTICS_BINARY_FILE, STATISTICS_BACKEND,
+                    STATISTICS_FLUSH_EVERY, STATISTICS_FLUSH_INTERVAL, STATISTICS_DURABILITY)
+
+
+class JsonlWriter:
+    """Дописывает записи в JSONL файл, держа его открытым"""
+
+    def __init__(self, path, durable=False):
+        self.file = open(path, 'a', encoding='utf-8')
+        self.durable = durable
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        self.file.flush()
+        if self.durable:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def default_path(backend):
+    """Файл статистики по умолчанию для хранилища"""
+    if backend == 'sqlite':
+        return STATISTICS_DB
+    if backend == 'binary':
+        return STATISTICS_BINARY_FILE
+    return STATISTICS_FILE
+
+
+def workspace_path(path, name):
+    """Файл статистики рабочей области: polisher_statistics.jsonl -> polisher_statistics.<name>.jsonl"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+
+def open_writer(backend, path, durable):
+    if backend == 'sqlite':
+        from stats_db import SqliteWriter
+        return SqliteWriter(path, durable)
+    if backend == 'binary':
+        from stats_binary import BinaryWriter
+        return BinaryWriter(path, durable)
+    return JsonlWriter(path, durable)
+
+
+class StatisticsSink:
+    def __init__(self, path=None, backend=STATISTICS_BACKEND, flush_every=STATISTICS_FLUSH_EVERY,
+                 flush_interval=STATISTICS_FLUSH_INTERVAL, durability=STATISTICS_DURABILITY):
+        self.backend = backend
+        self.path = path if path is not None else default_path(backend)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        # 'flush' - только сброс буфера в ОС, 'fsync' - еще и запись на диск
+        # (для SQLite - synchronous=FULL)
+        self.durability = durability
+        # Очередь без ограничения: статистику не теряем и цикл не ждет
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.written = 0
+        self.flushes = 0
+
+    def start(self, path=None):
+        """Запускает поток записи (path - файл статистики, по умолчанию self.path)"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            if path is not None:
+                self.path = path
+            self.thread = threading.Thread(target=self._writer, args=(self.path,), daemon=True)
+            self.thread.start()
+
+    def write(self, entry):
+        """Ставит запись в очередь, поток записи запускается при первой записи"""
+        if self.thread is None:
+            self.start()
+        self.queue.put(entry)
+
+    def _writer(self, path):
+        try:
+            writer = open_writer(self.backend, path, self.durability == 'fsync')
+        except Exception as e:
+            print(f"Error opening statistics file: {e}")
+            writer = None
+
+        pending = 0
+        last_flush = time.monotonic()
+        try:
+            while True:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+                try:
+                    entry = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    entry = False  # вышло время - только сброс
+
+                if entry is None:
+                    return
+
+                if entry is not False and writer is not None:
+                    try:
+                        writer.write(entry)
+                        self.written += 1
+                        pending += 1
+                    except Exception as e:
+                        print(f"Error logging statistics: {e}")
+
+                if pending and (pending >= self.flush_every or
+                                time.monotonic() - last_flush >= self.flush_interval):
+                    try:
+                        writer.flush()
+                        self.flushes += 1
+                    except Exception as e:
+                        print(f"Error flushing statistics: {e}")
+                    pending = 0
+                    last_flush = time.monotonic()
+        finally:
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception as e:
+                    print(f"Error closing statistics file: {e}")
+
+    def stop(self):
+        """Дописывает очередь, сбрасывает файл на диск и останавливает поток записи"""
+        with self.lock:
+            thread = self.thread
+            if thread is None:
+                return
+            self.queue.put(None)
+            thread.join()
+            self.thread = None
@@ -0,0 +1,225 @@
+"""
+Быстрое распознавание окна результата по шаблонам для Polisher
+
+Вместо полного OCR ищет в области заранее сохраненные шаблоны слов "Success" и
+"Failed" и числа уровня (+1 ... +10) нормированной взаимной корреляцией на
+NumPy. Если уверенность низкая, возвращает None, и вызывающий код делает
+обычный OCR.
+
+Шаблоны собираются полуавтоматически: кадры, которые OCR распознал уверенно,
+нарезаются по рамкам слов из tesseract, и после нескольких образцов на метку
+их среднее сохраняется как шаблон.
+"""
+
+import os
+import re
+import threading
+
+import numpy as np
+from PIL import Image
+
+from config import TEMPLATES_FILE, TEMPLATE_MIN_SCORE, TEMPLATE_MIN_MARGIN, TEMPLATE_SAMPLES
+
+OUTCOME_LABELS = ('success', 'failed')
+# После успеха уровень не меньше +1, так что шаблон +0 не собрать никогда
+LEVEL_LABELS = tuple(str(n) for n in range(1, 11))
+# Слова исхода в кадре на языках клиента -> метка шаблона
+OUTCOME_WORDS = {
+    'success': ('success', 'успех', 'успешно'),
+    'failed': ('failed', 'неудача', 'провал'),
+}
+
+NUMBER_WORD_RE = re.compile(r'^\+?(\d{1,2})\W*$')
+
+
+def match_scores(image, templates):
+    """Максимум нормированной корреляции каждого шаблона по всему изображению
+
+    image - массив (H, W), templates - словарь метка -> массив (h, w).
+    Возвращает словарь метка -> значение от -1 до 1.
+    """
+    image = image.astype(np.float32)
+    height, width = image.shape
+    usable = {label: t for label, t in templates.items()
+              if t.shape[0] <= height and t.shape[1] <= width}
+    scores = {label: 0.0 for label in templates}
+    if not usable:
+        return scores
+
+    # Один размер FFT для всех шаблонов, чтобы спектр изображения считать один раз
+    fft_shape = (height + max(t.shape[0] for t in usable.values()),
+                 width + max(t.shape[1] for t in usable.values()))
+    image_fft = np.fft.rfft2(image, fft_shape)
+
+    integral = np.zeros((height + 1, width + 1), dtype=np.float64)
+    integral[1:, 1:] = image.cumsum(0).cumsum(1)
+    integral_sq = np.zeros((height + 1, width + 1), dtype=np.float64)
+    integral_sq[1:, 1:] = (image.astype(np.float64) ** 2).cumsum(0).cumsum(1)
+
+    for label, template in usable.items():
+        h, w = template.shape
+        t = template.astype(np.float32) - template.mean()
+        t_norm = float(np.sqrt((t * t).sum()))
+        if t_norm == 0:
+            continue
+
+        corr = np.fft.irfft2(image_fft * np.fft.rfft2(t[::-1, ::-1], fft_shape), fft_shape)
+        corr = corr[h - 1:height, w - 1:width]
+
+        window_sum = integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+        window_sq = integral_sq[h:, w:] - integral_sq[:-h, w:] - integral_sq[h:, :-w] + integral_sq[:-h, :-w]
+        window_var = np.maximum(window_sq - window_sum ** 2 / (h * w), 0)
+
+        denom = t_norm * np.sqrt(window_var)
+        ncc = np.where(denom > 1e-6, corr / np.maximum(denom, 1e-6), 0)
+        scores[label] = float(ncc.max())
+
+    return scores
+
+
+class TemplateClassifier:
+    def __init__(self, path=TEMPLATES_FILE, min_score=TEMPLATE_MIN_SCORE,
+                 min_margin=TEMPLATE_MIN_MARGIN, samples_needed=TEMPLATE_SAMPLES):
+        self.path = path
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.samples_needed = samples_needed
+        self.templates = {}  # метка -> массив float32
+        self.samples = {}  # метка -> список вырезанных образцов
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """Готовы ли шаблоны хотя бы для слов Success и Failed"""
+        return all(label in self.templates for label in OUTCOME_LABELS)
+
+    def needs_samples(self):
+        return any(label not in self.templates for label in OUTCOME_LABELS + LEVEL_LABELS)
+
+    def _best(self, scores, labels):
+        """Лучшая метка из labels, если она уверенно опережает остальные"""
+        candidates = sorted(((scores[label], label) for label in labels if label in scores), reverse=True)
+        if not candidates or candidates[0][0] < self.min_score:
+            return None, 0.0
+
+        best_score, best_label = candidates[0]
+        # "+1" целиком содержится в "+10": при совпадении обоих выбираем более длинное число
+        longer = [(score, label) for score, label in candidates
+                  if score >= self.min_score and len(label) > len(best_label)]
+        if longer:
+            best_score, best_label = max(longer)
+
+        rivals = [score for score, label in candidates
+                  if label != best_label and len(label) == len(best_label)]
+        if rivals and best_score - rivals[0] < self.min_margin:
+            return None, 0.0
+        return best_label, best_score
+
+    @staticmethod
+    def _confusable(label):
+        """Уровни, с которыми кадр уровня label можно спутать по шаблону label
+
+        Числа той же длины похожи друг на друга (+6 на шаблон +8 дает 0.95), а
+        "+1" целиком содержится в "+10".
+        """
+        return [other for other in LEVEL_LABELS
+                if len(other) == len(label) or other.startswith(label)]
+
+    def classify(self, image):
+        """Распознает окно результата
+
+        Возвращает ('failed', None, score), ('success', N, score) или None, если
+        шаблонов не хватает или уверенность ниже порога. Найденному уровню верим,
+        только если собраны шаблоны всех уровней, с которыми его можно спутать:
+        иначе кадр с уровнем без шаблона похож на соседний и соперника, который
+        отсек бы его по отрыву, нет. Такой кадр уходит в OCR.
+        """
+        with self.lock:
+            templates = dict(self.templates)
+        if not all(label in templates for label in OUTCOME_LABELS):
+            return None
+
+        image = np.asarray(image)
+        outcome_scores = match_scores(image, {label: templates[label] for label in OUTCOME_LABELS})
+        outcome, outcome_score = self._best(outcome_scores, OUTCOME_LABELS)
+        if outcome is None:
+            return None
+        if outcome == 'failed':
+            return ('failed', None, outcome_score)
+
+        level_templates = {label: templates[label] for label in LEVEL_LABELS if label in templates}
+        if not level_templates:
+            return None
+        level, level_score = self._best(match_scores(image, level_templates), LEVEL_LABELS)
+        if level is None or not all(label in templates for label in self._confusable(level)):
+            return None
+        return ('success', int(level), min(outcome_score, level_score))
+
+    def learn(self, image, words, outcome, value):
+        """Добавляет образцы из кадра, уверенно распознанного OCR
+
+        words - рамки слов из OcrEngine.recognize_words, outcome - 'success' или
+        'failed' (слово в кадре - любое из OUTCOME_WORDS), value - уровень из текста
+        (для success).
+        """
+        image = np.asarray(image)
+        crops = {}
+        for word_text, (x, y, w, h), _ in words:
+            if w <= 0 or h <= 0:
+                continue
+            lowered = word_text.lower()
+            if outcome not in crops and any(word in lowered for word in OUTCOME_WORDS[outcome]):
+                crops[outcome] = image[y:y + h, x:x + w]
+            elif value is not None:
+                match = NUMBER_WORD_RE.match(word_text.strip())
+                if match and int(match.group(1)) == value:
+                    crops[str(value)] = image[y:y + h, x:x + w]
+
+        updated = False
+        with self.lock:
+            for label, crop in crops.items():
+                if label in self.templates or crop.size == 0:
+                    continue
+                samples = self.samples.setdefault(label, [])
+                samples.append(crop.copy())
+                if len(samples) >= self.samples_needed:
+                    self.templates[label] = self._average(samples)
+                    del self.samples[label]
+                    updated = True
+                    print(f"Template for '{label}' built from {len(samples)} samples")
+
+        if updated:
+            self.save()
+
+    @staticmethod
+    def _average(samples):
+        """Средний шаблон: все образцы приводятся к размеру первого"""
+        height, width = samples[0].shape
+        stack = []
+        for sample in samples:
+            if sample.shape != (height, width):
+                sample = np.asarray(Image.fromarray(sample).resize((width, height), Image.BILINEAR))
+            stack.append(sample.astype(np.float32))
+        return np.mean(stack, axis=0).astype(np.float32)
+
+    def load(self):
+        try:
+            if not self.path or not os.path.exists(self.path):
+                return
+            with np.load(self.path) as data:
+                with self.lock:
+                    self.templates = {label: data[label] for label in data.files}
+            print(f"Templates loaded from {self.path}: {', '.join(sorted(self.templates))}")
+        except Exception as e:
+            print(f"Error loading templates: {e}")
+
+    def save(self):
+        try:
+            if not self.path:
+                return
+            with self.lock:
+                templates = dict(self.templates)
+            with open(self.path, 'wb') as f:
+                np.savez_compressed(f, **templates)
+        except Exception as e:
+            print(f"Error saving templates: {e}")
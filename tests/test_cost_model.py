@@ -0,0 +1,83 @@
+"""
+Точное ожидание из фундаментальной матрицы и Монте-Карло на цепях, для которых
+ответ известен в замкнутой форме.
+"""
+
+import numpy as np
+import pytest
+
+from cost_model import expected_attempts, monte_carlo, policy_matrix
+from stats_aggregate import LEVELS, MAX_LEVEL
+
+
+def two_level_chain(p, q):
+    """Случайны только +8 и +9: уровни ниже сразу переходят на +8
+
+    +8: успех с вероятностью p, иначе остается; +9: успех с вероятностью q,
+    иначе поломка на +0.
+    """
+    matrix = np.zeros((LEVELS, LEVELS))
+    for level in range(8):
+        matrix[level, 8] = 1.0
+    matrix[8, 9] = p
+    matrix[8, 8] = 1 - p
+    matrix[9, MAX_LEVEL] = q
+    matrix[9, 0] = 1 - q
+    matrix[MAX_LEVEL, MAX_LEVEL] = 1.0
+    return matrix
+
+
+def test_two_level_chain_matches_closed_form():
+    p, q = 0.4, 0.25
+    mean, _ = expected_attempts(two_level_chain(p, q))
+
+    # E9 = 1 + (1 - q) E0, E0 = 1 + E8, E8 = 1 / p + E9
+    e9 = (1 + (1 - q) * (1 + 1 / p)) / q
+    e8 = 1 / p + e9
+    assert mean[9] == pytest.approx(e9)
+    assert mean[8] == pytest.approx(e8)
+    assert mean[:8] == pytest.approx([1 + e8] * 8)
+
+
+def test_geometric_chain_mean_and_deviation():
+    # Все уровни, кроме +9, проходятся за одну попытку, +9 - геометрически с вероятностью q
+    q = 0.3
+    matrix = np.zeros((LEVELS, LEVELS))
+    for level in range(9):
+        matrix[level, level + 1] = 1.0
+    matrix[9, MAX_LEVEL] = q
+    matrix[9, 9] = 1 - q
+    matrix[MAX_LEVEL, MAX_LEVEL] = 1.0
+
+    mean, std = expected_attempts(matrix)
+
+    levels = np.arange(MAX_LEVEL)
+    assert mean == pytest.approx(9 - levels + 1 / q)
+    assert std == pytest.approx([np.sqrt(1 - q) / q] * MAX_LEVEL)
+
+
+def test_monte_carlo_agrees_with_exact_mean():
+    matrix = two_level_chain(0.4, 0.25)
+    mean, std = expected_attempts(matrix)
+    runs = 200000
+
+    attempts, truncated = monte_carlo(matrix, runs, np.random.default_rng(1))
+
+    assert truncated == 0
+    assert attempts.mean() == pytest.approx(mean[0], abs=5 * std[0] / np.sqrt(runs))
+
+
+def test_policy_matrix_falls_back_to_other_action():
+    counts = np.zeros((2, LEVELS, LEVELS), dtype=np.int64)
+    for level in range(MAX_LEVEL):
+        counts[0, level, level + 1] = 3
+        counts[0, level, level] = 1
+    policy = ['F5'] * MAX_LEVEL
+
+    matrix, notes = policy_matrix(counts, policy)
+
+    assert matrix[0, 1] == pytest.approx(0.75)
+    assert len(notes) == MAX_LEVEL
+    counts[:, 4] = 0
+    with pytest.raises(ValueError):
+        policy_matrix(counts, policy)
@@ -0,0 +1,61 @@
+"""
+Разбор текста окна результата: английский и русский клиент, ошибки OCR в
+ключевых фразах и буква O вместо нуля в уровне.
+"""
+
+import pytest
+
+from ocr_parser import OcrParser, fuzzy_find
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Success! The item is now a +7", ('success', 7, 'success_en')),
+    ("Success! The item is now a +1", ('success', 1, 'success_en')),
+    ("Failed... you have obtained 3 dust", ('failed', None, 'failed_en')),
+    ("Успех! Предмет теперь +5", ('success', 5, 'success_ru')),
+    ("Неудача... Вы получили 2 пыли", ('failed', None, 'failed_ru')),
+    ("Провал. Вы получили", ('failed', None, 'failed_ru')),
+    ("Success! +10", ('success', 10, 'target_10')),
+])
+def test_en_ru_samples(text, expected):
+    assert OcrParser().parse(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    "Success! The item is now a +1O",   # латинская O
+    "Success! The item is now a +1o",
+    "Успешно! Предмет теперь +1О",      # русская О
+    "Успех! Предмет теперь +1о",
+])
+def test_letter_o_reads_as_zero(text):
+    assert OcrParser().parse(text)[:2] == ('success', 10)
+
+
+def test_single_letter_errors_are_tolerated():
+    assert OcrParser().parse("Succes! The itern is now a +3") == ('success', 3, 'success_en')
+    assert OcrParser().parse("Fai1ed... you have obtalned") == ('failed', None, 'failed_en')
+
+
+@pytest.mark.parametrize('text', [
+    "",
+    "loading...",
+    "Success! The item is now a +12",
+])
+def test_unknown(text):
+    assert OcrParser().parse(text) == ('unknown', None, None)
+
+
+def test_rule_counts():
+    parser = OcrParser()
+    parser.parse("Success! The item is now a +2")
+    parser.parse("Неудача... Вы получили")
+    parser.parse("loading...")
+    parser.parse("loading...", count=False)
+
+    assert parser.summary() == "Parse rules: failed_ru=1, success_en=1, unknown=1"
+
+
+def test_fuzzy_find():
+    assert fuzzy_find("the item is", "item", 0) == (0, 8)
+    assert fuzzy_find("the itern is", "item", 1) == (1, 7)
+    assert fuzzy_find("the itern is", "item", 0) is None
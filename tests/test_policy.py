@@ -0,0 +1,118 @@
+"""
+Итерации по политикам выбирают F1/F5 так же, как полный перебор, на
+построенных вероятностях переходов.
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from policy import MAX_LEVEL, PolicyTable, optimize
+from stats_aggregate import ACTIONS, LEVELS
+
+SCALE = 1000  # попыток на уровень и действие в построенной статистике
+
+
+def build_counts(f1_success, f5_success, f5_break):
+    """Счетчики [действие, с уровня, на уровень] по вероятностям на каждом уровне
+
+    F1: успех или остается на уровне; F5: успех, поломка на +0 или остается.
+    """
+    counts = np.zeros((len(ACTIONS), LEVELS, LEVELS), dtype=np.int64)
+    for level in range(MAX_LEVEL):
+        success = int(f1_success[level] * SCALE)
+        counts[0, level, level + 1] = success
+        counts[0, level, level] = SCALE - success
+
+        success = int(f5_success[level] * SCALE)
+        broken = int(f5_break[level] * SCALE) if level > 0 else 0
+        counts[1, level, level + 1] = success
+        counts[1, level, 0] += broken
+        counts[1, level, level] += SCALE - success - broken
+    return counts
+
+
+def policy_values(counts, cycle_seconds, actions):
+    """Ожидаемое время до +10 с каждого уровня для фиксированной политики"""
+    matrices = counts / counts.sum(axis=2, keepdims=True).clip(min=1)
+    transient = np.array([matrices[ACTIONS.index(action), level, :MAX_LEVEL]
+                          for level, action in enumerate(actions)])
+    cost = np.array([cycle_seconds[action] for action in actions])
+    return np.linalg.solve(np.eye(MAX_LEVEL) - transient, cost)
+
+
+def brute_force(counts, cycle_seconds):
+    """Политика с наименьшим ожиданием с +0 среди всех 2^10"""
+    best = None
+    for actions in itertools.product(ACTIONS, repeat=MAX_LEVEL):
+        values = policy_values(counts, cycle_seconds, actions)
+        if best is None or values[0] < best[1][0]:
+            best = (list(actions), values)
+    return best
+
+
+def test_f5_where_breaks_are_cheap_f1_where_they_are_not():
+    # До +5 F5 вдвое удачнее F1 и почти не ломает, выше ломает часто
+    f1_success = [0.3] * MAX_LEVEL
+    f5_success = [0.6] * 5 + [0.35] * 5
+    f5_break = [0.02] * 5 + [0.5] * 5
+    counts = build_counts(f1_success, f5_success, f5_break)
+    seconds = {'F1': 5.0, 'F5': 5.0}
+
+    actions, values = optimize(counts, seconds, min_attempts=1)
+
+    assert actions == ['F5'] * 5 + ['F1'] * 5
+    expected_actions, expected_values = brute_force(counts, seconds)
+    assert actions == expected_actions
+    assert values == pytest.approx(expected_values.tolist())
+
+
+def test_cycle_time_changes_the_choice():
+    # Одинаковые шансы без поломок: выигрывает более быстрый цикл
+    counts = build_counts([0.5] * MAX_LEVEL, [0.5] * MAX_LEVEL, [0.0] * MAX_LEVEL)
+
+    fast_f5, _ = optimize(counts, {'F1': 6.0, 'F5': 4.0}, min_attempts=1)
+    fast_f1, _ = optimize(counts, {'F1': 4.0, 'F5': 6.0}, min_attempts=1)
+
+    assert fast_f5 == ['F5'] * MAX_LEVEL
+    assert fast_f1 == ['F1'] * MAX_LEVEL
+
+
+def test_optimum_on_random_odds_matches_brute_force():
+    rng = np.random.default_rng(7)
+    for _ in range(5):
+        f1_success = rng.uniform(0.2, 0.6, MAX_LEVEL)
+        f5_success = rng.uniform(0.3, 0.8, MAX_LEVEL)
+        f5_break = rng.uniform(0.0, 0.15, MAX_LEVEL)
+        counts = build_counts(f1_success, f5_success, f5_break)
+        seconds = {'F1': float(rng.uniform(3, 6)), 'F5': float(rng.uniform(3, 6))}
+
+        actions, values = optimize(counts, seconds, min_attempts=1)
+
+        expected_actions, expected_values = brute_force(counts, seconds)
+        assert values[0] == pytest.approx(expected_values[0])
+        # Оптимальная политика минимизирует ожидание сразу со всех уровней
+        assert values == pytest.approx(policy_values(counts, seconds, actions).tolist())
+        assert np.all(np.asarray(values) <= expected_values + 1e-6)
+
+
+def test_action_without_enough_attempts_is_not_chosen():
+    counts = build_counts([0.3] * MAX_LEVEL, [0.9] * MAX_LEVEL, [0.0] * MAX_LEVEL)
+    counts[1, 4] //= 100  # на +4 по F5 всего 10 попыток
+
+    actions, _ = optimize(counts, {'F1': 5.0, 'F5': 5.0}, min_attempts=50)
+
+    assert actions[4] == 'F1'
+    assert actions[:4] == ['F5'] * 4 and actions[5:] == ['F5'] * 5
+
+
+def test_policy_table_round_trip():
+    table = PolicyTable(['F1'] * 3 + ['F5'] * 7, expected_seconds=[1.0] * MAX_LEVEL, attempts=42)
+
+    restored = PolicyTable.from_dict(table.to_dict())
+
+    assert restored.actions == table.actions
+    assert restored.action(3) == 'F5'
+    with pytest.raises(ValueError):
+        PolicyTable.from_dict({'actions': ['F2'] * MAX_LEVEL})
@@ -0,0 +1,173 @@
+"""
+Потоковые счетчики, контрольная точка и параллельный разбор дают те же отчеты,
+что и прежний анализатор, который держал все записи в памяти.
+"""
+
+import json
+import random
+from collections import defaultdict
+
+from stats_aggregate import IncrementalAggregator, aggregate, aggregate_file, aggregate_parallel
+
+
+def generate_entries(count, seed=1):
+    """Попытки как из цикла: F1 до +2, F5 дальше, поломки на 0 и сессии до +10"""
+    rng = random.Random(seed)
+    entries = []
+    level = 0
+    for _ in range(count):
+        action = 'F1' if level < 3 else 'F5'
+        roll = rng.random()
+        if roll < 0.5:
+            result, to_level = 'success', level + 1
+        elif action == 'F5' and roll < 0.6:
+            # Поломка пишется как success с падением на 0
+            result, to_level = 'success', 0
+        else:
+            result, to_level = 'failed', level
+        entries.append({'timestamp': '2026-01-13T10:30:45', 'from_level': level,
+                        'action': action, 'result': result, 'to_level': to_level})
+        level = 0 if to_level == 10 else to_level
+    return entries
+
+
+def write_entries(path, entries, mode='w'):
+    with open(path, mode, encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+
+
+def old_success_rates(stats):
+    """analyze_success_rates прежнего analyze_statistics.py"""
+    transitions = defaultdict(lambda: defaultdict(lambda: {'success': 0, 'failed': 0}))
+    breaks_to_zero = defaultdict(int)
+    for entry in stats:
+        transitions[entry['from_level']][entry['action']][entry['result']] += 1
+        if entry['result'] == 'success' and entry['to_level'] == 0 and entry['from_level'] > 0:
+            breaks_to_zero[entry['action']] += 1
+    return transitions, breaks_to_zero
+
+
+def old_detailed_transitions(stats):
+    """Подсчет из прежнего print_detailed_transitions"""
+    upgrades = defaultdict(lambda: defaultdict(int))
+    breaks = defaultdict(lambda: defaultdict(int))
+    for entry in stats:
+        if entry['result'] != 'success':
+            continue
+        if entry['to_level'] > entry['from_level']:
+            upgrades[(entry['from_level'], entry['to_level'])][entry['action']] += 1
+        elif entry['to_level'] == 0 and entry['from_level'] > 0:
+            breaks[entry['from_level']][entry['action']] += 1
+    return upgrades, breaks
+
+
+def plain(value):
+    """defaultdict любой вложенности в обычный dict для сравнения"""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    return value
+
+
+def reports(counters):
+    transitions, breaks_to_zero = counters.success_rates()
+    upgrades, breaks = counters.detailed_transitions()
+    return (plain(transitions), plain(breaks_to_zero), plain(upgrades), plain(breaks),
+            counters.sessions_completed())
+
+
+def test_streaming_counters_match_old_analyzer(tmp_path):
+    entries = generate_entries(5000)
+    path = tmp_path / 'stats.jsonl'
+    write_entries(path, entries)
+
+    counters = aggregate_file(str(path))
+
+    transitions, breaks_to_zero = old_success_rates(entries)
+    upgrades, breaks = old_detailed_transitions(entries)
+    sessions = sum(1 for entry in entries if entry['result'] == 'success' and entry['to_level'] == 10)
+    assert sessions > 0 and breaks_to_zero
+    assert reports(counters) == (plain(transitions), plain(breaks_to_zero), plain(upgrades),
+                                 plain(breaks), sessions)
+    assert counters.total == len(entries)
+    assert counters.skipped == 0
+
+
+def test_bad_records_are_skipped():
+    entries = generate_entries(100)
+    bad = [{'from_level': 11, 'to_level': 0, 'action': 'F1', 'result': 'failed'},
+           {'from_level': 1, 'to_level': 1, 'action': 'F2', 'result': 'failed'},
+           {'from_level': 1, 'action': 'F1'}]
+
+    counters = aggregate(entries + bad)
+
+    assert counters.total == len(entries)
+    assert counters.skipped == len(bad)
+    assert reports(counters) == reports(aggregate(entries))
+
+
+def test_checkpoint_resume_matches_full_pass(tmp_path):
+    entries = generate_entries(3000, seed=2)
+    path = tmp_path / 'stats.jsonl'
+    checkpoint = tmp_path / 'stats.checkpoint.json'
+    write_entries(path, entries[:1000])
+    # Недописанная строка: первый проход не должен ее учитывать
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entries[1000])[:20])
+
+    first = IncrementalAggregator(str(path), str(checkpoint), jobs=1)
+    assert first.update() == (1000, False)
+    first.save()
+
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entries[1000])[20:] + '\n')
+    write_entries(path, entries[1001:], mode='a')
+
+    resumed = IncrementalAggregator(str(path), str(checkpoint), jobs=1)
+    assert resumed.load()
+    assert resumed.update() == (2000, False)
+    assert resumed.counters.counts == aggregate_file(str(path)).counts
+    assert resumed.counters.total == len(entries)
+
+
+def test_checkpoint_rebuilds_rewritten_file(tmp_path):
+    path = tmp_path / 'stats.jsonl'
+    checkpoint = tmp_path / 'stats.checkpoint.json'
+    write_entries(path, generate_entries(500, seed=3))
+    first = IncrementalAggregator(str(path), str(checkpoint), jobs=1)
+    first.update()
+    first.save()
+
+    replaced = generate_entries(800, seed=4)
+    write_entries(path, replaced)
+
+    resumed = IncrementalAggregator(str(path), str(checkpoint), jobs=1)
+    assert resumed.load()
+    assert resumed.update() == (800, True)
+    assert resumed.counters.counts == aggregate(replaced).counts
+
+
+def test_parallel_pass_matches_serial(tmp_path):
+    entries = generate_entries(4000, seed=5)
+    path = tmp_path / 'stats.jsonl'
+    write_entries(path, entries)
+
+    serial = aggregate_file(str(path))
+    # min_bytes=0: делим на части даже маленький файл
+    parallel, end = aggregate_parallel(str(path), jobs=3, min_bytes=0)
+
+    assert end == path.stat().st_size
+    assert parallel.counts == serial.counts
+    assert (parallel.total, parallel.skipped) == (serial.total, serial.skipped)
+
+
+def test_parallel_pass_from_offset(tmp_path):
+    entries = generate_entries(2000, seed=6)
+    path = tmp_path / 'stats.jsonl'
+    write_entries(path, entries[:700])
+    offset = path.stat().st_size
+    write_entries(path, entries[700:], mode='a')
+
+    counters, _ = aggregate_parallel(str(path), start=offset, jobs=2, min_bytes=0)
+
+    assert counters.counts == aggregate(entries[700:]).counts
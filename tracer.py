@@ -0,0 +1,123 @@
+"""
+Трассировка фаз цикла Polisher
+
+Отрезки (span) каждой фазы цикла: шаги действия F1/F5, ожидание окна результата,
+захват mss, OCR, разбор, запись статистики и случайная задержка. Они пишутся в
+заранее выделенный кольцевой буфер на TRACE_CAPACITY отрезков, а по запросу из
+меню трея сохраняются в JSON формата Chrome trace events, который открывается в
+Perfetto (ui.perfetto.dev) или chrome://tracing.
+
+Когда трассировка выключена, span() возвращает общий пустой объект и ничего не пишет.
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from array import array
+from datetime import datetime
+
+from config import TRACE_ENABLED, TRACE_CAPACITY, TRACE_DIR
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Tracer:
+    def __init__(self, capacity=TRACE_CAPACITY, enabled=TRACE_ENABLED):
+        self.capacity = capacity
+        self.enabled = enabled
+        # Параллельные массивы вместо объекта на отрезок
+        self.names = [None] * capacity
+        self.threads = [0] * capacity
+        self.starts = array('q', bytes(8 * capacity))
+        self.ends = array('q', bytes(8 * capacity))
+        # next() у itertools.count атомарен, слоты раздаются без блокировки
+        self.counter = itertools.count()
+        self.recorded = 0
+        self.thread_names = {}
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name):
+        """with tracer.span('capture'): ... - отрезок фазы (пустой, если трассировка выключена)"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start, end):
+        thread = threading.current_thread()
+        index = next(self.counter)
+        self.recorded = index + 1
+        slot = index % self.capacity
+        self.names[slot] = name
+        self.threads[slot] = thread.ident
+        self.starts[slot] = start
+        self.ends[slot] = end
+        if thread.ident not in self.thread_names:
+            self.thread_names[thread.ident] = thread.name
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        print(f"Tracing {'enabled' if self.enabled else 'disabled'}")
+        return self.enabled
+
+    def events(self):
+        """Отрезки из буфера (от старых к новым) как события Chrome trace"""
+        recorded = self.recorded
+        count = min(recorded, self.capacity)
+        pid = os.getpid()
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in list(self.thread_names.items())
+        ]
+        for index in range(recorded - count, recorded):
+            slot = index % self.capacity
+            name = self.names[slot]
+            if name is None:
+                continue
+            start = self.starts[slot]
+            events.append({
+                'name': name,
+                'cat': 'polisher',
+                'ph': 'X',
+                'pid': pid,
+                'tid': self.threads[slot],
+                'ts': (start - self.origin) / 1000,
+                'dur': (self.ends[slot] - start) / 1000,
+            })
+        return events
+
+    def dump(self, directory=TRACE_DIR):
+        """Сохраняет буфер в JSON файл и возвращает путь к нему"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, f)
+        return path
@@ -0,0 +1,154 @@
+"""
+Поток интерфейса Polisher
+
+Один долгоживущий поток владеет единственным корнем Tk, все окна приложения
+(уведомления, RegionSelector, PointSelector) - его Toplevel. Другие потоки (цикл,
+хуки горячих клавиш, меню трея) только кладут команды в очередь и сразу идут
+дальше, а поток интерфейса забирает их раз в UI_POLL_INTERVAL. Уведомления -
+всплывающие окна в углу экрана, закрываются сами через NOTIFICATION_SECONDS,
+поэтому никто не ждет нажатия OK.
+
+Поток и tkinter запускаются при первой команде. Если Tk недоступен (нет дисплея),
+уведомления печатаются в консоль.
+"""
+
+import queue
+import threading
+
+from config import APP_NAME, NOTIFICATION_SECONDS, NOTIFICATION_LIMIT, UI_POLL_INTERVAL
+
+# Отступ уведомлений от края экрана и между собой, пиксели
+TOAST_MARGIN = 16
+# Снизу оставляем место под панель задач
+TOAST_BOTTOM = 64
+
+
+class UiThread:
+    def __init__(self, poll_interval=UI_POLL_INTERVAL, toast_seconds=NOTIFICATION_SECONDS,
+                 toast_limit=NOTIFICATION_LIMIT):
+        self.poll_interval = poll_interval
+        self.toast_seconds = toast_seconds
+        self.toast_limit = toast_limit
+        self.commands = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.failed = False
+        self.toasts = []  # открытые уведомления, новые в конце
+
+    def submit(self, func, *args, fallback=None):
+        """Выполняет func(root, *args) на потоке интерфейса и не ждет результата
+
+        fallback() вызывается вместо func, если Tk недоступен (по умолчанию - сообщение в консоль).
+        """
+        if fallback is None:
+            fallback = lambda: print(f"UI unavailable, skipped: {getattr(func, '__qualname__', func)}")
+        with self.lock:
+            if not self.failed:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name='polisher-ui', daemon=True)
+                    self.thread.start()
+                self.commands.put((func, args, fallback))
+                return
+        fallback()
+
+    def notify(self, message, seconds=None):
+        """Уведомление, которое закрывается само (из любого потока, не блокирует)"""
+        self.submit(self._show_toast, message, seconds or self.toast_seconds,
+                    fallback=lambda: print(f"{APP_NAME}: {message}"))
+
+    def stop(self):
+        """Закрывает все окна и завершает поток интерфейса"""
+        with self.lock:
+            thread = self.thread
+            if thread is None or self.failed:
+                return
+            self.commands.put((None, (), lambda: None))
+        if thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+
+    def _run(self):
+        try:
+            import tkinter as tk
+
+            root = tk.Tk()
+            root.withdraw()
+        except Exception as e:
+            print(f"Error starting UI thread: {e}")
+            self._fail()
+            return
+        root.after(int(self.poll_interval * 1000), self._poll, root)
+        try:
+            root.mainloop()
+        finally:
+            self.toasts = []
+            try:
+                root.destroy()
+            except tk.TclError:
+                pass
+            self._fail()
+
+    def _fail(self):
+        """Tk недоступен или закрыт: оставшиеся команды уходят в fallback"""
+        with self.lock:
+            self.failed = True
+        while True:
+            try:
+                func, args, fallback = self.commands.get_nowait()
+            except queue.Empty:
+                return
+            fallback()
+
+    def _poll(self, root):
+        while True:
+            try:
+                func, args, fallback = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            if func is None:
+                root.quit()
+                return
+            try:
+                func(root, *args)
+            except Exception as e:
+                print(f"Error in UI command: {e}")
+                fallback()
+        root.after(int(self.poll_interval * 1000), self._poll, root)
+
+    def _show_toast(self, root, message, seconds):
+        import tkinter as tk
+
+        toast = tk.Toplevel(root)
+        toast.overrideredirect(True)
+        toast.attributes('-topmost', True)
+        label = tk.Label(toast, text=message, justify='left', anchor='w', wraplength=420,
+                         bg='#263238', fg='white', font=('Arial', 11), padx=14, pady=10)
+        label.pack()
+        # Клик закрывает уведомление раньше времени
+        label.bind('<Button-1>', lambda event: self._close_toast(toast))
+        # Таймер на корне: у закрытого раньше окна его колбэки уже удалены
+        root.after(int(seconds * 1000), self._close_toast, toast)
+
+        self.toasts.append(toast)
+        while len(self.toasts) > self.toast_limit:
+            self._close_toast(self.toasts[0])
+        self._place_toasts(root)
+
+    def _close_toast(self, toast):
+        if toast not in self.toasts:
+            return
+        self.toasts.remove(toast)
+        toast.destroy()
+        if self.toasts:
+            self._place_toasts(self.toasts[0].master)
+
+    def _place_toasts(self, root):
+        """Складывает уведомления стопкой в правом нижнем углу, новое - внизу"""
+        screen_width = root.winfo_screenwidth()
+        bottom = root.winfo_screenheight() - TOAST_BOTTOM
+        for toast in reversed(self.toasts):
+            toast.update_idletasks()
+            width = toast.winfo_reqwidth()
+            height = toast.winfo_reqheight()
+            bottom -= height
+            toast.geometry(f"+{screen_width - width - TOAST_MARGIN}+{bottom}")
+            bottom -= TOAST_MARGIN